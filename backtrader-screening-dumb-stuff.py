@@ -9,10 +9,19 @@ from datetime import date, datetime, timedelta
 # Import the backtrader platform
 import backtrader as bt
 
+import hma
+import optimize
+import walkforward
+
 period = 365
-strategyResults = {}
 lastBuy = None
 optimization = True
+# screen with the array based HMA (hma.py) instead of the Cerebro runs of
+# sections (1) and (2): same periods and buy dates (test_hma.py), much faster
+vectorized = False
+# roll the optimization (period days) / signal (120 days) windows through the
+# whole history instead, window results are cached in walkforward-cache.json
+walkForward = False
 ETFs =['SPY', 'SH', 'VXX', 'EEM', 'QQQ', 'PSQ', 'XLF', 'GDX', 'HYG', 'EFA', 'IAU', 'XOP', 'IWM', 'FXI', 'SLV', 'USO', 'XLE', 'IEMG', 'AMLP', 'EWZ', 'XLK', 'XLI', 'VWO', 'GLD', 'XLP', 'JNK', 'EWJ', 'XLU', 'VEA', 'IEFA', 'XLV', 'PFF', 'VIXY', 'TLT', 'GDXJ', 'LQD', 'XLB', 'BKLN', 'XLY', 'SMH', 'OIH', 'ASHR', 'RSX', 'MCHI', 'VTI', 'EWH', 'SPLV', 'KRE', 'IVV', 'DIA', 'IEF', 'EZU', 'EWT', 'SPDW', 'VOO', 'SCHF', 'EWY', 'MYY', 'DOG', 'EUM']
 
 # Create a Stratey
@@ -112,61 +121,60 @@ class TestStrategy(bt.Strategy):
         self.log('(MA Period %2d) Ending Value %.2f' %
                  (self.params.maperiod, self.broker.getvalue()), optimization=optimization)
         
-        # keep track of results for each period backtest
-        strategyResults[self.params.maperiod] = self.broker.getvalue()
-
 
 if __name__ == '__main__':
 
-    for ticker in ETFs[:2]:
-        print('Ticker: %s' % ticker)
-        # Create a cerebro entity
-        cerebro = bt.Cerebro()
-
-        strats = cerebro.optstrategy(
-            TestStrategy,
-            maperiod=range(15, 30))
-
-        endDate = datetime.today().strftime('%Y-%m-%d')
-        fromDate = (datetime.today() - timedelta(days=period))
-        startDate = fromDate.strftime('%Y-%m-%d')
-        filename = 'data/%s_%s_%s.txt' % (ticker,startDate, endDate)
-        modpath = os.path.dirname(os.path.abspath('./Quant'))
-        datapath = os.path.join(modpath, filename)
+    modpath = os.path.dirname(os.path.abspath('./Quant'))
+    today = datetime(datetime.today().year, datetime.today().month, datetime.today().day)
+    fromDate = (datetime.today() - timedelta(days=period))
 
+    # canonical per-ticker files kept up to date by get-tiigo-data.py
+    paths = {}
+    for ticker in ETFs:
+        filename = 'data/%s.txt' % ticker
         if not os.path.isfile(filename):
             print('file: %s not found' % filename)
-            sys.exit()
-
-        # Section (1)
-        # Find the optimal MA period for this equity in this data set
-        
-        # Create a Data Feed
-        data = bt.feeds.YahooFinanceCSVData(
-            dataname=datapath,
+            continue
+        paths[ticker] = os.path.join(modpath, filename)
+
+    if walkForward:
+        table = walkforward.walkforward({ticker: optimize.read_yahoo_csv(datapath)
+                                         for ticker, datapath in paths.items()},
+                                        periods=range(15, 30), insample=period, outsample=120)
+        print(table.to_string(index=False))
+        print(table.groupby('ticker')[['insample_value', 'outsample_value']].mean().to_string())
+        sys.exit()
+
+    if vectorized:
+        # Sections (1) and (2) as array operations over the whole universe
+        table = hma.screen({ticker: optimize.read_yahoo_csv(datapath)
+                            for ticker, datapath in paths.items()},
+                           periods=range(15, 30), optdays=period, signaldays=120)
+        print(table.to_string(index=False))
+        for ticker in table.ticker[table.signal]:
+            print('*** BUY SCREENER SIGNAL: %s' % ticker)
+        sys.exit()
+
+    # Section (1)
+    # Find the optimal MA period for every equity in this data set: the
+    # (ticker x maperiod) backtests run on a process pool, over prices parsed
+    # once into shared memory
+    optimization = True
+    with optimize.SharedPrices.from_yahoo_csv(paths) as prices:
+        records = optimize.optimize(
+            prices, TestStrategy, dict(maperiod=range(15, 30)),
             # Do not pass values before this date
             fromdate=datetime(fromDate.year, fromDate.month, fromDate.day),
-            # Do not pass values before this date
-            todate=datetime(datetime.today().year, datetime.today().month, datetime.today().day),
             # Do not pass values after this date
-            reverse=False)
-
-        # Add the Data Feed to Cerebro
-        cerebro.adddata(data)
-        # Set our desired cash start
-        cerebro.broker.setcash(1000.0)
-        # Add a FixedSize sizer according to the stake
-        cerebro.addsizer(bt.sizers.FixedSize, stake=1)
-        # Set the commission
-        cerebro.broker.setcommission(commission=0.0)
+            todate=today,
+            cash=1000.0, stake=1, commission=0.0)
+    bestPeriods = optimize.best(records)
 
-        optimization = True
-        # Run over everything
-        cerebro.run(maxcpus=1)
+    for ticker, datapath in paths.items():
+        print('Ticker: %s' % ticker)
 
-        # find the optimal period for this indicator and this data
-        inverse = [(value, key) for key, value in strategyResults.items()]
-        bestPeriod = max(inverse)[1]
+        # the optimal period for this indicator and this data
+        bestPeriod = bestPeriods[ticker]['maperiod']
         print('Optional MAperiod: %s' % str(bestPeriod))
 
         # Section (2)
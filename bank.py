@@ -0,0 +1,225 @@
+'''
+Multi-period indicator bank
+
+Computes an indicator for a whole list of periods in one go, for parameter
+sweeps: the period independent work is done once per series and kept on the
+bank, each extra period only adds an O(n) array pass.
+
+    bank = IndicatorBank(close, high=high, low=low)
+    bank.sma([10, 20, 50])      # (bars, 3)
+    bank.highest(range(20, 251))
+
+- sma, hma: prefix sums of x and j*x (j the bar index) give any window sum
+  and linear weighted sum by a subtraction
+- highest, lowest: sparse table of the max/min over power of two windows,
+  any window is the max of two overlapping table entries
+- atr, rsi: true range / up and down moves computed once, Wilder smoothing
+  (bt's SmoothedMovingAverage, seeded with the mean) per period in C
+- regression: rollingreg.rolling_regressions, shared running sums
+
+Series run along axis 0, results are shaped (bars, periods) plus any
+trailing axes of the input (e.g. tickers). Values before an indicator's
+minimum period, and windows holding a NaN, are NaN; a ticker whose column
+starts with NaN (listed later) starts its atr/rsi smoothing at its first
+valid bar. The numbers match the
+backtrader indicators up to float rounding (highest/lowest exactly).
+'''
+import numpy as np
+from scipy.signal import lfilter
+
+from rollingreg import rolling_regressions
+
+
+def _smoothed(x, period, first):
+    # smoothed_average of a (bars, columns) block starting at the same bar
+    out = np.full(x.shape, np.nan)
+    seed = first + period - 1
+    if seed >= len(x):
+        return out
+    alpha = 1.0 / period
+    out[seed] = x[first:seed + 1].mean(axis=0)
+    if seed + 1 < len(x):
+        zi = ((1.0 - alpha) * out[seed])[None]
+        out[seed + 1:], _ = lfilter([alpha], [1.0, alpha - 1.0], x[seed + 1:], axis=0, zi=zi)
+    return out
+
+
+def smoothed_average(x, period, first=0):
+    '''
+    bt SmoothedMovingAverage (Wilder) of x along axis 0, whose values start
+    at bar `first`: mean of the first `period` values, then
+    prev * (1 - 1/period) + x / period, run by scipy.signal.lfilter
+
+    Each column (trailing axes) starts at its own first valid value at or
+    after `first`, as the data of a ticker listed later would in bt. A NaN
+    after that start stays in the smoothing: the rest of the column is NaN.
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if first >= len(x):
+        return out
+    flat, res = x.reshape(len(x), -1), out.reshape(len(x), -1)
+    valid = ~np.isnan(flat[first:])
+    starts = np.where(valid.any(axis=0), first + valid.argmax(axis=0), len(x))
+    # one lfilter run per group of columns sharing a start
+    for start in np.unique(starts):
+        cols = np.flatnonzero(starts == start)
+        res[:, cols] = _smoothed(flat[:, cols], period, start)
+    return out
+
+
+class IndicatorBank(object):
+
+    def __init__(self, close, high=None, low=None):
+        self.close = np.asarray(close, dtype=np.float64)
+        self.high = None if high is None else np.asarray(high, dtype=np.float64)
+        self.low = None if low is None else np.asarray(low, dtype=np.float64)
+        self._cache = {}
+
+    def _shared(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def _out(self, periods, x=None):
+        x = self.close if x is None else x
+        return np.full((len(x), len(periods)) + x.shape[1:], np.nan)
+
+    # window sums
+
+    def _sums(self, x):
+        # prefix sums of x, j*x and of the NaN count, with a leading zero row;
+        # x is shifted by its mean to keep the sums small
+        missing = np.isnan(x)
+        with np.errstate(all='ignore'):
+            ref = np.nanmean(x, axis=0)
+        ref = np.where(np.isnan(ref), 0.0, ref)
+        xc = np.where(missing, 0.0, x - ref)
+        j = np.arange(len(x), dtype=np.float64).reshape((-1,) + (1,) * (x.ndim - 1))
+        zero = np.zeros((1,) + x.shape[1:])
+        sums = [np.concatenate([zero, np.cumsum(a, axis=0)])
+                for a in (xc, j * xc, missing.astype(np.float64))]
+        return ref, sums
+
+    @staticmethod
+    def _wma(ref, sums, period):
+        # linear weighted mean (weights 1..period, newest heaviest) of the
+        # windows ending at bars period-1 .. n-1
+        s, sj, nmissing = [c[period:] - c[:-period] for c in sums]
+        start = np.arange(len(s), dtype=np.float64).reshape((-1,) + (1,) * (s.ndim - 1))
+        # the weight of bar j in the window starting at `start` is j - start + 1
+        wsum = sj - (start - 1.0) * s
+        value = wsum * (2.0 / (period * (period + 1.0))) + ref
+        return np.where(nmissing == 0, value, np.nan)
+
+    def sma(self, periods):
+        '''Simple moving average'''
+        ref, sums = self._shared('sums', lambda: self._sums(self.close))
+        out = self._out(periods)
+        for k, period in enumerate(periods):
+            if period <= len(self.close):
+                s, nmissing = [c[period:] - c[:-period] for c in (sums[0], sums[2])]
+                out[period - 1:, k] = np.where(nmissing == 0, s / period + ref, np.nan)
+        return out
+
+    def wma(self, periods):
+        '''Weighted moving average (linear weights)'''
+        ref, sums = self._shared('sums', lambda: self._sums(self.close))
+        out = self._out(periods)
+        for k, period in enumerate(periods):
+            if period <= len(self.close):
+                out[period - 1:, k] = self._wma(ref, sums, period)
+        return out
+
+    def hma(self, periods):
+        '''Hull moving average: wma(2 * wma(x, p/2) - wma(x, p), sqrt(p))'''
+        ref, sums = self._shared('sums', lambda: self._sums(self.close))
+        n = len(self.close)
+        out = self._out(periods)
+        for k, period in enumerate(periods):
+            if period > n:
+                continue
+            raw = np.full(self.close.shape, np.nan)
+            half = np.full(self.close.shape, np.nan)
+            half[period // 2 - 1:] = self._wma(ref, sums, period // 2)
+            raw[period - 1:] = 2.0 * half[period - 1:] - self._wma(ref, sums, period)
+            sqrtp = int(pow(period, 0.5))
+            rref, rsums = self._sums(raw)
+            out[sqrtp - 1:, k] = self._wma(rref, rsums, sqrtp)
+        return out
+
+    # window extremes
+
+    def _table(self, x, key, func, periods):
+        # levels[k][i] = func over x[i:i + 2**k], built up to the longest period
+        levels = self._shared(key, lambda: [x])
+        top = max(periods).bit_length() - 1
+        while len(levels) <= top:
+            prev, half = levels[-1], 1 << (len(levels) - 1)
+            levels.append(func(prev[:-half], prev[half:]))
+        return levels
+
+    def _extreme(self, x, key, func, periods):
+        out = self._out(periods, x)
+        n = len(x)
+        levels = self._table(x, key, func, [p for p in periods if p <= n] or [1])
+        for k, period in enumerate(periods):
+            if period > n:
+                continue
+            level = period.bit_length() - 1
+            span = 1 << level
+            table = levels[level]
+            # window [t - period + 1, t] = [t - period + 1, +span) and [t - span + 1, +span)
+            out[period - 1:, k] = func(table[:n - period + 1], table[period - span:n - span + 1])
+        return out
+
+    def highest(self, periods):
+        '''Highest value over the window (of `high` if given, else close)'''
+        x, key = (self.high, 'high') if self.high is not None else (self.close, 'close')
+        return self._extreme(x, 'max-' + key, np.maximum, periods)
+
+    def lowest(self, periods):
+        '''Lowest value over the window (of `low` if given, else close)'''
+        x, key = (self.low, 'low') if self.low is not None else (self.close, 'close')
+        return self._extreme(x, 'min-' + key, np.minimum, periods)
+
+    # Wilder smoothed
+
+    @staticmethod
+    def _smma(x, first, periods, out):
+        for k, period in enumerate(periods):
+            out[:, k] = smoothed_average(x, period, first)
+        return out
+
+    def atr(self, periods):
+        '''Average true range, as bt.ind.ATR (needs high and low)'''
+        def truerange():
+            prev = self.close[:-1]
+            tr = np.full(self.close.shape, np.nan)
+            tr[1:] = np.maximum(self.high[1:], prev) - np.minimum(self.low[1:], prev)
+            return tr
+
+        tr = self._shared('tr', truerange)
+        return self._smma(tr, 1, periods, self._out(periods))
+
+    def rsi(self, periods):
+        '''Relative strength index, as bt.ind.RSI (lookback 1, no safediv)'''
+        def moves():
+            change = np.full(self.close.shape, np.nan)
+            change[1:] = self.close[1:] - self.close[:-1]
+            return np.maximum(change, 0.0), np.maximum(-change, 0.0)
+
+        up, down = self._shared('moves', moves)
+        maup = self._smma(up, 1, periods, self._out(periods))
+        madown = self._smma(down, 1, periods, self._out(periods))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return 100.0 - 100.0 / (1.0 + maup / madown)
+
+    # regression
+
+    def regression(self, periods):
+        '''
+        Rolling least-squares fit of close against the bar number: (slope,
+        intercept, rvalue), see rollingreg.rolling_regression
+        '''
+        return rolling_regressions(self.close, periods)
@@ -0,0 +1,88 @@
+# IndicatorBank over a whole period grid against one indicator computation
+# per period (the way a parameter sweep builds them), and against the
+# backtrader indicators for a few periods
+#   python bench-bank.py [--bars 5000] [--tickers 1] [--periods 20 250]
+
+import argparse
+import time
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+import hma
+import rolling
+import rollingreg
+from bank import IndicatorBank
+from numpyfeed import NumpyData
+
+
+def per_period(close, high, low, periods):
+    # independent computation of every period, no shared work
+    out = {}
+    out['sma'] = [pd.DataFrame(close).rolling(p).mean().values for p in periods]
+    out['hma'] = [hma.hma(close, p) for p in periods]
+    out['highest'] = [rolling.rolling_max(high, p) for p in periods]
+    out['lowest'] = [rolling.rolling_min(low, p) for p in periods]
+    out['regression'] = [rollingreg.rolling_regression(close, p) for p in periods]
+    return out
+
+
+def banked(close, high, low, periods):
+    bank = IndicatorBank(close, high=high, low=low)
+    return dict(sma=bank.sma(periods), hma=bank.hma(periods), highest=bank.highest(periods),
+                lowest=bank.lowest(periods), atr=bank.atr(periods), rsi=bank.rsi(periods),
+                regression=bank.regression(periods))
+
+
+def backtrader_run(close, high, low, periods):
+    class Grid(bt.Strategy):
+        def __init__(self):
+            for p in periods:
+                bt.ind.SMA(self.data.close, period=p)
+                bt.ind.HMA(self.data.close, period=p)
+                bt.ind.Highest(self.data.high, period=p)
+                bt.ind.Lowest(self.data.low, period=p)
+                bt.ind.ATR(self.data, period=p)
+                bt.ind.RSI(self.data.close, period=p)
+
+    n = len(close)
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(NumpyData(dataname=pd.bdate_range('2000-01-03', periods=n).values,
+                              open=close, high=high, low=low, close=close, volume=np.zeros(n)))
+    cerebro.addstrategy(Grid)
+    cerebro.run()
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - t0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Indicator bank benchmark')
+    parser.add_argument('--bars', type=int, default=5000)
+    parser.add_argument('--tickers', type=int, default=1)
+    parser.add_argument('--periods', type=int, nargs=2, default=[20, 250])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    shape = (args.bars, args.tickers) if args.tickers > 1 else (args.bars,)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, shape), axis=0))
+    spread = np.abs(rng.normal(0, 0.005, shape)) * close
+    high, low = close + spread, close - spread
+
+    lo, hi = args.periods
+    for count in (1, 10, hi - lo + 1):
+        periods = list(np.linspace(lo, hi, count).astype(int)) if count > 1 else [lo]
+        periods = [int(p) for p in periods]
+        single = timed(per_period, close, high, low, periods)
+        bank = timed(banked, close, high, low, periods)
+        print('%4d periods  per period %7.3fs  bank (+atr, rsi) %7.3fs' % (count, single, bank))
+
+    if args.tickers == 1:
+        periods = [lo, (lo + hi) // 2, hi]
+        print('backtrader, %d periods: %.3fs, bank: %.3fs'
+              % (len(periods), timed(backtrader_run, close, high, low, periods),
+                 timed(banked, close, high, low, periods)))
@@ -0,0 +1,63 @@
+# ConnorsRSI: backtrader indicator vs streaming updates vs batch arrays
+#   python bench-connors.py [--symbols 500] [--bars 1260] [--prank 100]
+
+import argparse
+import importlib.util
+import sys
+import time
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+import connors
+from numpyfeed import NumpyData
+
+# rsiConnors.py runs a backtest at import under its __main__ guard only
+spec = importlib.util.spec_from_file_location('rsiConnors', 'rsiConnors.py')
+rsiConnors = sys.modules['rsiConnors'] = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(rsiConnors)
+
+
+def backtrader_crsi(closes, prank):
+    class Crsi(bt.Strategy):
+        def __init__(self):
+            self.crsi = rsiConnors.ConnorsRSI(prank=prank)
+
+    n = len(closes)
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(NumpyData(dataname=pd.bdate_range('2000-01-03', periods=n).values, open=closes,
+                              high=closes, low=closes, close=closes, volume=np.zeros(n)))
+    cerebro.addstrategy(Crsi)
+    return np.asarray(cerebro.run()[0].crsi.crsi.array)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='ConnorsRSI benchmark')
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--bars', type=int, default=1260)
+    parser.add_argument('--prank', type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    closes = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (args.bars, args.symbols)), axis=0)), 2)
+
+    t0 = time.perf_counter()
+    reference = backtrader_crsi(closes[:, 0], args.prank)
+    single = time.perf_counter() - t0
+    print('backtrader   1 symbol  %7.3fs  (x%d symbols: ~%.0fs)' % (single, args.symbols, single * args.symbols))
+
+    t0 = time.perf_counter()
+    batch = connors.connors_rsi(closes, prank=args.prank)
+    print('batch      %4d symbols %7.3fs' % (args.symbols, time.perf_counter() - t0))
+
+    streams = [connors.StreamingConnorsRSI(prank=args.prank) for _ in range(args.symbols)]
+    t0 = time.perf_counter()
+    for row in closes:
+        values = [s.update(x) for s, x in zip(streams, row)]
+    elapsed = time.perf_counter() - t0
+    print('streaming  %4d symbols %7.3fs  %.1f us/update, one new bar for all symbols %.2f ms'
+          % (args.symbols, elapsed, 1e6 * elapsed / closes.size, 1e3 * elapsed / args.bars))
+
+    print('max difference: batch vs backtrader %.2g, streaming vs batch (last bar) %.2g'
+          % (np.nanmax(np.abs(batch[:, 0] - reference)), np.nanmax(np.abs(np.array(values) - batch[-1]))))
@@ -0,0 +1,97 @@
+# DonchianChannels on bt.ind.Highest/Lowest (window rescan per bar) against
+# the monotonic deque / block max version, in runonce and next mode: time
+# spent in the Highest/Lowest lines and check that all lines are identical
+#   python bench-donchian.py [--bars 5000] [--periods 20 60 120 250]
+
+import argparse
+import time
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+import donchain
+import indicators
+from numpyfeed import NumpyData
+
+elapsed = [0.0]
+
+
+def timed(indicator):
+    # accumulate the time spent computing the line
+    class Timed(indicator):
+        def once(self, start, end):
+            t0 = time.perf_counter()
+            super(Timed, self).once(start, end)
+            elapsed[0] += time.perf_counter() - t0
+
+        def prenext(self):
+            t0 = time.perf_counter()
+            super(Timed, self).prenext()
+            elapsed[0] += time.perf_counter() - t0
+
+        def next(self):
+            t0 = time.perf_counter()
+            super(Timed, self).next()
+            elapsed[0] += time.perf_counter() - t0
+
+    return Timed
+
+
+class RescanDonchian(donchain.DonchianChannels):
+    # the original donchain.py implementation
+    def __init__(self):
+        hi, lo = self.data.high, self.data.low
+        if self.p.lookback:
+            hi, lo = hi(self.p.lookback), lo(self.p.lookback)
+
+        self.l.dch = timed(bt.ind.Highest)(hi, period=self.p.period)
+        self.l.dcl = timed(bt.ind.Lowest)(lo, period=self.p.period)
+        self.l.dcm = (self.l.dch + self.l.dcl) / 2.0
+
+
+def make_strategy(indicator, period, lookback):
+    class Channel(bt.Strategy):
+        def __init__(self):
+            self.dc = indicator(period=period, lookback=lookback)
+
+    return Channel
+
+
+def synthetic(bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    spread = np.abs(rng.normal(0, 0.005, bars)) * close
+    dates = pd.bdate_range('2000-01-03', periods=bars).values
+    return dict(dataname=dates, open=close, high=close + spread, low=close - spread,
+                close=close, volume=np.zeros(bars))
+
+
+def run(cols, indicator, period, lookback, runonce):
+    cerebro = bt.Cerebro(stdstats=False, runonce=runonce)
+    cerebro.adddata(NumpyData(**cols))
+    cerebro.addstrategy(make_strategy(indicator, period, lookback))
+    elapsed[0] = 0.0
+    strat = cerebro.run()[0]
+    lines = [np.asarray(line.array) for line in (strat.dc.dch, strat.dc.dcl, strat.dc.dcm)]
+    return elapsed[0], lines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Donchian channel benchmark')
+    parser.add_argument('--bars', type=int, default=20000)
+    parser.add_argument('--periods', type=int, nargs='+', default=[20, 60, 120, 250])
+    args = parser.parse_args()
+
+    # donchain.DonchianChannels with the same timing hooks
+    donchain.Highest, donchain.Lowest = timed(indicators.Highest), timed(indicators.Lowest)
+
+    cols = synthetic(args.bars)
+    for runonce in (True, False):
+        for period in args.periods:
+            for lookback in (-1, 0):
+                old, a = run(cols, RescanDonchian, period, lookback, runonce)
+                new, b = run(cols, donchain.DonchianChannels, period, lookback, runonce)
+                same = all(np.array_equal(x, y, equal_nan=True) for x, y in zip(a, b))
+                print('%-7s period %3d lookback %2d  rescan %7.4fs  deque %7.4fs  x%6.1f  identical %s'
+                      % ('runonce' if runonce else 'next', period, lookback, old, new, old / new, same))
@@ -0,0 +1,70 @@
+# Offline throughput and resume check of downloader.download_all with a fake
+# DataReader (fixed latency, random transient failures)
+#   python bench-download.py [--symbols 500] [--latency 0.05]
+
+import argparse
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from downloader import download_all
+
+
+class FakeReader(object):
+    def __init__(self, latency, failrate=0.0, broken=()):
+        self.latency = latency
+        self.failrate = failrate
+        self.broken = set(broken)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, ticker):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        if ticker in self.broken or random.random() < self.failrate:
+            raise IOError('fake failure for %s' % ticker)
+        index = pd.bdate_range('2015-11-16', periods=1259, name='date')
+        close = 100 + np.cumsum(np.random.normal(0, 1, len(index)))
+        return pd.DataFrame(dict(open=close, high=close, low=close, close=close, volume=0), index=index)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk downloader benchmark')
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--rate', type=float, default=1000.0)
+    args = parser.parse_args()
+
+    tickers = ['T%04d' % i for i in range(args.symbols)]
+
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as outdir:
+            reader = FakeReader(args.latency, failrate=0.02)
+            t0 = time.perf_counter()
+            done, failed = download_all(tickers, reader, outdir=outdir, workers=workers,
+                                        rate=args.rate, backoff=0.01)
+            elapsed = time.perf_counter() - t0
+            print('%3d workers: %7.1f symbols/s  (%d done, %d failed, %d calls)'
+                  % (workers, len(tickers) / elapsed, len(done), len(failed), reader.calls))
+
+    # resume: a run where a quarter of the symbols fail, then a healthy re-run
+    # must only fetch those again
+    with tempfile.TemporaryDirectory() as outdir:
+        broken = tickers[::4]
+        download_all(tickers, FakeReader(0.0, broken=broken), outdir=outdir,
+                     workers=8, rate=args.rate, retries=0)
+        reader = FakeReader(0.0)
+        done, failed = download_all(tickers, reader, outdir=outdir, workers=8,
+                                    rate=args.rate, retries=0)
+        ok = reader.calls == len(broken) and len(done) == len(tickers) and not failed
+        print('resume: refetched %d of %d symbols (%s)'
+              % (reader.calls, len(tickers), 'ok' if ok else 'FAILED'))
+        if not ok:
+            sys.exit(1)
@@ -0,0 +1,74 @@
+# Load times of the screening.py feeds: NetPayOutData parsing the CSV files
+# against screening.cached_feeds, first run (parse + write the sidecars) and
+# later runs (sidecars only), over a synthetic datadir of monthly files
+#   python bench-feedcache.py [--files 500] [--months 240] [--workers N]
+
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+import feedcache
+import screening
+
+
+def write_datadir(datadir, nfiles, months, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1990-01-31', periods=months, freq='ME').strftime('%Y-%m-%d')
+    for i in range(nfiles):
+        close = np.round(50 * np.exp(np.cumsum(rng.normal(0.005, 0.06, months))), 4)
+        df = pd.DataFrame(dict(date=dates, open=close, high=close, low=close, close=close,
+                               volume=1000, npy=np.round(rng.uniform(-0.05, 0.10, months), 5)))
+        df.to_csv(os.path.join(datadir, 'T%04d.csv' % i), index=False)
+
+
+def preloaded(feeds):
+    cerebro = bt.Cerebro()
+    for data in feeds:
+        cerebro.adddata(data)
+        data._start()
+        data.preload()
+    return feeds
+
+
+def timed(func, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = func(*args, **kwargs)
+    return time.perf_counter() - t0, out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='NetPayOutData load benchmark')
+    parser.add_argument('--files', type=int, default=500)
+    parser.add_argument('--months', type=int, default=240)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    datadir = tempfile.mkdtemp()
+    try:
+        write_datadir(datadir, args.files, args.months)
+        fnames = glob.glob(os.path.join(datadir, '*'))
+
+        csv, a = timed(lambda: preloaded([screening.NetPayOutData(dataname=f) for f in fnames]))
+        first, _ = timed(lambda: preloaded(screening.cached_feeds(fnames, workers=args.workers)))
+        later, b = timed(lambda: preloaded(screening.cached_feeds(fnames, workers=args.workers)))
+        os.utime(fnames[0])  # one file touched: only that one is parsed again
+        touched, _ = timed(lambda: preloaded(screening.cached_feeds(fnames, workers=args.workers)))
+
+        same = all(np.array_equal(np.asarray(getattr(x.lines, n).array),
+                                  np.asarray(getattr(y.lines, n).array), equal_nan=True)
+                   for x, y in zip(a, b) for n in x.lines.getlinealiases())
+        print('%d files x %d months, sidecars in %s/' % (args.files, args.months, feedcache.CACHEDIR))
+        print('csv feed:        %.3fs' % csv)
+        print('cache, 1st run:  %.3fs  (%.1fx)' % (first, csv / first))
+        print('cache, later:    %.3fs  (%.1fx)' % (later, csv / later))
+        print('1 file touched:  %.3fs' % touched)
+        print('identical lines: %s' % same)
+    finally:
+        shutil.rmtree(datadir)
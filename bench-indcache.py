@@ -0,0 +1,115 @@
+# Strategy __init__ + run with the momentum-strategy.py indicators (Momentum
+# 90, SMA 100, ATR 20 per ticker) computed by backtrader against read back
+# from an IndicatorCache: first run (compute + store) and later runs (hits),
+# then one ticker's data changed, which only misses that ticker's entries.
+# The whole run is mostly the bar loop; `indicators` is the once pass.
+# test_indcache.py holds the tests of hits, invalidation and eviction
+#   python bench-indcache.py [--tickers 200] [--years 10]
+
+import argparse
+import shutil
+import tempfile
+import time
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from indcache import IndicatorCache
+from indicators import Momentum
+from numpyfeed import NumpyData
+
+
+class Counted(Momentum):
+    # Momentum counting its computations: none on a cache hit
+    calls = 0
+
+    def once(self, start, end):
+        Counted.calls += 1
+        super(Counted, self).once(start, end)
+
+    def next(self):
+        Counted.calls += 1
+        super(Counted, self).next()
+
+
+class Indicators(bt.Strategy):
+    params = (('cache', None),)
+
+    def __init__(self):
+        ind = self.p.cache.indicator if self.p.cache else lambda cls, *d, **kw: cls(*d, **kw)
+        self.inds = [(ind(Counted, d.close, period=90),
+                      ind(bt.ind.SimpleMovingAverage, d.close, period=100),
+                      ind(bt.ind.ATR, d, period=20)) for d in self.datas]
+
+    def _once(self):
+        # every indicator computed over the whole data (runonce)
+        t0 = time.perf_counter()
+        super(Indicators, self)._once()
+        self.elapsed = time.perf_counter() - t0
+
+    def stop(self):
+        self.values = [[np.asarray(line.array) for ind in inds for line in ind.lines]
+                       for inds in self.inds]
+
+
+def universe(ntickers, years, seed=0):
+    rng = np.random.default_rng(seed)
+    n = 252 * years
+    dates = pd.bdate_range('2000-01-03', periods=n).values
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, (ntickers, n)), axis=1))
+    spread = np.abs(rng.normal(0, 0.01, (ntickers, n))) * close
+    return dates, close, spread
+
+
+def run(dates, close, spread, cache=None):
+    cerebro = bt.Cerebro(stdstats=False)
+    for c, s in zip(close, spread):
+        cerebro.adddata(NumpyData(dataname=dates, open=c, high=c + s, low=c - s,
+                                  close=c, volume=np.zeros(len(c))))
+    cerebro.addstrategy(Indicators, cache=cache)
+    Counted.calls = 0
+    t0 = time.perf_counter()
+    st = cerebro.run()[0]
+    return (time.perf_counter() - t0, st.elapsed), Counted.calls, st.values
+
+
+def same(a, b):
+    return all(np.array_equal(x, y, equal_nan=True) for u, v in zip(a, b) for x, y in zip(u, v))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Indicator cache benchmark')
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--years', type=int, default=10)
+    args = parser.parse_args()
+
+    dates, close, spread = universe(args.tickers, args.years)
+    path = tempfile.mkdtemp()
+    try:
+        cache = IndicatorCache(path)
+        plain, _, a = run(dates, close, spread)
+        first, _, b = run(dates, close, spread, cache)
+        stored = cache.misses
+        cache.hits = cache.misses = 0
+        later, calls, c = run(dates, close, spread, cache)
+        if calls or cache.misses:
+            raise SystemExit('hits must not compute')
+        hits = cache.hits
+
+        close[0, -1] *= 1.01  # one ticker's last close changed
+        cache.hits = cache.misses = 0
+        changed, _, _ = run(dates, close, spread, cache)
+        if cache.misses != 3:
+            raise SystemExit('only the changed ticker must miss')
+
+        print('%d tickers x %d years, 3 indicators per ticker' % (args.tickers, args.years))
+        print('                  run      indicators')
+        print('backtrader:       %7.3fs %7.3fs' % plain)
+        print('cache, 1st run:   %7.3fs %7.3fs  (%d stored)' % (first + (stored,)))
+        print('cache, later:     %7.3fs %7.3fs  (%d hits, indicators %.1fx)'
+              % (later + (hits, plain[1] / later[1])))
+        print('1 ticker changed: %7.3fs %7.3fs  (%d misses)' % (changed + (cache.misses,)))
+        print('identical lines:  %s' % (same(a, b) and same(a, c)))
+    finally:
+        shutil.rmtree(path)
@@ -0,0 +1,81 @@
+# Point-in-time index membership: the survivorship-bias.py `constituents`
+# Series (as-of date -> ticker list) scanned per bar against the interval
+# index (membership.py), over synthetic monthly holdings files
+#   python bench-membership.py [--years 25] [--members 500] [--turnover 25]
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import membership
+
+
+def write_holdings(path, years, nmembers, turnover, seed=0):
+    # month-end snapshots, `turnover` names swapped per year; the files are
+    # iShares JSON responses, BOM included
+    rng = np.random.default_rng(seed)
+    current = ['S%05d' % i for i in range(nmembers)]
+    nextid = nmembers
+    for date in pd.date_range('2000-01-31', periods=12 * years, freq='ME'):
+        for k in rng.choice(nmembers, rng.poisson(turnover / 12.0), replace=False):
+            current[k] = 'S%05d' % nextid
+            nextid += 1
+        rows = [[t, 'Name of ' + t, 'Equity'] for t in current]
+        with open(os.path.join(path, date.strftime('%Y%m%d') + '.json'), 'w', encoding='utf-8-sig') as f:
+            json.dump(dict(aaData=rows), f)
+
+
+def constituents_mask(constituents, dates, symbols):
+    # the list way: last snapshot on or before each bar, `in` per symbol
+    out = np.zeros((len(dates), len(symbols)), dtype=bool)
+    for i, date in enumerate(dates):
+        k = constituents.index.searchsorted(date, 'right') - 1
+        if k >= 0:
+            tickers = constituents.iloc[k]
+            out[i] = [s in tickers for s in symbols]
+    return out
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    out = func(*args)
+    return time.perf_counter() - t0, out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Index membership benchmark')
+    parser.add_argument('--years', type=int, default=25)
+    parser.add_argument('--members', type=int, default=500)
+    parser.add_argument('--turnover', type=int, default=25)
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        write_holdings(path, args.years, args.members, args.turnover)
+        build, members = timed(membership.Membership.from_holdings, path)
+        constituents = pd.Series({pd.Timestamp(f[:8]): membership.read_holdings(os.path.join(path, f))
+                                  for f in sorted(os.listdir(path))})
+    finally:
+        shutil.rmtree(path)
+
+    dates = pd.bdate_range(constituents.index[0], periods=252 * args.years)
+    symbols = members.symbols
+    print('%d symbols, %d intervals, %d snapshots (build %.3fs)'
+          % (len(symbols), len(members.symbol), len(constituents), build))
+
+    lists, a = timed(constituents_mask, constituents, dates, symbols)
+    index, b = timed(members.mask, dates, symbols)
+    print('mask %d dates x %d symbols: lists %.3fs  index %.4fs  x%.0f  identical %s'
+          % (len(dates), len(symbols), lists, index, lists / index, np.array_equal(a, b)))
+
+    probes = dates[np.random.default_rng(1).integers(0, len(dates), 10000)]
+    t0 = time.perf_counter()
+    for date in probes:
+        members.row(date)
+    print('row(date): %.1f us per query' % (1e6 * (time.perf_counter() - t0) / len(probes)))
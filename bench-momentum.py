@@ -0,0 +1,82 @@
+# Benchmark the incremental Momentum indicator against the linregress version
+#   python bench-momentum.py [--tickers 100 500] [--bars 504]
+
+import argparse
+import time
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+from scipy.stats import linregress
+
+from indicators import Momentum
+
+
+class LinregressMomentum(bt.Indicator):
+    # the original indicator from momentum-strategy.py
+    lines = ('trend',)
+    params = (('period', 90),)
+
+    def __init__(self):
+        self.addminperiod(self.params.period)
+
+    def next(self):
+        returns = np.log(self.data.get(size=self.p.period))
+        x = np.arange(len(returns))
+        slope, _, rvalue, _, _ = linregress(x, returns)
+        annualized = (1 + slope) ** 252
+        self.lines.trend[0] = annualized * (rvalue ** 2)
+
+
+class Holder(bt.Strategy):
+    params = (('indicator', Momentum), ('period', 90))
+
+    def __init__(self):
+        self.inds = [self.p.indicator(d.close, period=self.p.period)
+                     for d in self.datas]
+
+
+def synthetic(ntickers, nbars, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2000-01-03', periods=nbars)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (nbars, ntickers)), axis=0))
+    frames = []
+    for i in range(ntickers):
+        c = closes[:, i]
+        frames.append(pd.DataFrame(
+            dict(open=c, high=c, low=c, close=c, volume=0.0), index=index))
+    return frames
+
+
+def run(frames, indicator, runonce):
+    cerebro = bt.Cerebro(stdstats=False, runonce=runonce)
+    for df in frames:
+        cerebro.adddata(bt.feeds.PandasData(dataname=df, plot=False))
+    cerebro.addstrategy(Holder, indicator=indicator)
+    t0 = time.perf_counter()
+    strat = cerebro.run()[0]
+    return time.perf_counter() - t0, strat
+
+
+def trends(strat):
+    return np.array([ind.trend.array for ind in strat.inds])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Momentum indicator benchmark')
+    parser.add_argument('--tickers', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--bars', type=int, default=504)
+    args = parser.parse_args()
+
+    for ntickers in args.tickers:
+        frames = synthetic(ntickers, args.bars)
+        base, ref = run(frames, LinregressMomentum, runonce=False)
+        nxt, inc = run(frames, Momentum, runonce=False)
+        once, vec = run(frames, Momentum, runonce=True)
+
+        a, b, c = trends(ref), trends(inc), trends(vec)
+        ok = np.allclose(a, b, equal_nan=True) and np.allclose(a, c, equal_nan=True)
+        print(f"{ntickers} tickers x {args.bars} bars (match: {ok})")
+        print(f"  linregress next: {base:8.2f}s")
+        print(f"  incremental next: {nxt:7.2f}s  ({base / nxt:.1f}x)")
+        print(f"  vectorized once: {once:8.2f}s  ({base / once:.1f}x)")
@@ -0,0 +1,95 @@
+# Bars/sec of CrossSectionalMR before and after vectorizing its next()
+#   python bench-mr.py                      # spy/ universe (through the store)
+#   python bench-mr.py --synthetic 500      # 500 random walks
+
+import argparse
+import time
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+import pricestore
+from numpyfeed import NumpyData
+from strategy import CrossSectionalMR
+
+
+class LoopMR(bt.Strategy):
+    # the original strategy.py implementation
+    def prenext(self):
+        self.next()
+
+    def next(self):
+        available = list(filter(lambda d: len(d), self.datas))
+
+        rets = np.zeros(len(available))
+        for i, d in enumerate(available):
+            rets[i] = (d.close[0] - d.close[-1]) / d.close[-1]
+
+        market_ret = np.mean(rets)
+        weights = -(rets - market_ret)
+        weights = weights / np.sum(np.abs(weights))
+
+        for i, d in enumerate(available):
+            self.order_target_percent(d, target=weights[i])
+
+
+def synthetic_feeds(ntickers, nbars, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2015-01-02', periods=nbars).values
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (nbars, ntickers)), axis=0))
+    return lambda: [NumpyData(dataname=dates, open=c, high=c, low=c, close=c, volume=np.zeros(nbars), plot=False)
+                    for c in closes.T]
+
+
+def store_feeds(csvdir):
+    store = pricestore.load(csvdir)
+    return lambda: [store.feed(t, plot=False) for t in store.symbols]
+
+
+def timed(strategy):
+    # accumulate the time spent in the strategy's own next()
+    class Timed(strategy):
+        def start(self):
+            super(Timed, self).start()
+            self.nexttime = 0.0
+
+        def next(self):
+            t0 = time.perf_counter()
+            super(Timed, self).next()
+            self.nexttime += time.perf_counter() - t0
+
+    return Timed
+
+
+def run(feeds, strategy, **kwargs):
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.broker.set_coc(True)
+    cerebro.broker.setcash(1_000_000)
+    for data in feeds():
+        cerebro.adddata(data)
+    cerebro.addstrategy(timed(strategy), **kwargs)
+    t0 = time.perf_counter()
+    strat = cerebro.run()[0]
+    elapsed = time.perf_counter() - t0
+    return (len(strat) / elapsed, 1e6 * strat.nexttime / len(strat),
+            len(strat._orders), cerebro.broker.getvalue())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CrossSectionalMR benchmark')
+    parser.add_argument('--csvdir', default='spy')
+    parser.add_argument('--synthetic', type=int, default=0, help='number of random tickers')
+    parser.add_argument('--bars', type=int, default=1260)
+    parser.add_argument('--threshold', type=float, default=0.005)
+    args = parser.parse_args()
+
+    feeds = synthetic_feeds(args.synthetic, args.bars) if args.synthetic else store_feeds(args.csvdir)
+    for label, strategy, kwargs in (
+            ('loop', LoopMR, {}),
+            ('vectorized', CrossSectionalMR, {}),
+            ('vectorized, threshold %g' % args.threshold, CrossSectionalMR,
+             dict(threshold=args.threshold))):
+        speed, cost, orders, value = run(feeds, strategy, **kwargs)
+        print('%-28s %8.1f bars/s  next() %8.1f us/bar  %7d orders  final value %.2f'
+              % (label, speed, cost, orders, value))
@@ -0,0 +1,87 @@
+# Partial reads from the price store: a few symbols / a date range / float32
+# against reading the whole CSV universe (the old pd.concat of every
+# ticker's closes), and the peak memory of a universe-wide momentum scan in
+# one block against chunks()
+#   python bench-panel.py [--tickers 500] [--years 20] [--chunk 100]
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import pricestore
+from rollingreg import rolling_momentum
+
+
+def write_csvdir(csvdir, ntickers, years, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2000-01-03', periods=252 * years)
+    for i in range(ntickers):
+        close = np.round(50 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates)))), 2)
+        pd.DataFrame(dict(open=close, high=close, low=close, close=close, volume=1000),
+                     index=pd.Index(dates, name='date')).to_csv(os.path.join(csvdir, 'T%04d.csv' % i))
+
+
+def measured(func, *args):
+    # seconds, peak traced memory in MB
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2.0 ** 20
+
+
+def concat_slice(csvdir, symbols, start, end):
+    stocks = pd.concat([pd.read_csv(os.path.join(csvdir, t + '.csv'), index_col=0,
+                                    parse_dates=True)['close'].rename(t)
+                        for t in sorted(f[:-4] for f in os.listdir(csvdir))], axis=1, sort=True)
+    return stocks.loc[start:end, symbols].values.sum()
+
+
+def store_slice(path, symbols, start, end):
+    return pricestore.PriceStore(path).frame('close', symbols, start, end, np.float32).values.sum()
+
+
+def momentum_block(path):
+    return rolling_momentum(pricestore.PriceStore(path).frame('close'), 90).max()
+
+
+def momentum_chunks(path, size):
+    store = pricestore.PriceStore(path)
+    return pd.concat([rolling_momentum(chunk, 90).max() for chunk in store.chunks('close', size)])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Price store partial read benchmark')
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--years', type=int, default=20)
+    parser.add_argument('--chunk', type=int, default=100)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        csvdir, path = os.path.join(tmp, 'csv'), os.path.join(tmp, 'store')
+        os.makedirs(csvdir)
+        write_csvdir(csvdir, args.tickers, args.years)
+        store = pricestore.import_csv(csvdir, path)
+        symbols = store.symbols[::10]
+        start, end = store.dates[-252], store.dates[-1]
+        del store
+
+        print('%d tickers x %d years; %d tickers, last year' % (args.tickers, args.years, len(symbols)))
+        for label, func, fargs in [
+                ('csv concat + slice', concat_slice, (csvdir, symbols, start, end)),
+                ('store frame float32', store_slice, (path, symbols, start, end)),
+                ('momentum, one block', momentum_block, (path,)),
+                ('momentum, chunks of %d' % args.chunk, momentum_chunks, (path, args.chunk))]:
+            elapsed, peak = measured(func, *fargs)
+            print('%-24s %8.3fs  peak %8.1f MB' % (label, elapsed, peak))
+    finally:
+        shutil.rmtree(tmp)
@@ -0,0 +1,61 @@
+# Load times of the columnar price store against parsing the spy/ CSV files
+#   python bench-pricestore.py [--csvdir spy] [--store spy-store]
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+import pricestore
+
+
+def load_csv(csvdir):
+    # what momentum-strategy.py used to do: close matrix + one frame per feed
+    tickers = [os.path.splitext(f)[0] for f in os.listdir(csvdir) if f != 'tickers.csv']
+    stocks = pd.concat(
+        [pd.read_csv(os.path.join(csvdir, f'{t}.csv'), index_col=0, parse_dates=True)['close'].rename(t)
+         for t in tickers], axis=1, sort=True)
+    frames = [pd.read_csv(os.path.join(csvdir, f'{t}.csv'), index_col=0, parse_dates=True)
+              for t in tickers]
+    return float(stocks.sum().sum()) + sum(float(df['close'].sum()) for df in frames)
+
+
+def load_store(path):
+    store = pricestore.PriceStore(path)
+    stocks = store.frame('close')
+    frames = [store.ohlcv(t) for t in store.symbols]
+    return float(stocks.sum().sum()) + sum(float(df['close'].sum()) for df in frames)
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - t0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Price store load benchmark')
+    parser.add_argument('--csvdir', default='spy')
+    parser.add_argument('--store', default='spy-store')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--cold', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold:
+        # first load in a fresh interpreter: nothing mapped or cached yet
+        print(timed(load_store, args.store))
+        sys.exit()
+
+    print('import: %.3fs' % timed(pricestore.import_csv, args.csvdir, args.store))
+
+    cold = float(subprocess.check_output(
+        [sys.executable, __file__, '--cold', '--store', args.store]))
+    csv = min(timed(load_csv, args.csvdir) for _ in range(args.repeat))
+    warm = min(timed(load_store, args.store) for _ in range(args.repeat))
+
+    print('csv:         %.4fs' % csv)
+    print('store cold:  %.4fs  (%.1fx)' % (cold, csv / cold))
+    print('store warm:  %.4fs  (%.1fx)' % (warm, csv / warm))
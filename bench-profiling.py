@@ -0,0 +1,114 @@
+# Overhead of profiling.Profiler: a momentum rotation over a synthetic
+# universe (Momentum 90, SMA 100, ATR 20 per ticker, weekly rebalance, the
+# momentum-strategy.py analyzers) run plain and instrumented, in runonce
+# and next mode, then the instrumented run's summary
+#   python bench-profiling.py [--tickers 100] [--years 10] [--repeat 3] [--report profile.json]
+
+import argparse
+import time
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from indicators import Momentum
+from numpyfeed import NumpyData
+from profiling import Profiler
+
+
+class Rotation(bt.Strategy):
+    params = (('top', 10),)
+
+    def __init__(self):
+        self.inds = {d: (Momentum(d.close, period=90), bt.ind.SMA(d.close, period=100),
+                         bt.ind.ATR(d, period=20)) for d in self.datas}
+
+    def next(self):
+        if len(self) % 5 == 0:
+            self.rebalance()
+
+    def rebalance(self):
+        ranked = sorted(self.datas, key=lambda d: -self.inds[d][0][0])[:self.p.top]
+        for d in self.datas:
+            if d not in ranked and self.getposition(d).size:
+                self.close(d)
+        value = self.broker.getvalue()
+        for d in ranked:
+            if d.close[0] > self.inds[d][1][0]:
+                self.order_target_size(d, int(value * 0.001 / self.inds[d][2][0]))
+
+
+def wrapper_cost(n=10 ** 6):
+    # seconds per call added by an instrumented method
+    class Noop(object):
+        def call(self):
+            pass
+
+    def loop():
+        noop = Noop()
+        t0 = time.perf_counter()
+        for _ in range(n):
+            noop.call()
+        return time.perf_counter() - t0
+
+    bare = loop()
+    profiler = Profiler()
+    profiler._wrap(Noop, 'call', 'noop')
+    try:
+        return (loop() - bare) / n
+    finally:
+        profiler._restore()
+
+
+def cerebro_for(ntickers, years, seed=0):
+    rng = np.random.default_rng(seed)
+    n = 252 * years
+    dates = pd.bdate_range('2000-01-03', periods=n).values
+    cerebro = bt.Cerebro(stdstats=False)
+    for _ in range(ntickers):
+        close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+        spread = np.abs(rng.normal(0, 0.01, n)) * close
+        cerebro.adddata(NumpyData(dataname=dates, open=close, high=close + spread,
+                                  low=close - spread, close=close, volume=np.zeros(n)))
+    cerebro.broker.setcash(1_000_000)
+    cerebro.addobserver(bt.observers.Value)
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, riskfreerate=0.0)
+    cerebro.addanalyzer(bt.analyzers.Returns)
+    cerebro.addanalyzer(bt.analyzers.DrawDown)
+    cerebro.addstrategy(Rotation)
+    return cerebro
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Profiler overhead benchmark')
+    parser.add_argument('--tickers', type=int, default=100)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--report', default=None, help='JSON report of the last run')
+    args = parser.parse_args()
+
+    cost = wrapper_cost()
+    print('%d tickers x %d years, %.2f us per instrumented call' % (args.tickers, args.years, 1e6 * cost))
+    for runonce in (True, False):
+        # alternated, best of --repeat
+        elapsed = instrumented = float('inf')
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            plain = cerebro_for(args.tickers, args.years).run(runonce=runonce)[0]
+            elapsed = min(elapsed, time.perf_counter() - t0)
+
+            profiler = Profiler()
+            t0 = time.perf_counter()
+            profiled = profiler.run(cerebro_for(args.tickers, args.years), runonce=runonce)[0]
+            instrumented = min(instrumented, time.perf_counter() - t0)
+
+        # wall times vary by more than the overhead on a busy machine: the
+        # estimate is the instrumented calls times the cost of one
+        calls = sum(c['calls'] for c in profiler.report()['components'])
+        print('%-8s plain %.3fs  profiled %.3fs (%+.1f%%)  %d calls, estimated overhead %.1f%%  same value %s'
+              % ('runonce' if runonce else 'next', elapsed, instrumented,
+                 100 * (instrumented / elapsed - 1), calls, 100 * calls * cost / elapsed,
+                 plain.broker.getvalue() == profiled.broker.getvalue()))
+    print(profiler.summary())
+    if args.report:
+        profiler.save(args.report)
@@ -0,0 +1,122 @@
+# Conservative formula rebalancing: per-bar cost of St.next (rank array,
+# argpartition top-k, held/selected diff) against the original version
+# sorting a dict of rank lines, for universes of monthly series. The time
+# in the broker order calls is reported apart: it is the same for both
+#   python bench-screening.py [--universes 100 1000 5000] [--bars 120]
+
+import argparse
+import time
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+import screening
+from numpyfeed import NumpyData
+
+
+class NumpyNetPayOutData(NumpyData):
+    lines = ('npy',)
+    params = (('npy', None),)
+
+
+class SortedSt(screening.St):
+    # the original next(): sorted dict of lines, positions walked per group
+    def __init__(self):
+        super(SortedSt, self).__init__()
+        self.ranks = dict(zip(self.datas, self.rankl))
+
+    def next(self):
+        ranks = sorted(self.ranks.items(), key=lambda x: x[1][0], reverse=True)
+        rtop = dict(ranks[:self.selnum])
+        rbot = dict(ranks[self.selnum:])
+        posdata = [d for d, pos in self.getpositions().items() if pos]
+
+        for d in (d for d in posdata if d not in rtop):
+            self.log('Leave {} - Rank {:.2f}'.format(d._name, rbot[d][0]))
+            self.order_target_percent(d, target=0.0)
+
+        for d in (d for d in posdata if d in rtop):
+            self.log('Rebal {} - Rank {:.2f}'.format(d._name, rtop[d][0]))
+            self.order_target_percent(d, target=self.perctarget)
+            del rtop[d]
+
+        for d in rtop:
+            self.log('Enter {} - Rank {:.2f}'.format(d._name, rtop[d][0]))
+            self.order_target_percent(d, target=self.perctarget)
+
+
+def timed(strategy):
+    # time spent in next() and, out of it, in the broker order calls
+    class Timed(strategy):
+        def start(self):
+            self.elapsed, self.ordering, self.bars = 0.0, 0.0, 0
+            self.depth = 0
+
+        def log(self, arg):
+            pass
+
+        def next(self):
+            t0 = time.perf_counter()
+            super(Timed, self).next()
+            self.elapsed += time.perf_counter() - t0
+            self.bars += 1
+
+        def _timed_order(self, method, *args, **kwargs):
+            # close() goes through sell(): only the outer call is timed
+            self.depth += 1
+            t0 = time.perf_counter()
+            order = method(*args, **kwargs)
+            self.depth -= 1
+            if not self.depth:
+                self.ordering += time.perf_counter() - t0
+            return order
+
+        def buy(self, *args, **kwargs):
+            return self._timed_order(super(Timed, self).buy, *args, **kwargs)
+
+        def sell(self, *args, **kwargs):
+            return self._timed_order(super(Timed, self).sell, *args, **kwargs)
+
+        def close(self, *args, **kwargs):
+            return self._timed_order(super(Timed, self).close, *args, **kwargs)
+
+    return Timed
+
+
+def synthetic(nseries, bars, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2000-01-31', periods=bars, freq='ME').values
+    closes = 50 * np.exp(np.cumsum(rng.normal(0.005, 0.06, (bars, nseries)), axis=0))
+    npys = rng.uniform(-0.05, 0.10, (bars, nseries))
+    return [dict(dataname=dates, open=closes[:, i], high=closes[:, i], low=closes[:, i],
+                 close=closes[:, i], volume=np.zeros(bars), npy=npys[:, i],
+                 timeframe=bt.TimeFrame.Months, name='s%04d' % i)
+            for i in range(nseries)]
+
+
+def run(feeds, strategy):
+    cerebro = bt.Cerebro(stdstats=False)
+    for kwargs in feeds:
+        cerebro.adddata(NumpyNetPayOutData(**kwargs))
+    cerebro.addstrategy(timed(strategy))
+    cerebro.broker.setcash(1000000.0)
+    strat = cerebro.run()[0]
+    return ((strat.elapsed - strat.ordering) / strat.bars, strat.ordering / strat.bars,
+            cerebro.broker.getvalue())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Conservative formula rebalancing benchmark')
+    parser.add_argument('--universes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--bars', type=int, default=120)
+    args = parser.parse_args()
+
+    for nseries in args.universes:
+        feeds = synthetic(nseries, args.bars)
+        old, oldorders, oldvalue = run(feeds, SortedSt)
+        new, neworders, newvalue = run(feeds, screening.St)
+        print('%5d series  ranking/selection: sorted %7.2f ms/bar  argpartition %7.2f ms/bar'
+              '  x%5.1f  (+ orders %6.2f / %6.2f ms/bar)  same value %s'
+              % (nseries, 1e3 * old, 1e3 * new, old / new, 1e3 * oldorders, 1e3 * neworders,
+                 oldvalue == newvalue))
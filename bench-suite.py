@@ -0,0 +1,299 @@
+# Benchmark suite: the repo's indicators (Momentum, ConnorsRSI,
+# DonchianChannels), strategies (CrossSectionalMR, screening St) and data
+# paths (NumpyData, price store, CSV feed, feedcache) over synthetic OHLCV
+# universes, generated offline. Every case runs in its own process, so its
+# peak RSS is its own; the results are appended to a JSON history and
+# compared with a stored baseline (exit status 1 on a regression or a failed
+# case; a failed case is reported and the others still run)
+#   python bench-suite.py [--symbols 10 100] [--years 1 5] [--cases momentum st ...]
+#                         [--repeat 3] [--tolerance 0.10] [--save-baseline]
+#                         [--history bench-history.json] [--baseline bench-baseline.json]
+#
+# Per case and universe (symbols x years of daily bars):
+#   seconds          best of --repeat: building the feeds + cerebro.run()
+#   bars_per_sec     symbol bars (symbols x bars) per second
+#   symbols_per_sec  symbols per second
+#   p50/p95/p99_ms   per bar latency: time between two bars of the run loop
+#   peak_rss_mb      peak RSS of the case's process
+# A regression is a throughput lower, or a p95 latency / peak RSS higher,
+# than the baseline's by more than --tolerance
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from profiling import peak_rss
+
+CASES = ('momentum', 'connorsrsi', 'donchian', 'crossmr', 'st',
+         'numpyfeed', 'pricestore', 'csvfeed', 'feedcache')
+SYMBOLS = (10, 5000)
+YEARS = (1, 30)
+
+
+def universe(nsymbols, years, seed=0):
+    '''dates, {field: symbols x bars array} of geometric random walks'''
+    rng = np.random.default_rng(seed)
+    n = 252 * years
+    dates = pd.bdate_range('1995-01-02', periods=n).values
+    shape = (nsymbols, n)
+    close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, shape), axis=1))
+    opn = close * np.exp(rng.normal(0, 0.005, shape))
+    high = np.maximum(opn, close) * (1 + np.abs(rng.normal(0, 0.01, shape)))
+    low = np.minimum(opn, close) * (1 - np.abs(rng.normal(0, 0.01, shape)))
+    volume = np.round(rng.lognormal(12, 1, shape))
+    npy = rng.uniform(-0.05, 0.10, shape)  # net payout yield, for screening.St
+    return dates, dict(open=opn, high=high, low=low, close=close, volume=volume, npy=npy)
+
+
+def write_csvdir(csvdir, dates, fields):
+    # the screening.py NetPayOutData layout (pricestore reads the same files)
+    days = pd.DatetimeIndex(dates).strftime('%Y-%m-%d')
+    for i in range(len(fields['close'])):
+        df = pd.DataFrame(dict(date=days, **{k: np.round(v[i], 4) for k, v in fields.items()}))
+        df.to_csv(os.path.join(csvdir, 'S%04d.csv' % i), index=False)
+
+
+class BarClock(bt.Analyzer):
+    '''Time between two bars of the run loop'''
+
+    def start(self):
+        self.last = None
+        self.latencies = []
+
+    def next(self):
+        now = time.perf_counter()
+        if self.last is not None:
+            self.latencies.append(now - self.last)
+        self.last = now
+
+
+class Hold(bt.Strategy):
+    '''One `indcls` indicator per data (none: the feeds alone)'''
+    params = (('indcls', None), ('indparams', {}))
+
+    def __init__(self):
+        if self.p.indcls is not None:
+            self.inds = [self.p.indcls(d, **self.p.indparams) for d in self.datas]
+
+
+def numpy_feeds(dates, fields, npy=False):
+    from numpyfeed import NumpyData
+    from screening import CachedNetPayOutData
+
+    cls = CachedNetPayOutData if npy else NumpyData
+    names = ['open', 'high', 'low', 'close', 'volume'] + (['npy'] if npy else [])
+    return [cls(dataname=dates, name='S%04d' % i, **{k: fields[k][i] for k in names})
+            for i in range(len(fields['close']))]
+
+
+def case_setup(case, dates, fields, tmp):
+    '''
+    (feeds(), strategy class, strategy kwargs) of a case; feeds() builds the
+    feeds and is part of the timed run
+    '''
+    if case in ('momentum', 'connorsrsi', 'donchian'):
+        if case == 'momentum':
+            from indicators import Momentum
+            indcls, indparams = Momentum, dict(period=90)
+        elif case == 'connorsrsi':
+            from rsiConnors import ConnorsRSI as indcls
+            indparams = {}
+        else:
+            from donchain import DonchianChannels as indcls
+            indparams = {}
+        return (lambda: numpy_feeds(dates, fields)), Hold, dict(indcls=indcls, indparams=indparams)
+
+    if case == 'crossmr':
+        from strategy import CrossSectionalMR
+        return (lambda: numpy_feeds(dates, fields)), CrossSectionalMR, {}
+
+    if case == 'st':
+        import screening
+
+        class QuietSt(screening.St):
+            def log(self, arg):
+                pass  # St prints every order
+
+        return (lambda: numpy_feeds(dates, fields, npy=True)), QuietSt, {}
+
+    if case == 'numpyfeed':
+        return (lambda: numpy_feeds(dates, fields)), Hold, {}
+
+    csvdir = os.path.join(tmp, 'csv')
+    os.makedirs(csvdir)
+    write_csvdir(csvdir, dates, fields)
+    fnames = sorted(os.path.join(csvdir, f) for f in os.listdir(csvdir))
+
+    if case == 'pricestore':
+        import pricestore
+        path = os.path.join(tmp, 'store')
+        pricestore.import_csv(csvdir, path)
+
+        def feeds():
+            store = pricestore.PriceStore(path)
+            return [store.feed(symbol) for symbol in store.symbols]
+        return feeds, Hold, {}
+
+    import screening
+    if case == 'csvfeed':
+        return (lambda: [screening.NetPayOutData(dataname=f) for f in fnames]), Hold, {}
+
+    if case == 'feedcache':
+        os.chdir(tmp)  # the sidecars go to ./.feedcache
+        screening.cached_feeds(fnames, workers=1)  # warm: the timed runs read the sidecars
+
+        def feeds():
+            return screening.cached_feeds(fnames, workers=1)
+        return feeds, Hold, {}
+
+    raise ValueError('unknown case %r' % case)
+
+
+def measure(case, nsymbols, years, repeat, seed=0):
+    '''Metrics of one case over one universe (run in its own process)'''
+    dates, fields = universe(nsymbols, years, seed)
+    tmp = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        feeds, stcls, stkwargs = case_setup(case, dates, fields, tmp)
+        seconds, latencies, bars = [], [], 0
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            cerebro = bt.Cerebro(stdstats=False)
+            for data in feeds():
+                cerebro.adddata(data)
+            cerebro.broker.setcash(1_000_000)
+            cerebro.addanalyzer(BarClock, _name='barclock')
+            cerebro.addstrategy(stcls, **stkwargs)
+            st = cerebro.run()[0]
+            seconds.append(time.perf_counter() - t0)
+            latencies += st.analyzers.barclock.latencies
+            bars = len(st)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp)
+
+    best = min(seconds)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1e3 if latencies else (0, 0, 0)
+    return dict(seconds=best, bars=bars, bars_per_sec=nsymbols * bars / best,
+                symbols_per_sec=nsymbols / best, p50_ms=p50, p95_ms=p95, p99_ms=p99,
+                peak_rss_mb=peak_rss())
+
+
+def run_case(case, nsymbols, years, repeat):
+    # a fresh interpreter per case: peak RSS and caches are the case's own
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(measure, (case, nsymbols, years, repeat))
+
+
+def regressions(result, base, tolerance):
+    '''Metrics of result worse than the baseline's by more than tolerance'''
+    worse = []
+    for metric, higher_is_better in (('bars_per_sec', True), ('p95_ms', False),
+                                     ('peak_rss_mb', False)):
+        old, new = base.get(metric), result[metric]
+        if not old:
+            continue
+        change = new / old - 1
+        if (change < -tolerance) if higher_is_better else (change > tolerance):
+            worse.append('%s %+.0f%%' % (metric, 100 * change))
+    return worse
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path, obj):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(obj, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Strategy / indicator / data path benchmark suite')
+    parser.add_argument('--symbols', type=int, nargs='+', default=[10, 100],
+                        help='universe sizes, %d to %d symbols' % SYMBOLS)
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 5],
+                        help='history lengths, %d to %d years' % YEARS)
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=CASES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    parser.add_argument('--history', default='bench-history.json')
+    parser.add_argument('--baseline', default='bench-baseline.json')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store these results as the baseline')
+    args = parser.parse_args()
+    if not all(SYMBOLS[0] <= n <= SYMBOLS[1] for n in args.symbols):
+        parser.error('--symbols must be between %d and %d' % SYMBOLS)
+    if not all(YEARS[0] <= n <= YEARS[1] for n in args.years):
+        parser.error('--years must be between %d and %d' % YEARS)
+
+    baseline = read_json(args.baseline, {})
+    results, failed, flagged = {}, {}, []
+    print('%-11s %10s %9s %8s %11s %8s %7s %7s %7s %8s' % (
+        'case', 'universe', 'bars', 'seconds', 'bars/s', 'sym/s', 'p50 ms', 'p95 ms',
+        'p99 ms', 'RSS MB'))
+    for case in args.cases:
+        for nsymbols in args.symbols:
+            for years in args.years:
+                key = '%s/%dx%d' % (case, nsymbols, years)
+                try:
+                    r = results[key] = run_case(case, nsymbols, years, args.repeat)
+                except Exception as e:
+                    # e.g. a missing dependency: the other cases still run
+                    failed[key] = '%s: %s' % (type(e).__name__, e)
+                    print('%-11s %10s  FAILED %s' % (case, '%dx%d' % (nsymbols, years), failed[key]))
+                    continue
+                worse = regressions(r, baseline[key], args.tolerance) if key in baseline else []
+                if worse:
+                    flagged.append(key)
+                print('%-11s %10s %9d %8.3f %11.0f %8.1f %7.3f %7.3f %7.3f %8.1f  %s' % (
+                    case, '%dx%d' % (nsymbols, years), r['bars'], r['seconds'],
+                    r['bars_per_sec'], r['symbols_per_sec'], r['p50_ms'], r['p95_ms'],
+                    r['p99_ms'], r['peak_rss_mb'],
+                    ('REGRESSION ' + ', '.join(worse)) if worse else
+                    ('ok' if key in baseline else 'no baseline')))
+
+    history = read_json(args.history, [])
+    history.append(dict(time=datetime.datetime.now().isoformat(timespec='seconds'),
+                        commit=git_commit(), python=platform.python_version(),
+                        machine=platform.machine(), cpus=os.cpu_count(),
+                        repeat=args.repeat, results=results, failed=failed))
+    write_json(args.history, history)
+    if args.save_baseline:
+        baseline.update(results)
+        write_json(args.baseline, baseline)
+        print('baseline: %d results in %s' % (len(baseline), args.baseline))
+
+    if failed:
+        print('%d failed: %s' % (len(failed), ' '.join(failed)))
+    if flagged:
+        print('%d regressions: %s' % (len(flagged), ' '.join(flagged)))
+    if failed or flagged:
+        sys.exit(1)
@@ -0,0 +1,99 @@
+# Rows/sec and peak RSS of the streaming Tiingo writer against the old
+# json.loads + per-row f.write path, on a recorded-style payload served locally
+#   python bench-tiingo.py [--rows 500000]
+
+import argparse
+import functools
+import http.server
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import requests
+
+import tiingo
+from profiling import peak_rss
+
+
+def make_payload(path, rows):
+    day = date(1970, 1, 2)
+    with open(path, 'w') as f:
+        f.write('[')
+        for i in range(rows):
+            price = 100.0 + (i % 977) * 0.01
+            f.write(('' if i == 0 else ',') + json.dumps(dict(
+                date=day.isoformat() + 'T00:00:00.000Z', close=price, high=price + 1, low=price - 1,
+                open=price, volume=1000 + i, adjClose=price * 0.9, adjHigh=price + 1, adjLow=price - 1,
+                adjOpen=price, adjVolume=1000 + i, divCash=0.0, splitFactor=1.0)))
+            day += timedelta(days=1)
+        f.write(']')
+
+
+def old_download(url, path):
+    # what get-tiigo-data.py used to do
+    response = requests.get(url, headers=tiingo.HEADERS)
+    jsonData = json.loads(response.text)
+    f = open(path, 'w')
+    f.write('Date,Open,High,Low,Close,Adj Close,Volume\n')
+    for data in jsonData:
+        f.write(data['date'][0:10] + ',' + str(data['open']) + ',' + str(data['high']) + ',' + str(data['low'])
+                + ',' + str(data['close']) + ',' + str(data['adjClose']) + ',' + str(data['volume']) + '\n')
+    f.close()
+    return len(jsonData)
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(directory):
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def child(mode, url, out):
+    t0 = time.perf_counter()
+    if mode == 'old':
+        rows = old_download(url % ('FIX', '', '', ''), out)
+    else:
+        rows = tiingo.download('FIX', datetime.now(), datetime.now(), out, '', url=url)
+    elapsed = time.perf_counter() - t0
+    peak = peak_rss()
+    print(json.dumps(dict(rows=rows, seconds=elapsed, peak_mb=peak)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tiingo ingestion benchmark')
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--child', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        sys.exit()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_payload(os.path.join(tmp, 'FIX.json'), args.rows)
+        server = serve(tmp)
+        url = 'http://127.0.0.1:%d/%%s.json?startDate=%%s&endDate=%%s&token=%%s' % server.server_port
+        size = os.path.getsize(os.path.join(tmp, 'FIX.json')) / 1e6
+        print('payload: %d rows, %.1f MB' % (args.rows, size))
+
+        outputs = {}
+        for mode in ('old', 'stream'):
+            out = os.path.join(tmp, mode + '.txt')
+            res = json.loads(subprocess.check_output(
+                [sys.executable, __file__, '--child', mode, url, out]))
+            outputs[mode] = open(out).read()
+            print('%-7s %9.0f rows/s  peak RSS %7.1f MB'
+                  % (mode, res['rows'] / res['seconds'], res['peak_mb']))
+        server.shutdown()
+        print('identical output: %s' % (outputs['old'] == outputs['stream']))
@@ -0,0 +1,260 @@
+'''
+ConnorsRSI, bar by bar and in batch
+
+    (RSI(close, 3) + RSI(streak, 2) + PercentRank(ROC(close, 1), 100)) / 3
+
+the same lines as rsiConnors.ConnorsRSI: Wilder RSIs seeded with the mean
+of the first moves (a zero average loss gives 100, or 50 when nothing
+moved, like bt's RSI with safediv), the up/down streak counter and the
+share of the last `prank` one-day returns below the current one, in %.
+
+StreamingConnorsRSI takes one price at a time; the percent rank keeps its
+window in a sorted list, so an update is O(log prank) instead of a rescan
+(sortedcontainers.SortedList; without it a plain list kept sorted with
+bisect, O(prank) inserts).
+connors_rsi computes whole arrays (one column per symbol) with NumPy and
+screen() scores the whole price store on its latest bar.
+'''
+import bisect
+import collections
+import os
+import time
+from concurrent import futures
+
+import numpy as np
+import pandas as pd
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:  # optional: a plain sorted list, O(prank) per update
+    class SortedList(list):
+        def add(self, value):
+            bisect.insort(self, value)
+
+        def remove(self, value):
+            del self[bisect.bisect_left(self, value)]
+
+        def bisect_left(self, value):
+            return bisect.bisect_left(self, value)
+
+import pricestore
+from bank import smoothed_average
+
+
+def _rsi_value(avgup, avgdown):
+    if avgdown == 0:
+        return 100.0 if avgup else 50.0
+    return 100.0 - 100.0 / (1.0 + avgup / avgdown)
+
+
+class StreamingRSI(object):
+    '''Wilder RSI of a stream of values, NaN until `period` moves are in'''
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 1.0 / period
+        self.prev = None
+        self.moves = 0
+        self.avgup = self.avgdown = 0.0
+
+    def update(self, value):
+        if self.prev is None:
+            self.prev = value
+            return float('nan')
+
+        change = value - self.prev
+        self.prev = value
+        up, down = max(change, 0.0), max(-change, 0.0)
+        self.moves += 1
+        if self.moves <= self.period:
+            # seed: mean of the first `period` moves
+            self.avgup += up / self.period
+            self.avgdown += down / self.period
+            if self.moves < self.period:
+                return float('nan')
+        else:
+            self.avgup = self.avgup * (1.0 - self.alpha) + up * self.alpha
+            self.avgdown = self.avgdown * (1.0 - self.alpha) + down * self.alpha
+        return _rsi_value(self.avgup, self.avgdown)
+
+
+class StreamingPercentRank(object):
+    '''
+    Share of the last `period` values (current included) below the current
+    one, NaN until the window is full. O(log period) per update.
+    '''
+
+    def __init__(self, period):
+        self.period = period
+        self.window = collections.deque()
+        self.ordered = SortedList()
+
+    def update(self, value):
+        self.window.append(value)
+        self.ordered.add(value)
+        if len(self.window) > self.period:
+            self.ordered.remove(self.window.popleft())
+        if len(self.window) < self.period:
+            return float('nan')
+        return self.ordered.bisect_left(value) / float(self.period)
+
+
+class StreamingConnorsRSI(object):
+    '''
+    ConnorsRSI of one symbol, updated with each new close:
+
+        crsi = StreamingConnorsRSI()
+        for close in closes:
+            value = crsi.update(close)  # NaN until prank + 1 closes are in
+
+    All the state lives on the instance.
+    '''
+
+    def __init__(self, prsi=3, pstreak=2, prank=100):
+        self.rsi = StreamingRSI(prsi)
+        self.streakrsi = StreamingRSI(pstreak)
+        self.rank = StreamingPercentRank(prank)
+        self.prev = None
+        self.streak = 0
+        self.value = float('nan')
+
+    def update(self, close):
+        rsi = self.rsi.update(close)
+        if self.prev is None:
+            self.prev = close
+            return self.value
+
+        if close > self.prev:
+            self.streak = max(1, self.streak + 1)
+        elif close < self.prev:
+            self.streak = min(-1, self.streak - 1)
+        else:
+            self.streak = 0
+        streakrsi = self.streakrsi.update(self.streak)
+        rank = self.rank.update((close - self.prev) / self.prev)
+        self.prev = close
+
+        self.value = (rsi + streakrsi + 100.0 * rank) / 3.0
+        return self.value
+
+
+def streak(closes):
+    '''Up/down streak counter along axis 0 (NaN on the first bar)'''
+    x = np.asarray(closes, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if len(x) < 2:
+        return out
+    sign = np.sign(x[1:] - x[:-1])
+    idx = np.arange(len(sign)).reshape((-1,) + (1,) * (x.ndim - 1))
+    # a run starts where the sign changes: its length is the distance to it
+    change = np.ones(sign.shape, dtype=bool)
+    change[1:] = sign[1:] != sign[:-1]
+    start = np.maximum.accumulate(np.where(change, idx, 0), axis=0)
+    out[1:] = sign * (idx - start + 1)
+    return out
+
+
+def rsi(values, period):
+    '''Wilder RSI along axis 0, each column from its first non-NaN value on'''
+    x = np.asarray(values, dtype=np.float64)
+    change = np.full(x.shape, np.nan)
+    change[1:] = x[1:] - x[:-1]
+    avgup = smoothed_average(np.maximum(change, 0.0), period, 1)
+    avgdown = smoothed_average(np.maximum(-change, 0.0), period, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = 100.0 - 100.0 / (1.0 + avgup / avgdown)
+    out[avgdown == 0] = np.where(avgup[avgdown == 0] > 0, 100.0, 50.0)
+    return out
+
+
+def percent_rank(values, period):
+    '''
+    Share of the last `period` values below the current one along axis 0,
+    NaN while the window holds a NaN
+    '''
+    x = np.asarray(values, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    n = len(x)
+    if n < period:
+        return out
+    current = x[period - 1:]
+    below = np.zeros(current.shape)
+    for k in range(period - 1):
+        below += x[k:n - period + 1 + k] < current
+    nans = np.concatenate([np.zeros((1,) + x.shape[1:]), np.cumsum(np.isnan(x), axis=0)])
+    out[period - 1:] = np.where(nans[period:] > nans[:-period], np.nan, below / float(period))
+    return out
+
+
+def connors_rsi(closes, prsi=3, pstreak=2, prank=100):
+    '''
+    ConnorsRSI of a close array along axis 0, one column per symbol for a
+    (bars x symbols) matrix. Each column starts at its first non-NaN close.
+    '''
+    x = np.asarray(closes, dtype=np.float64)
+    roc = np.full(x.shape, np.nan)
+    roc[1:] = (x[1:] - x[:-1]) / x[:-1]
+    return (rsi(x, prsi) + rsi(streak(x), pstreak) + 100.0 * percent_rank(roc, prank)) / 3.0
+
+
+def _score(job):
+    # ConnorsRSI of a chunk of the store's symbols, over their own bars:
+    # (symbol, position of the last bar, last value, previous value). The
+    # bars of each symbol are packed to the top of a (bars x symbols) block,
+    # so all columns start on row 0 and run through one connors_rsi call
+    path, symbols, prsi, pstreak, prank = job
+    store = pricestore.PriceStore(path)
+    closes = store.field('close')
+    rows = np.asarray(closes[[store.index[symbol] for symbol in symbols]], dtype=np.float64)
+    valid = ~np.isnan(rows)
+    counts = valid.sum(axis=1)
+    keep = np.flatnonzero(counts >= 2)
+    if not len(keep):
+        return []
+    rows, valid, counts = rows[keep], valid[keep], counts[keep]
+    block = np.full((counts.max(), len(keep)), np.nan)
+    col, bar = np.nonzero(valid)
+    block[(np.cumsum(valid, axis=1) - 1)[col, bar], col] = rows[col, bar]
+    crsi = connors_rsi(block, prsi, pstreak, prank)
+    cols = np.arange(len(keep))
+    last = len(valid[0]) - 1 - valid[:, ::-1].argmax(axis=1)
+    return [(symbols[i], int(bar), cur, prev) for i, bar, cur, prev
+            in zip(keep, last, crsi[counts - 1, cols], crsi[counts - 2, cols])]
+
+
+def screen(csvdir='spy', path='spy-store', lower=10.0, upper=90.0, workers=None,
+           prsi=3, pstreak=2, prank=100):
+    '''
+    ConnorsRSI of every symbol of the price store on the latest bar, the
+    universe split in chunks over a process pool (workers map the store).
+
+    Returns (DataFrame of the symbols with crsi <= lower or >= upper, sorted
+    by crsi, with the previous value and whether they just entered the
+    zone; dict of seconds spent per stage: load, compute, rank).
+    '''
+    timing = collections.OrderedDict()
+    t0 = time.perf_counter()
+    store = pricestore.load(csvdir, path)
+    timing['load'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    workers = workers or os.cpu_count()
+    chunks = [store.symbols[i::workers] for i in range(workers)]
+    jobs = [(path, chunk, prsi, pstreak, prank) for chunk in chunks if chunk]
+    if workers == 1:
+        results = [_score(job) for job in jobs]
+    else:
+        with futures.ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(_score, jobs))
+    timing['compute'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    latest = len(store.dates) - 1
+    scores = pd.DataFrame([r for chunk in results for r in chunk if r[1] == latest],
+                          columns=['symbol', 'bar', 'crsi', 'previous'])
+    hits = scores[(scores.crsi <= lower) | (scores.crsi >= upper)].sort_values('crsi')
+    hits = hits.assign(zone=np.where(hits.crsi <= lower, 'oversold', 'overbought'),
+                       entered=~((hits.previous <= lower) & (hits.crsi <= lower)
+                                 | (hits.previous >= upper) & (hits.crsi >= upper)))
+    timing['rank'] = time.perf_counter() - t0
+    return hits.drop(columns='bar').reset_index(drop=True), timing
@@ -2,6 +2,8 @@ from datetime import datetime
 
 import backtrader as bt 
 
+from indicators import Highest, Lowest
+
 class DonchianChannels(bt.Indicator):
     '''
     Params Note:
@@ -26,8 +28,9 @@ class DonchianChannels(bt.Indicator):
         if self.p.lookback:
             hi,lo = hi(self.p.lookback), lo(self.p.lookback)
 
-        self.l.dch = bt.ind.Highest(hi, period = self.p.period)
-        self.l.dcl = bt.ind.Lowest(lo,period=self.p.period)
+        # monotonic deque / block max instead of a window rescan per bar
+        self.l.dch = Highest(hi, period = self.p.period)
+        self.l.dcl = Lowest(lo,period=self.p.period)
         self.l.dcm = (self.l.dch + self.l.dcl)/2.0 # avg of the above
 
 
@@ -0,0 +1,159 @@
+'''
+Concurrent, rate-limited and resumable bulk downloader
+
+    fetch = lambda ticker: web.DataReader(ticker, 'iex', start, end)
+    done, failed = download_all(tickers, fetch, outdir='spy')
+
+Every finished or failed symbol is recorded in a manifest
+(``outdir/manifest.jsonl`` by default), so running the same call again after
+an interruption only downloads what is still missing.
+'''
+import json
+import os
+import random
+import threading
+import time
+from concurrent import futures
+
+
+class TokenBucket(object):
+    '''Allows `rate` calls per second on average, with bursts up to `capacity`'''
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class Manifest(object):
+    '''
+    Completed and failed symbols of a bulk download, in a log with one JSON
+    line per update (appended, so an update costs the same for the first
+    symbol as for the last). The log starts with its `key`: one written for
+    another key (e.g. another history length) is ignored. A half written
+    last line, from a killed run, is skipped; the log is rewritten compacted
+    when opened.
+    '''
+
+    def __init__(self, path, key=None):
+        self.path = path
+        self.key = key
+        self.lock = threading.Lock()
+        self.done, self.failed = {}, {}
+        if os.path.exists(path):
+            with open(path) as f:
+                lines = f.read().splitlines()
+            entries = []
+            for line in lines:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break  # cut short by a crash
+            if entries and entries[0].get('key') == key:
+                for entry in entries[1:]:
+                    self._apply(entry)
+        self._rewrite()
+
+    def _apply(self, entry):
+        ticker = entry['ticker']
+        if 'error' in entry:
+            self.failed[ticker] = entry['error']
+        else:
+            self.done[ticker] = dict(rows=entry['rows'], at=entry['at'])
+            self.failed.pop(ticker, None)
+
+    def _rewrite(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(json.dumps(dict(key=self.key)) + '\n')
+            for ticker, info in sorted(self.done.items()):
+                f.write(json.dumps(dict(info, ticker=ticker)) + '\n')
+            for ticker, error in sorted(self.failed.items()):
+                f.write(json.dumps(dict(ticker=ticker, error=error)) + '\n')
+        os.replace(tmp, self.path)
+
+    def _append(self, entry):
+        with self.lock:
+            self._apply(entry)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+    def mark_done(self, ticker, rows):
+        self._append(dict(ticker=ticker, rows=rows, at=time.strftime('%Y-%m-%dT%H:%M:%S')))
+
+    def mark_failed(self, ticker, error):
+        self._append(dict(ticker=ticker, error='{}: {}'.format(type(error).__name__, error)))
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def save_csv(df, path):
+    # write next to the target and rename, a killed run never leaves half a file
+    tmp = path + '.tmp'
+    df.to_csv(tmp)
+    os.replace(tmp, path)
+
+
+def download_all(tickers, fetch, outdir='spy', manifest=None, key=None, workers=8,
+                 rate=5.0, retries=3, backoff=1.0, save=save_csv, progress=None,
+                 keep_manifest=True):
+    '''
+    Download `tickers` with `fetch(ticker) -> DataFrame` and save each one to
+    outdir/{ticker}.csv (with `save=None` fetch is expected to store the data
+    itself, e.g. through refresh.update, and may return a row count).
+
+    `workers` threads share a token bucket of `rate` requests per second. A
+    failed fetch is retried `retries` times with exponential backoff (plus
+    jitter) starting at `backoff` seconds; symbols that still fail are
+    recorded and do not stop the run. Runs with the same `key` resume from the
+    manifest; with keep_manifest=False it is removed once every symbol was
+    tried, so only an interrupted run is resumed and the next one starts
+    over. Returns its (done, failed) dicts.
+    '''
+    os.makedirs(outdir, exist_ok=True)
+    manifest = Manifest(manifest or os.path.join(outdir, 'manifest.jsonl'), key)
+    bucket = TokenBucket(rate)
+
+    def work(ticker):
+        for attempt in range(retries + 1):
+            bucket.acquire()
+            try:
+                df = fetch(ticker)
+                if save is not None:
+                    save(df, os.path.join(outdir, '{}.csv'.format(ticker)))
+            except Exception as e:
+                if attempt == retries:
+                    manifest.mark_failed(ticker, e)
+                    return False
+                time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+            else:
+                manifest.mark_done(ticker, df if isinstance(df, int) else len(df))
+                return True
+
+    todo = [t for t in dict.fromkeys(tickers) if t not in manifest.done]
+    with futures.ThreadPoolExecutor(workers) as executor:
+        jobs = [executor.submit(work, t) for t in todo]
+        for job in futures.as_completed(jobs):
+            job.result()
+            if progress is not None:
+                progress.update(1)
+
+    if not keep_manifest:
+        manifest.remove()
+    return manifest.done, manifest.failed
@@ -0,0 +1,131 @@
+'''
+Parsed-CSV cache for GenericCSVData style files
+
+Each file is parsed once (pandas' C reader, one vectorized date conversion)
+and its lines are kept as one (lines x bars) block in a binary sidecar:
+
+    {datadir}/.feedcache/{file}.{key}.npy
+
+where key hashes the file's mtime and size and the parsing spec (column
+indices, date format, headers, separator, null value). Later runs find the sidecar by
+name and load the block, without touching the text; a changed file or spec
+gets a new key, is parsed again and its old sidecar removed. The hidden
+directory is skipped by glob('*') over the datadir.
+
+    columns = dict(datetime=0, open=1, high=2, low=3, close=4, volume=5, npy=6)
+    for fname, cols in load(glob.glob('data/*'), columns, '%Y-%m-%d'):
+        NumpyData(dataname=cols.pop('datetime'), **cols)
+
+Missing files are parsed over a process pool (workers map the files and
+write the sidecars themselves).
+'''
+import hashlib
+import json
+import os
+from concurrent import futures
+
+import numpy as np
+import pandas as pd
+
+CACHEDIR = '.feedcache'
+
+
+def sidecar(fname, spec):
+    '''Path of the sidecar of the file as it is now, for the parsing spec'''
+    st = os.stat(fname)
+    key = hashlib.sha1(json.dumps([st.st_mtime_ns, st.st_size, spec]).encode()).hexdigest()
+    head, tail = os.path.split(fname)
+    return os.path.join(head, CACHEDIR, '%s.%s.npy' % (tail, key[:16]))
+
+
+def _spec(columns, dtformat, headers, separator, nullvalue):
+    return [sorted(columns.items()), dtformat, headers, separator, repr(float(nullvalue))]
+
+
+def parse(fname, columns, dtformat='%Y-%m-%d', headers=True, separator=',',
+          nullvalue=float('NaN')):
+    '''
+    Dict of line name -> float64 array (datetime64[us] for 'datetime') from
+    the `columns` (line name -> column index, < 0 or None for absent lines,
+    which are left out). `dtformat` is a strptime format, or 1 / 2 for int /
+    float Unix timestamps as in GenericCSVData. Empty fields are
+    `nullvalue`, like GenericCSVData's.
+    '''
+    usecols = {name: col for name, col in columns.items() if col is not None and col >= 0}
+    dtypes = {usecols['datetime']: str} if 'datetime' in usecols else None
+    df = pd.read_csv(fname, sep=separator, header=None, skiprows=1 if headers else 0,
+                     usecols=sorted(set(usecols.values())), dtype=dtypes)
+    out = {}
+    for name, col in usecols.items():
+        if name == 'datetime':
+            if dtformat in (1, 2):
+                dt = pd.to_datetime(df[col].astype(int if dtformat == 1 else float), unit='s')
+            else:
+                dt = pd.to_datetime(df[col], format=dtformat)
+            out[name] = dt.values.astype('datetime64[us]')
+        else:
+            values = df[col].values.astype(np.float64)
+            if not np.isnan(nullvalue):
+                values[np.isnan(values)] = nullvalue
+            out[name] = values
+    return out
+
+
+def _write(path, cols):
+    # one float64 row per line (sorted by name), datetime64 rows bit for bit
+    names = sorted(cols)
+    block = np.empty((len(names), len(cols[names[0]]) if names else 0))
+    for row, name in zip(block, names):
+        row[:] = cols[name].view(np.float64) if name == 'datetime' else cols[name]
+
+    head, tail = os.path.split(path)
+    os.makedirs(head, exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.save(f, block)
+    os.replace(tmp, path)
+
+    # sidecars of older versions of the file
+    prefix = tail.rsplit('.', 2)[0] + '.'
+    for other in os.listdir(head):
+        if (other != tail and other.startswith(prefix) and other.endswith('.npy')
+                and len(other) == len(tail)):
+            os.remove(os.path.join(head, other))
+
+
+def _read(path, names):
+    block = np.load(path)
+    return {name: row.view('datetime64[us]') if name == 'datetime' else row
+            for name, row in zip(names, block)}
+
+
+def _parse_job(job):
+    fname, path, columns, dtformat, headers, separator, nullvalue = job
+    cols = parse(fname, columns, dtformat, headers, separator, nullvalue)
+    _write(path, cols)
+    return cols
+
+
+def load(fnames, columns, dtformat='%Y-%m-%d', headers=True, separator=',', workers=None,
+         nullvalue=float('NaN')):
+    '''
+    [(fname, dict of arrays)] for the files, in order: from the sidecars
+    when up to date, else parsed (in parallel) and cached
+    '''
+    spec = _spec(columns, dtformat, headers, separator, nullvalue)
+    names = sorted(name for name, col in columns.items() if col is not None and col >= 0)
+    paths = [sidecar(fname, spec) for fname in fnames]
+    loaded = [_read(path, names) if os.path.exists(path) else None for path in paths]
+
+    missing = [i for i, cols in enumerate(loaded) if cols is None]
+    jobs = [(fnames[i], paths[i], columns, dtformat, headers, separator, nullvalue)
+            for i in missing]
+    workers = min(workers or os.cpu_count(), len(jobs))
+    if workers <= 1:
+        parsed = [_parse_job(job) for job in jobs]
+    else:
+        with futures.ProcessPoolExecutor(workers) as pool:
+            parsed = list(pool.map(_parse_job, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+    for i, cols in zip(missing, parsed):
+        loaded[i] = cols
+    return list(zip(fnames, loaded))
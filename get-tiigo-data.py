@@ -1,32 +1,35 @@
-import requests
-import json
 from datetime import datetime, timedelta
+
+import refresh
+import tiingo
+from downloader import download_all
 from config import TIIGO_SESSION_ID
 # cookies = {'sessionid': TIIGO_SESSION_ID}
-headers = {
-    'Content-Type': 'application/json'
-}
 ETFs =['SPY', 'SH', 'VXX', 'EEM', 'QQQ', 'PSQ', 'XLF', 'GDX', 'HYG', 'EFA', 'IAU', 'XOP', 'IWM', 'FXI', 'SLV', 'USO', 'XLE', 'IEMG', 'AMLP', 'EWZ', 'XLK', 'XLI', 'VWO', 'GLD', 'XLP', 'JNK', 'EWJ', 'XLU', 'VEA', 'IEFA', 'XLV', 'PFF', 'VIXY', 'TLT', 'GDXJ', 'LQD', 'XLB', 'BKLN', 'XLY', 'SMH', 'OIH', 'ASHR', 'RSX', 'MCHI', 'VTI', 'EWH', 'SPLV', 'KRE', 'IVV', 'DIA', 'IEF', 'EZU', 'EWT', 'SPDW', 'VOO', 'SCHF', 'EWY', 'MYY', 'DOG', 'EUM']
-for ticker in ETFs:
-    print ("working on: {}".format(ticker))
-    period = 365
-    endDate = datetime.today().strftime('%Y-%m-%d')
-    startDate = (datetime.today() - timedelta(days=period)).strftime('%Y-%m-%d')
-    url = "https://api.tiingo.com/tiingo/daily/%s/prices?startDate=%s&endDate=%s&token=%s" % (ticker, startDate, endDate,TIIGO_SESSION_ID)
 
-    response = requests.get(url, headers=headers)
-    jsonData = {}
-    print (response.status_code)
-    if response.status_code == 200:
-        jsonData = json.loads(response.text)
-        if jsonData:
-            filename = 'data/%s_%s_%s.txt' % (ticker, startDate, endDate)
-            f = open(filename, "w")
-            f.write('Date,Open,High,Low,Close,Adj Close,Volume\n')
-            for data in jsonData:
+period = 365
+endDate = datetime.today()
+startDate = endDate - timedelta(days=period)
 
-                f.write(data['date'][0:10] +',' +str(data['open']) +',' +str(data['high']) +',' +str(data['low'])  
-                                           +',' +str(data['close']) +',' +str(data['adjClose']) +',' +str(data['volume']) +'\n')
+def update(ticker):
+    # one canonical file per ticker: only the days after its last bar are
+    # downloaded and appended, a full history (new ticker or revised prices)
+    # is streamed from the response straight to disk
+    filename = 'data/%s.txt' % ticker
+    rows = refresh.update(
+        filename,
+        lambda s, e: tiingo.fetch(ticker, s, e, TIIGO_SESSION_ID),
+        startDate, endDate,
+        download=lambda path, s, e: tiingo.download(ticker, s, e, path, TIIGO_SESSION_ID))
+    print ('file: %s, %d new rows' % (filename, rows))
+    return rows
 
-            f.close()
-            print ('file: %s created' % filename)
\ No newline at end of file
+# a ticker whose request fails (404, 500, ...) is retried with backoff, then
+# reported; the others are still refreshed. An interrupted run resumes from
+# data/manifest.jsonl
+done, bad = download_all(ETFs, update, outdir='data', save=None,
+                         key='data, %d days' % period, keep_manifest=False,
+                         workers=4, rate=5)
+print ('%d done, %d failed' % (len(done), len(bad)))
+for ticker, error in bad.items():
+    print (ticker, error)
@@ -1,27 +1,43 @@
-from concurrent import futures 
 from datetime import datetime 
 import pandas as pd
 import pandas_datareader.data as web
 import tqdm
 
+import refresh
 from config import IEX_API_KEY
+from downloader import download_all
 
 print (IEX_API_KEY)
 
 end = datetime.now() 
 start = datetime(end.year - 5, end.month , end.day)
-bad = []
 
 def download(ticker):
-    df = web.DataReader(ticker,'iex', start, end,api_key=IEX_API_KEY)
-    df.to_csv(f"spy/{ticker}.csv")
+    # only the bars after the last stored date are fetched and appended; a new
+    # symbol (or one whose history was revised) gets the full 5 years
+    return refresh.update(
+        f"spy/{ticker}.csv",
+        lambda s, e: web.DataReader(ticker,'iex', s, e,api_key=IEX_API_KEY),
+        start, end)
 
 tickers = pd.read_csv("spy/tickers.csv")["0"].tolist()
 # print (tickers["0"].tolist())
 print (tickers)
 print (len(tickers))
 
-for ticker in tqdm.tqdm(tickers):
-    download(ticker)
-# with futures.ThreadPoolExecutor(50) as executor: 
-#     res = executor.map(download, tickers) 
\ No newline at end of file
+# concurrent, rate limited and resumable: spy/manifest.jsonl records what is
+# done, so an interrupted run picks up where it stopped, even on another day.
+# It is keyed on the output directory and the history length, not on today's
+# date, and removed once a run gets through every ticker: the next run
+# refreshes them all again
+with tqdm.tqdm(total=len(tickers)) as progress:
+    done, bad = download_all(tickers, download, outdir="spy", save=None,
+                             key="spy, 5 years", keep_manifest=False,
+                             workers=16, rate=10, progress=progress)
+print (f"{len(done)} done, {len(bad)} failed")
+for ticker, error in bad.items():
+    print (ticker, error)
+
+# rebuild the columnar store from the fresh CSV files
+import pricestore
+pricestore.import_csv("spy")
@@ -0,0 +1,155 @@
+'''
+Vectorized Hull Moving Average reversal screener
+
+Computes the same HMA as bt.indicators.HullMovingAverage on a (bars x
+tickers) matrix, finds the trough/peak reversals of the screener's
+TestStrategy as array operations and replays its buy/sell rules on the
+(sparse) signal bars only, so the whole ETF universe screens without
+building a single Cerebro.
+'''
+import datetime
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def wma(x, period):
+    '''Weighted moving average along axis 0, NaN until `period` bars are in'''
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(x.shape, np.nan)
+    if len(x) < period:
+        return out
+    weights = np.arange(1.0, period + 1.0) * (2.0 / (period * (period + 1.0)))
+    out[period - 1:] = sliding_window_view(x, period, axis=0) @ weights
+    return out
+
+
+def hma(x, period):
+    '''Hull moving average along axis 0, as bt.indicators.HullMovingAverage'''
+    raw = 2.0 * wma(x, period // 2) - wma(x, period)
+    return wma(raw, int(pow(period, 0.5)))
+
+
+def reversals(h):
+    '''
+    (troughs, peaks) masks: hma[-2] >= hma[-1] < hma[0] and
+    hma[-2] <= hma[-1] > hma[0]
+    '''
+    troughs = np.zeros(h.shape, dtype=bool)
+    peaks = np.zeros(h.shape, dtype=bool)
+    h2, h1, h0 = h[:-2], h[1:-1], h[2:]
+    troughs[2:] = (h2 >= h1) & (h1 < h0)
+    peaks[2:] = (h2 <= h1) & (h1 > h0)
+    return troughs, peaks
+
+
+def replay(opens, closes, troughs, peaks, cash=1000.0, stake=1):
+    '''
+    TestStrategy on one ticker: buy `stake` on a trough when flat, sell on a
+    peak when long, market orders filled at the next open. A buy the cash
+    cannot pay for is rejected, as the broker checks it twice: at the close
+    of the signal bar (submission) and at the open it fills at. Only the
+    signal bars are visited.
+
+    Returns (final value, bar indices of the executed buys).
+    '''
+    n = len(closes)
+    buys = np.flatnonzero(troughs)
+    sells = np.flatnonzero(peaks)
+    position, fills, i = 0, [], 0
+    while True:
+        if not position:
+            k = np.searchsorted(buys, i)
+            if k == len(buys) or buys[k] + 1 >= n:
+                break
+            fill = buys[k] + 1
+            price = opens[fill] * stake
+            if closes[buys[k]] * stake <= cash and price <= cash:
+                cash -= price
+                position = stake
+                fills.append(fill)
+        else:
+            k = np.searchsorted(sells, i)
+            if k == len(sells) or sells[k] + 1 >= n:
+                break
+            fill = sells[k] + 1
+            cash += opens[fill] * position
+            position = 0
+        # the order is pending on the signal bar, the next signal can come
+        # on the fill bar at the earliest
+        i = fill
+
+    return cash + position * closes[-1], fills
+
+
+def align(arrays, fromdate, todate):
+    '''
+    Stack the bars of every ticker within [fromdate, todate] into right
+    aligned (bars x tickers) matrices (NaN padded at the top). Each column
+    holds only its own bars, as the ticker's data feed would.
+    '''
+    lo, hi = bt.date2num(fromdate), bt.date2num(todate)
+    picked = {}
+    for ticker, cols in arrays.items():
+        dts = cols['datetime']
+        a, b = np.searchsorted(dts, lo, 'left'), np.searchsorted(dts, hi, 'right')
+        picked[ticker] = slice(a, b)
+
+    length = max([s.stop - s.start for s in picked.values()] or [0])
+    out = {}
+    for field in ('datetime', 'open', 'close'):
+        m = np.full((length, len(arrays)), np.nan)
+        for j, (ticker, rows) in enumerate(picked.items()):
+            src = arrays[ticker][field][rows]
+            m[length - len(src):, j] = src
+        out[field] = m
+    return out
+
+
+def screen(arrays, periods=range(15, 30), optdays=365, signaldays=120,
+           today=None, cash=1000.0, stake=1):
+    '''
+    HMA screener over many tickers (`arrays` maps ticker -> dict of
+    datetime/open/close arrays, e.g. optimize.read_yahoo_csv).
+
+    Section (1): the HMA period with the best final value over the last
+    `optdays` days. Section (2): the last executed buy with that period over
+    the last `signaldays` days.
+
+    Returns a DataFrame of ticker, best_period, last_buy, signal.
+    '''
+    today = today or datetime.datetime.today()
+    todate = datetime.datetime(today.year, today.month, today.day)
+    tickers = list(arrays)
+
+    def window(days):
+        start = today - datetime.timedelta(days=days)
+        return align(arrays, datetime.datetime(start.year, start.month, start.day), todate)
+
+    opt = window(optdays)
+    best = {}
+    for period in periods:
+        troughs, peaks = reversals(hma(opt['close'], period))
+        for j, ticker in enumerate(tickers):
+            rows = ~np.isnan(opt['close'][:, j])
+            value, _ = replay(opt['open'][rows, j], opt['close'][rows, j],
+                              troughs[rows, j], peaks[rows, j], cash, stake)
+            # ties go to the larger period, like max((value, period))
+            if ticker not in best or (value, period) > best[ticker]:
+                best[ticker] = (value, period)
+
+    sig = window(signaldays)
+    records = []
+    for j, ticker in enumerate(tickers):
+        period = best[ticker][1]
+        rows = ~np.isnan(sig['close'][:, j])
+        troughs, peaks = reversals(hma(sig['close'][rows, j], period))
+        _, fills = replay(sig['open'][rows, j], sig['close'][rows, j],
+                          troughs, peaks, cash, stake)
+        last = bt.num2date(sig['datetime'][rows, j][fills[-1]]).date() if fills else None
+        records.append(dict(ticker=ticker, best_period=period, last_buy=last,
+                            signal=last is not None and (today.date() - last).days < 2))
+
+    return pd.DataFrame(records, columns=['ticker', 'best_period', 'last_buy', 'signal'])
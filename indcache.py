@@ -0,0 +1,304 @@
+'''
+Persistent indicator cache
+
+Indicator values are stored on disk keyed by what they are computed from:
+a hash of the input data (the preloaded line buffers, or the array/frame
+values), the indicator class (name and source) and its parameters. A run
+over unchanged files gets them back memory-mapped instead of recomputing;
+changed data hashes to another key and is computed (and stored) again.
+
+    cache = IndicatorCache('indicator-cache', maxbytes=1 << 30)
+
+    # backtrader, in a strategy's __init__ (the datas must be preloaded)
+    self.sma = cache.indicator(bt.ind.SMA, self.data.close, period=100)
+
+    # pandas / NumPy: func(values, **params) aligned with values
+    momentums = cache.compute(rolling_momentum, closes, period=90)
+
+    # opt-in: the module functions take the cache or None (no caching)
+    self.sma = indcache.indicator(cache, bt.ind.SMA, self.data.close, period=100)
+
+Layout of the cache directory:
+    {key}.npy     the values (lines x bars for indicators)
+    {key}.json    minimum period / result type
+
+Entries are evicted least recently used first (file mtime, refreshed on
+each hit) once the .npy files take more than `maxbytes`.
+
+Keys cover the code as well: the source of the indicator's / function's
+module and of the modules of the same directory it uses (e.g. Momentum ->
+indicators.py, rollingreg.py, rolling.py), the backtrader and NumPy
+versions and VERSION, bumped when the entry layout changes. Other changes
+(e.g. a module outside the repo) are not seen: clear() the cache.
+
+The values read back are those of the run that stored them: an indicator
+whose once and next computations round differently (e.g. Momentum, ~1e-11)
+gives the stored run's values in either mode.
+'''
+import array
+import hashlib
+import inspect
+import json
+import os
+import sys
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+
+def _source(obj):
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        return ''
+
+
+VERSION = 2  # of the cache entries and keys
+
+_digests = {}  # module name -> digest of its code, see _code
+
+
+def _code(obj):
+    '''
+    Digest of what obj computes with: its own source and that of its module
+    and of the modules it uses from the same directory, transitively
+    '''
+    module = sys.modules.get(getattr(obj, '__module__', None))
+    path = getattr(module, '__file__', None)
+    if path is None:  # interactive / builtin
+        return hashlib.sha1(_source(obj).encode()).hexdigest()
+    if module.__name__ not in _digests:
+        root = os.path.dirname(os.path.abspath(path))
+        h = hashlib.sha1()
+        seen, todo = set(), [module]
+        while todo:
+            mod = todo.pop()
+            if mod.__name__ in seen:
+                continue
+            seen.add(mod.__name__)
+            h.update(mod.__name__.encode())
+            h.update(_source(mod).encode())
+            for value in list(vars(mod).values()):
+                dep = value if inspect.ismodule(value) else sys.modules.get(getattr(value, '__module__', None))
+                depfile = getattr(dep, '__file__', None)
+                if depfile and os.path.dirname(os.path.abspath(depfile)) == root:
+                    todo.append(dep)
+        _digests[module.__name__] = h.hexdigest()
+    return _digests[module.__name__] + hashlib.sha1(_source(obj).encode()).hexdigest()
+
+
+def _buffers(obj):
+    # value buffers behind a data feed / indicator, or a single line
+    if isinstance(obj, bt.LineSeries):
+        return [line.array for line in obj.lines]
+    return [obj.array]
+
+
+class _Cached(bt.Indicator):
+    '''
+    Lines of `indcls(*datas, **indparams)`: read back from the cache entry
+    `key` if there is one, else computed by the indicator and stored
+    '''
+    params = (('cache', None), ('key', None), ('indcls', None), ('indparams', None))
+
+    def __init__(self):
+        self.values = self.p.cache.get(self.p.key)
+        self.stored = self.values is not None
+        if self.stored:
+            minperiod = self.p.cache.meta(self.p.key)['minperiod']
+            for line in self.lines:
+                line.updateminperiod(minperiod)
+        else:
+            inner = self.p.indcls(*self.datas, **self.p.indparams)
+            for name in self.lines.getlinealiases():
+                setattr(self.lines, name, getattr(inner.lines, name))
+
+    def _store(self):
+        n = self.buflen()
+        if self.stored or any(len(line.array) < n for line in self.lines):
+            return
+        values = np.array([np.frombuffer(line.array, dtype=np.float64)[:n] for line in self.lines])
+        self.p.cache.put(self.p.key, values, minperiod=self._minperiod)
+        self.stored = True
+
+    def _fill(self, start, end):
+        for line, values in zip(self.lines, self.values):
+            line.array[start:end] = array.array('d', values[start:end].tobytes())
+
+    def preonce(self, start, end):
+        if self.values is not None:
+            self._fill(start, end)
+
+    def once(self, start, end):
+        if self.values is not None:
+            self._fill(start, end)
+        elif end == self.buflen():
+            self._store()
+
+    def prenext(self):
+        if self.values is not None:
+            self.next()
+
+    def next(self):
+        if self.values is None:
+            if len(self) == self._clock.buflen():
+                self._store()
+            return
+        i = len(self) - 1
+        for line, values in zip(self.lines, self.values):
+            line[0] = float(values[i])
+
+
+class IndicatorCache(object):
+
+    def __init__(self, path='indicator-cache', maxbytes=1 << 30):
+        self.path = path
+        self.maxbytes = maxbytes
+        self.hits = self.misses = 0
+        self._sizes = None  # key -> bytes of the .npy, read on first put
+        self._wrappers = {}
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key, ext):
+        return os.path.join(self.path, key + ext)
+
+    @staticmethod
+    def key(buffers, name, source, params):
+        '''
+        Hash of the input buffers, the computation (name, code digest, see
+        _code) and its parameters
+        '''
+        h = hashlib.blake2b(digest_size=20)
+        for buf in buffers:
+            h.update(memoryview(buf).cast('B'))
+            h.update(b'|')
+        h.update(json.dumps([VERSION, bt.__version__, np.__version__, name,
+                             hashlib.sha1(source.encode()).hexdigest(),
+                             sorted((k, repr(v)) for k, v in params.items())]).encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        '''Memory-mapped values of the entry, or None'''
+        fname = self._file(key, '.npy')
+        try:
+            values = np.load(fname, mmap_mode='r')
+            os.utime(fname)  # recently used
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return values
+
+    def meta(self, key):
+        with open(self._file(key, '.json')) as f:
+            return json.load(f)
+
+    def put(self, key, values, **meta):
+        # the .json first: an entry exists once its .npy is in place
+        for ext, write in (('.json', lambda f: f.write(json.dumps(meta).encode())),
+                           ('.npy', lambda f: np.save(f, np.asarray(values, dtype=np.float64)))):
+            tmp = self._file(key, ext + '.tmp')
+            with open(tmp, 'wb') as f:
+                write(f)
+            os.replace(tmp, self._file(key, ext))
+
+        sizes = self._scan()
+        sizes[key] = os.path.getsize(self._file(key, '.npy'))
+        self._evict()
+
+    def _scan(self):
+        if self._sizes is None:
+            self._sizes = {f[:-4]: os.path.getsize(os.path.join(self.path, f))
+                           for f in os.listdir(self.path) if f.endswith('.npy')}
+        return self._sizes
+
+    def _evict(self):
+        sizes = self._sizes
+        total = sum(sizes.values())
+        if total <= self.maxbytes:
+            return
+        used = sorted(sizes, key=lambda k: os.path.getmtime(self._file(k, '.npy')))
+        for key in used[:-1]:  # the entry just stored stays
+            for ext in ('.npy', '.json'):
+                try:
+                    os.remove(self._file(key, ext))
+                except OSError:
+                    pass
+            total -= sizes.pop(key)
+            if total <= self.maxbytes:
+                break
+
+    def clear(self):
+        for key in list(self._scan()):
+            for ext in ('.npy', '.json'):
+                os.remove(self._file(key, ext))
+        self._sizes = {}
+
+    def indicator(self, indcls, *datas, **params):
+        '''
+        indcls(*datas, **params), inside a strategy/indicator __init__, with
+        its values cached. The datas (feeds, or lines of feeds) must be
+        preloaded; other inputs (e.g. indicators, which are only computed
+        later) get the plain indicator.
+        '''
+        buffers = [buf for d in datas for buf in _buffers(d)]
+        if not buffers or not all(len(buf) for buf in buffers):
+            return indcls(*datas, **params)
+
+        allparams = dict(indcls.params._getitems())
+        allparams.update(params)
+        name = indcls.__module__ + '.' + indcls.__qualname__
+        key = self.key(buffers, name, _code(indcls), allparams)
+
+        wrapper = self._wrappers.get(indcls)
+        if wrapper is None:
+            wrapper = type('Cached' + indcls.__name__, (_Cached,), dict(
+                lines=indcls.lines.getlinealiases(),
+                plotinfo=dict(subplot=indcls.plotinfo.subplot)))
+            self._wrappers[indcls] = wrapper
+        return wrapper(*datas, cache=self, key=key, indcls=indcls, indparams=params)
+
+    def compute(self, func, values, **params):
+        '''
+        func(values, **params) for an array / Series / DataFrame, cached. The
+        result, if a Series or DataFrame, is aligned with `values` (same
+        index; same columns for a frame) and comes back memory-mapped.
+        '''
+        arr = np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+        buffers = [arr, str(arr.shape).encode()]
+        if isinstance(values, (pd.Series, pd.DataFrame)):
+            buffers.append(np.ascontiguousarray(values.index.values).view(np.uint8))
+            if isinstance(values, pd.DataFrame):
+                buffers.append(json.dumps([str(c) for c in values.columns]).encode())
+        name = func.__module__ + '.' + func.__qualname__
+        key = self.key(buffers, name, _code(func), params)
+
+        result = self.get(key)
+        if result is None:
+            out = func(values, **params)
+            kind = 'frame' if isinstance(out, pd.DataFrame) else (
+                'series' if isinstance(out, pd.Series) else 'array')
+            self.put(key, np.asarray(out, dtype=np.float64), kind=kind)
+            return out
+
+        kind = self.meta(key)['kind']
+        if kind == 'frame':
+            return pd.DataFrame(result, index=values.index, columns=values.columns, copy=False)
+        if kind == 'series':
+            return pd.Series(result, index=values.index, name=getattr(values, 'name', None), copy=False)
+        return result
+
+
+def indicator(cache, indcls, *datas, **params):
+    '''cache.indicator(indcls, *datas, **params), the plain indicator if cache is None'''
+    if cache is None:
+        return indcls(*datas, **params)
+    return cache.indicator(indcls, *datas, **params)
+
+
+def compute(cache, func, values, **params):
+    '''cache.compute(func, values, **params), func(values, **params) if cache is None'''
+    if cache is None:
+        return func(values, **params)
+    return cache.compute(func, values, **params)
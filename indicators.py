@@ -0,0 +1,125 @@
+import collections
+import math
+from array import array
+
+import backtrader as bt
+import numpy as np
+
+from rolling import MonotonicDeque, rolling_max, rolling_min
+from rollingreg import momentum_score, rolling_regression
+
+
+class Momentum(bt.Indicator):
+    '''
+    Exponential regression momentum: annualized slope of a linear fit on the
+    log closes times the R^2 of the fit.
+
+    The regression sums are updated as one bar enters and one leaves the
+    window, so ``next`` is O(1) per bar. ``once`` computes the whole line
+    over the data array in one vectorized pass.
+    '''
+    lines = ('trend',)
+    params = (('period', 90),)
+
+    def __init__(self):
+        self.addminperiod(self.params.period)
+        self._window = collections.deque(maxlen=self.p.period)
+        self._ref = None  # log level the sums are taken around, for precision
+        self._sy = self._sxy = self._syy = 0.0
+        self._nans = 0
+
+    def _push(self, price):
+        # missing or non-positive prices are kept as None, like NaN in linregress
+        y = math.log(price) if price > 0 else None
+        if y is None:
+            self._nans += 1
+        elif self._ref is None:
+            self._ref = y
+        value = 0.0 if y is None else y - self._ref
+
+        x = len(self._window)
+        if x == self.p.period:
+            out = self._window[0]
+            if out is None:
+                self._nans -= 1
+                out = 0.0
+            # x runs 0..n-1 inside the window: dropping the oldest value moves
+            # every other value one step to the left
+            self._sxy -= self._sy - out
+            self._sy -= out
+            self._syy -= out * out
+            x -= 1
+
+        self._sxy += x * value
+        self._sy += value
+        self._syy += value * value
+        self._window.append(None if y is None else value)
+
+    def prenext(self):
+        self._push(self.data[0])
+
+    def next(self):
+        self._push(self.data[0])
+
+        if self._nans:
+            self.lines.trend[0] = float('nan')
+            return
+
+        n = float(self.p.period)
+        sx = n * (n - 1) / 2.0
+        ssxm = n * ((n - 1) * n * (2 * n - 1) / 6.0) - sx * sx
+        ssxym = n * self._sxy - sx * self._sy
+        ssym = n * self._syy - self._sy * self._sy
+
+        slope = ssxym / ssxm
+        r = ssxym / math.sqrt(ssxm * ssym) if ssym > 0 else 0.0
+        r = max(-1.0, min(1.0, r))
+        self.lines.trend[0] = momentum_score(slope, r)
+
+    def once(self, start, end):
+        period = self.p.period
+        src = np.asarray(self.data.array[start - period + 1:end])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope, _, rvalue = rolling_regression(np.log(src), period)
+        trend = momentum_score(slope[period - 1:], rvalue[period - 1:])
+        self.lines.trend.array[start:end] = array('d', trend)
+
+
+class _RollingExtreme(bt.Indicator):
+    # next keeps a monotonic deque (O(1) amortized per bar), once computes
+    # the whole line with rolling_max/rolling_min (O(n) for any period)
+    params = (('period', 1),)
+    minimum = False
+
+    def __init__(self):
+        self.addminperiod(self.p.period)
+        self._window = MonotonicDeque(self.p.period, minimum=self.minimum)
+
+    def prenext(self):
+        self._window.push(self.data[0])
+
+    def next(self):
+        self.lines[0][0] = self._window.push(self.data[0])
+
+    def once(self, start, end):
+        period = self.p.period
+        src = np.asarray(self.data.array[start - period + 1:end])
+        func = rolling_min if self.minimum else rolling_max
+        self.lines[0].array[start:end] = array('d', func(src, period)[period - 1:])
+
+
+class Highest(_RollingExtreme):
+    '''
+    Highest value of the data over the last `period` bars, as
+    bt.ind.Highest but without rescanning the window on every bar
+    '''
+    lines = ('highest',)
+
+
+class Lowest(_RollingExtreme):
+    '''
+    Lowest value of the data over the last `period` bars, as bt.ind.Lowest
+    but without rescanning the window on every bar
+    '''
+    lines = ('lowest',)
+    minimum = True
@@ -0,0 +1,74 @@
+'''
+Leveraged ETF simulation and vectorized allocation sweeps
+
+sim_leverage builds a leveraged ETF from its unleveraged proxy. simulate
+computes the equity curves of many constant-weight portfolios at once: with
+a rebalance every `interval` bars, a holding grows by its own price ratio
+since the last rebalance, so every curve is a product of price ratios and
+a (bars x weights) matrix product replaces one Cerebro run per allocation.
+
+    prices = pd.concat([upro, tmf], axis=1)
+    sweep(prices, equity=np.arange(101) / 100, intervals=(1, 5, 20, 60))
+'''
+import numpy as np
+import pandas as pd
+
+from vecbacktest import max_drawdown, normalized_return, sharpe_ratio
+
+
+def sim_leverage(proxy, leverage=1, expense_ratio=0.0, initial_value=1.0):
+    """
+    Simulates a leverage ETF given its proxy, leverage, and expense ratio.
+
+    Daily percent change is calculated by taking the daily percent change of
+    the proxy, subtracting the daily expense ratio, then multiplying by the leverage.
+    """
+    pct_change = proxy.pct_change(1)
+    pct_change = (pct_change - expense_ratio / 252) * leverage
+    sim = (1 + pct_change).cumprod() * initial_value
+    sim.iloc[0] = initial_value
+    return sim
+
+
+def simulate(prices, weights, interval=20, cash=1.0):
+    '''
+    Equity curves of constant-weight portfolios of the columns of `prices`
+    (dates x assets, no gaps), rebalanced at the close every `interval`
+    bars starting with the first one. `weights` is (portfolios x assets).
+    Fractional positions, no costs.
+
+    Returns a dates x portfolios DataFrame.
+    '''
+    p = prices.values.astype(np.float64)
+    w = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+    n = len(p)
+    starts = np.arange(0, n, interval)
+    seg = np.arange(n) // interval
+
+    # portfolio growth since the last rebalance, for every bar and portfolio
+    growth = (p / p[starts][seg]) @ w.T
+    # value carried into each period: the growth of all the previous ones
+    # up to their last bar (the next rebalance)
+    carry = np.ones((len(starts), len(w)))
+    carry[1:] = np.cumprod((p[starts[1:]] / p[starts[:-1]]) @ w.T, axis=0)
+
+    return pd.DataFrame(cash * carry[seg] * growth, index=prices.index)
+
+
+def sweep(prices, equity=np.arange(0, 101, 5) / 100, intervals=(20,)):
+    '''
+    Two asset (equity, bonds) allocation sweep: every equity weight in
+    `equity` (the rest in the second column) times every rebalance interval.
+
+    Returns a DataFrame indexed by (interval, equity) with the drawdown, cagr
+    (rnorm100) and sharpe columns the Cerebro analyzers would give.
+    '''
+    equity = np.asarray(equity, dtype=np.float64)
+    weights = np.column_stack([equity, 1.0 - equity])
+    curves = pd.concat([simulate(prices, weights, interval) for interval in intervals], axis=1)
+    curves.columns = pd.MultiIndex.from_product([intervals, equity], names=['interval', 'equity'])
+    return pd.DataFrame(dict(
+        drawdown=max_drawdown(curves),
+        cagr=normalized_return(curves),
+        sharpe=sharpe_ratio(curves),
+    ))
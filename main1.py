@@ -1,10 +1,18 @@
 import backtrader as bt
 from datetime import datetime
 
+import indcache
+
+# indicator cache: SMA values of earlier runs over the same data are read
+# back from disk, e.g. indcache.IndicatorCache('indicator-cache'); None for
+# no caching
+cache = None
+
 
 class SmaCross(bt.SignalStrategy):
     def __init__(self):
-        sma1, sma2 = bt.ind.SMA(period=10), bt.ind.SMA(period=20)
+        sma1 = indcache.indicator(cache, bt.ind.SMA, self.data, period=10)
+        sma2 = indcache.indicator(cache, bt.ind.SMA, self.data, period=20)
         crossover = bt.ind.CrossOver(sma1, sma2)
         self.signal_add(bt.SIGNAL_LONG, crossover)
 
@@ -0,0 +1,153 @@
+'''
+Point-in-time index membership (e.g. the S&P 500 from recorded iShares IVV
+holdings), for backtests free of survivorship bias
+
+Membership is kept as interval records, one row per stretch a symbol was in
+the index: (symbol, start, end), end excluded. A symbol in the holdings of
+one snapshot is a member from that date up to the next snapshot that no
+longer holds it; the intervals of the last snapshot stay open. Nothing is a
+member before the first snapshot.
+
+    members = Membership.from_holdings('holdings')
+    members.members('2015-06-30')             # ['A', 'AAL', ...]
+    mask = members.mask(closes.index, closes.columns)  # dates x symbols
+
+Queries binary search the sorted interval boundaries (O(log n)) and read a
+row of a boolean table built from the intervals, one row per boundary.
+
+Recorded holdings are files named after their as-of date (20190131.json,
+2019-01-31.csv, ...): the iShares JSON holdings response (aaData rows,
+ticker first) or a CSV with a ticker/symbol column (else its first column).
+'''
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+OPEN = np.datetime64('9999-12-31')  # end of the intervals still running
+EXTENSIONS = ('.json', '.csv')  # of the recorded holdings files
+
+
+def read_holdings(fname):
+    '''Tickers of a recorded holdings file'''
+    if fname.endswith('.json'):
+        with open(fname, encoding='utf-8-sig') as f:
+            rows = json.load(f)['aaData']
+        return [str(row[0]) for row in rows]
+
+    df = pd.read_csv(fname, dtype=str)
+    cols = [c for c in df.columns if str(c).lower() in ('ticker', 'symbol')]
+    return df[cols[0] if cols else df.columns[0]].dropna().tolist()
+
+
+class Membership(object):
+
+    def __init__(self, symbols, symbol, start, end):
+        '''
+        symbols: names; symbol, start, end: one entry per interval (position
+        in symbols, first day in the index, first day out of it)
+        '''
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.symbol = np.asarray(symbol, dtype=np.int32)
+        self.start = np.asarray(start, dtype='datetime64[D]')
+        self.end = np.asarray(end, dtype='datetime64[D]')
+
+        # boundaries: membership only changes on them. table[k] is the
+        # membership over [dates[k], dates[k + 1]) with an extra column,
+        # always False, for the symbols not in the index at all
+        self.dates = np.unique(np.concatenate([self.start, self.end]))
+        counts = np.zeros((len(self.dates) + 1, len(self.symbols) + 1), dtype=np.int32)
+        np.add.at(counts, (np.searchsorted(self.dates, self.start), self.symbol), 1)
+        np.add.at(counts, (np.searchsorted(self.dates, self.end), self.symbol), -1)
+        self.table = np.cumsum(counts, axis=0)[:-1] > 0
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @classmethod
+    def from_snapshots(cls, snapshots):
+        '''From {as-of date: tickers} (or (date, tickers) pairs)'''
+        items = sorted((np.datetime64(pd.Timestamp(date), 'D'), set(tickers))
+                       for date, tickers in dict(snapshots).items())
+        symbols = sorted(set().union(*(tickers for _, tickers in items)))
+        index = {s: i for i, s in enumerate(symbols)}
+
+        symbol, start, end = [], [], []
+        opened = {}  # symbol -> start of its running interval
+        for date, tickers in items:
+            for s in [s for s in opened if s not in tickers]:
+                symbol.append(index[s])
+                start.append(opened.pop(s))
+                end.append(date)
+            for s in tickers:
+                opened.setdefault(s, date)
+        for s, date in opened.items():
+            symbol.append(index[s])
+            start.append(date)
+            end.append(OPEN)
+        return cls(symbols, symbol, start, end)
+
+    @classmethod
+    def from_holdings(cls, path='holdings'):
+        '''
+        From a directory of recorded holdings files, one per as-of date. Other
+        files (README, *.tmp, ...) are ignored, and holdings files whose name
+        is not a date are skipped (and reported)
+        '''
+        snapshots, skipped = {}, []
+        for fname in sorted(glob.glob(os.path.join(path, '*'))):
+            stem, ext = os.path.splitext(os.path.basename(fname))
+            if ext.lower() not in EXTENSIONS:
+                continue
+            try:
+                date = pd.Timestamp(stem)
+            except ValueError:
+                skipped.append(os.path.basename(fname))
+                continue
+            snapshots[date] = read_holdings(fname)
+        if skipped:
+            print('%s: skipped %d holdings files not named after a date: %s'
+                  % (path, len(skipped), ', '.join(skipped)))
+        return cls.from_snapshots(snapshots)
+
+    def save(self, path):
+        np.savez(path, symbols=np.array(self.symbols), symbol=self.symbol,
+                 start=self.start, end=self.end)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            return cls(npz['symbols'].tolist(), npz['symbol'], npz['start'], npz['end'])
+
+    def intervals(self, symbol):
+        '''[(start, end)] of the symbol's stretches in the index'''
+        rows = self.symbol == self.index[symbol]
+        return sorted(zip(self.start[rows], self.end[rows]))
+
+    def columns(self, symbols):
+        '''Positions of the symbols in row() (the always False column if unknown)'''
+        unknown = len(self.symbols)
+        return np.array([self.index.get(s, unknown) for s in symbols], dtype=np.intp)
+
+    def row(self, date):
+        '''Boolean membership of every symbol (plus the unknown column) on date'''
+        k = np.searchsorted(self.dates, np.datetime64(date, 'D'), 'right') - 1
+        return self.table[k] if k >= 0 else np.zeros(self.table.shape[1], dtype=bool)
+
+    def members(self, date):
+        '''Symbols in the index on date'''
+        return [self.symbols[i] for i in np.flatnonzero(self.row(date)[:-1])]
+
+    def mask(self, dates, symbols):
+        '''
+        dates x symbols boolean array, True where the symbol was in the index
+        on that date: aligned to a price matrix (e.g. closes.index/columns)
+        '''
+        days = np.asarray(pd.DatetimeIndex(dates).values.astype('datetime64[D]'))
+        k = np.searchsorted(self.dates, days, 'right') - 1
+        out = self.table[np.maximum(k, 0)][:, self.columns(symbols)]
+        out[k < 0] = False
+        return out
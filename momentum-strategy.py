@@ -7,23 +7,29 @@ import os
 plt.rcParams["figure.figsize"] = (10, 6) # (w, h)
 plt.ioff()
 
-tickers = os.listdir("./spy")
-
-tickers.remove("tickers.csv")
-
-tickers = [ ticker.split(".")[0] for ticker in tickers]
-
-stocks = (
-    (pd.concat(
-        [pd.read_csv(f"spy/{ticker}.csv", index_col='date', parse_dates=True)[
-            'close'
-        ].rename(ticker)
-        for ticker in tickers],
-        axis=1,
-        sort=True)
-    )
-)
-stocks = stocks.loc[:,~stocks.columns.duplicated()]
+import pricestore
+import membership
+import indcache
+from profiling import Profiler
+
+# directory of recorded index holdings (see survivorship-bias.py): when set,
+# only the index members of each day are ranked and bought
+holdings = None
+
+# JSON file for the run's per-component timings (see profiling.py), e.g.
+# "momentum-profile.json"; None: a plain run, not instrumented
+profile = None
+
+# close matrix straight from the memory-mapped store (built from spy/*.csv)
+store = pricestore.load("spy")
+tickers = store.symbols
+stocks = store.frame("close")
+members = membership.Membership.from_holdings(holdings) if holdings else None
+
+# indicator cache: values of earlier runs over the same data are
+# memory-mapped back, e.g. indcache.IndicatorCache("indicator-cache"); None
+# for no caching
+cache = None
 
 # print (stocks)
 # Now let’s create our momentum measurement function. We can compute the exponential regression of a stock by performing linear regression on the natural log of the stock’s daily closes:
@@ -34,15 +40,19 @@ def momentum(closes):
     slope, _, rvalue, _, _ = linregress(x, returns)
     return ((1 + slope) ** 252) * (rvalue ** 2)  # annualize slope and multiply by R^2
 
-momentums = stocks.copy(deep=True)
-for ticker in tickers:
-    momentums[ticker] = stocks[ticker].rolling(90).apply(momentum, raw=False)
+# momentum() for every ticker and date (same numbers as
+# stocks[ticker].rolling(90).apply(momentum)), 100 tickers at a time: only
+# each ticker's peak is kept, the full series only for the 5 best
+from rollingreg import rolling_momentum
+peaks = pd.concat([indcache.compute(cache, rolling_momentum, chunk, period=90).max()
+                   for chunk in store.chunks("close", size=100)])
 
 plt.figure(figsize=(12, 9))
 plt.xlabel('Days')
 plt.ylabel('Stock Price')
 
-bests = momentums.max().sort_values(ascending=False).index[:5]
+bests = peaks.sort_values(ascending=False).index[:5]
+momentums = indcache.compute(cache, rolling_momentum, store.frame("close", symbols=list(bests)), period=90)
 for best in bests:
     end = momentums[best].index.get_loc(momentums[best].idxmax())
     rets = np.log(stocks[best].iloc[end - 90 : end])
@@ -53,38 +63,29 @@ for best in bests:
 
 import backtrader as bt
 
-class Momentum(bt.Indicator):
-    lines = ('trend',)
-    params = (('period', 90),)
-    
-    def __init__(self):
-        self.addminperiod(self.params.period)
-    
-    def next(self):
-        returns = np.log(self.data.get(size=self.p.period))
-        x = np.arange(len(returns))
-        slope, _, rvalue, _, _ = linregress(x, returns)
-        annualized = (1 + slope) ** 252
-        self.lines.trend[0] = annualized * (rvalue ** 2)
-        
-        
+# incremental exponential-regression momentum, O(1) per bar (see indicators.py)
+from indicators import Momentum
+
+
 class Strategy(bt.Strategy):
     def __init__(self):
         self.i = 0
         self.inds = {}
         self.spy = self.datas[0]
         self.stocks = self.datas[1:]
+        if members is not None:
+            self.memcols = members.columns([d._name for d in self.stocks])
         
-        self.spy_sma200 = bt.indicators.SimpleMovingAverage(self.spy.close,
-                                                            period=200)
+        self.spy_sma200 = indcache.indicator(cache, bt.indicators.SimpleMovingAverage,
+                                             self.spy.close, period=200)
         for d in self.stocks:
             self.inds[d] = {}
-            self.inds[d]["momentum"] = Momentum(d.close, 
-                                                period=90)
-            self.inds[d]["sma100"] = bt.indicators.SimpleMovingAverage(d.close, 
-                                                                       period=100)
-            self.inds[d]["atr20"] = bt.indicators.ATR(d, 
-                                                      period=20)
+            self.inds[d]["momentum"] = indcache.indicator(cache, Momentum, d.close,
+                                                          period=90)
+            self.inds[d]["sma100"] = indcache.indicator(cache, bt.indicators.SimpleMovingAverage,
+                                                        d.close, period=100)
+            self.inds[d]["atr20"] = indcache.indicator(cache, bt.indicators.ATR, d,
+                                                       period=20)
 
     def prenext(self):
         # call next() even when data is not available for all tickers
@@ -98,8 +99,12 @@ class Strategy(bt.Strategy):
         self.i += 1
     
     def rebalance_portfolio(self):
-        # only look at data that we can have indicators for 
-        self.rankings = list(filter(lambda d: len(d) > 100, self.stocks))
+        # only look at data that we can have indicators for, in the index today
+        stocks = self.stocks
+        if members is not None:
+            inindex = members.row(self.datetime.date())[self.memcols]
+            stocks = [self.stocks[i] for i in np.flatnonzero(inindex)]
+        self.rankings = list(filter(lambda d: len(d) > 100, stocks))
         self.rankings.sort(key=lambda d: self.inds[d]["momentum"][0])
         num_stocks = len(self.rankings)
         
@@ -148,15 +153,19 @@ spy = bt.feeds.YahooFinanceData(dataname='SPY',
 cerebro.adddata(spy)  # add S&P 500 Index
 
 for ticker in tickers:
-    df = pd.read_csv(f"spy/{ticker}.csv",
-                     parse_dates=True,
-                     index_col=0)
-    if len(df) > 100: # data must be long enough to compute 100 day SMA
-        cerebro.adddata(bt.feeds.PandasData(dataname=df, plot=False))
+    data = store.feed(ticker, plot=False)
+    if len(data.p.dataname) > 100: # data must be long enough to compute 100 day SMA
+        cerebro.adddata(data)
 
 cerebro.addobserver(bt.observers.Value)
 cerebro.addanalyzer(bt.analyzers.SharpeRatio, riskfreerate=0.0)
 cerebro.addanalyzer(bt.analyzers.Returns)
 cerebro.addanalyzer(bt.analyzers.DrawDown)
 cerebro.addstrategy(Strategy)
-results = cerebro.run()
\ No newline at end of file
+if profile:
+    profiler = Profiler()
+    results = profiler.run(cerebro)
+    print(profiler.summary())
+    profiler.save(profile)
+else:
+    results = cerebro.run()
@@ -0,0 +1,102 @@
+from array import array
+
+import backtrader as bt
+import numpy as np
+from backtrader.linebuffer import LineBuffer
+
+# backtrader keeps datetimes as float days since 0001-01-01 (that day is 1.0)
+_EPOCH = np.datetime64('0001-01-01T00:00:00', 'us')
+
+
+def dates2num(dates):
+    '''Vectorized bt.date2num for an array of naive datetime64 values'''
+    dates = np.asarray(dates)
+    if dates.dtype.kind != 'M':
+        return np.asarray(dates, dtype=np.float64)  # already date numbers
+    return (dates.astype('datetime64[us]') - _EPOCH) / np.timedelta64(1, 'D') + 1.0
+
+
+class NumpyData(bt.feed.DataBase):
+    '''
+    Data feed over pre-aligned NumPy arrays (or memmaps, e.g. the fields of a
+    pricestore.PriceStore)
+
+    ``dataname`` is the datetime64 (or backtrader date number) array and each
+    of ``open``, ``high``, ``low``, ``close``, ``volume`` and
+    ``openinterest`` is an array of the same length, or None for a line that
+    is not in the source (it stays NaN, like a missing PandasData column).
+
+    ``fromdate``/``todate`` are resolved with a binary search over the dates
+    and ``preload`` copies each line into its buffer in one block instead of
+    loading the bars one by one.
+    '''
+    params = (
+        ('open', None),
+        ('high', None),
+        ('low', None),
+        ('close', None),
+        ('volume', None),
+        ('openinterest', None),
+    )
+
+    def start(self):
+        super(NumpyData, self).start()
+
+        self._dtnums = dates2num(self.p.dataname)
+        self._cols = {}
+        for name in self.getlinealiases():
+            if name == 'datetime':
+                continue
+            col = getattr(self.p, name)
+            if col is not None:
+                self._cols[name] = col
+
+        self._begin = self._end = None
+
+    def _bounds(self):
+        # from/to date are converted by _start_finish, after start()
+        if self._begin is None:
+            self._begin = int(np.searchsorted(self._dtnums, self.fromdate, 'left'))
+            self._end = int(np.searchsorted(self._dtnums, self.todate, 'right'))
+            self._idx = self._begin - 1
+        return self._begin, self._end
+
+    def _bulkable(self):
+        return (not self._filters and not self._barstack and not self._tzinput and
+                all(line.mode == LineBuffer.UnBounded for line in self.lines))
+
+    def preload(self):
+        if not self._bulkable():
+            return super(NumpyData, self).preload()
+
+        begin, end = self._bounds()
+        size = end - begin
+        for name in self.getlinealiases():
+            line = getattr(self.lines, name)
+            if name == 'datetime':
+                src = self._dtnums[begin:end]
+            elif name in self._cols:
+                src = self._cols[name][begin:end]
+            else:
+                src = np.full(size, np.nan)
+
+            line.array.frombytes(np.ascontiguousarray(src, dtype=np.float64).data.cast('B'))
+            line.lencount += size
+            line.idx += size
+
+        self._idx = end - 1
+        self._last()
+        self.home()
+
+    def _load(self):
+        _, end = self._bounds()
+        self._idx += 1
+        if self._idx >= end:
+            return False
+
+        i = self._idx
+        self.lines.datetime[0] = float(self._dtnums[i])
+        for name, col in self._cols.items():
+            getattr(self.lines, name)[0] = float(col[i])
+
+        return True
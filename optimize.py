@@ -0,0 +1,196 @@
+'''
+Process-parallel strategy optimization over many tickers
+
+Prices are parsed once in the parent and copied into a single shared memory
+block (SharedPrices). Every (ticker x parameter set) combination is a job of
+a process pool; workers attach to the block, feed the arrays to backtrader
+through numpyfeed.NumpyData (loaded once per ticker in a session.Session)
+and send back a plain result record.
+
+    prices = SharedPrices.from_yahoo_csv({'SPY': 'data/SPY.txt', ...})
+    records = optimize(prices, TestStrategy, dict(maperiod=range(15, 30)))
+    best(records)  # {'SPY': {'maperiod': 21}, ...}
+'''
+import collections
+import itertools
+import os
+from concurrent import futures
+from multiprocessing import shared_memory
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from numpyfeed import NumpyData, dates2num
+from session import Session
+
+FIELDS = ('datetime', 'open', 'high', 'low', 'close', 'volume')
+
+# backtrader stamps daily bars at the end of the session
+SESSIONEND = np.timedelta64(86399999990, 'us')
+
+Result = collections.namedtuple('Result', 'ticker params value')
+
+
+def read_yahoo_csv(path, decimals=2):
+    '''
+    Date,Open,High,Low,Close,Adj Close,Volume file as arrays, adjusted and
+    rounded the way bt.feeds.YahooFinanceCSVData does it by default
+    '''
+    df = pd.read_csv(path, na_values=['null']).dropna()
+    dates = pd.to_datetime(df['Date'].str[0:10]).values.astype('datetime64[us]')
+    close, adjclose = df['Close'].values, df['Adj Close'].values
+    factor = close / adjclose
+    cols = dict(
+        datetime=dates2num(dates + SESSIONEND),
+        open=np.round(df['Open'].values / factor, decimals),
+        high=np.round(df['High'].values / factor, decimals),
+        low=np.round(df['Low'].values / factor, decimals),
+        close=np.round(adjclose, decimals),
+        volume=np.round(df['Volume'].values * factor),
+    )
+    return cols
+
+
+class SharedPrices(object):
+    '''
+    OHLCV arrays of many tickers in one shared memory block: a (fields x bars)
+    float64 matrix with the tickers laid end to end. Pickling only sends the
+    block name and the offsets, so it is cheap to pass to worker processes.
+    '''
+
+    def __init__(self, arrays):
+        self.offsets = {}
+        start = 0
+        for ticker, cols in arrays.items():
+            size = len(cols['close'])
+            self.offsets[ticker] = (start, start + size)
+            start += size
+
+        self.shape = (len(FIELDS), start)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, 8 * len(FIELDS) * start))
+        self.name = self._shm.name
+        self._owner = True
+        matrix = self.matrix
+        for ticker, (a, b) in self.offsets.items():
+            for i, field in enumerate(FIELDS):
+                matrix[i, a:b] = arrays[ticker][field]
+
+    @classmethod
+    def from_yahoo_csv(cls, paths):
+        return cls({ticker: read_yahoo_csv(path) for ticker, path in paths.items()})
+
+    @property
+    def matrix(self):
+        return np.ndarray(self.shape, dtype=np.float64, buffer=self._shm.buf)
+
+    @property
+    def tickers(self):
+        return list(self.offsets)
+
+    def arrays(self, ticker):
+        '''dict of field -> view on the shared block for one ticker'''
+        a, b = self.offsets[ticker]
+        matrix = self.matrix
+        return {field: matrix[i, a:b] for i, field in enumerate(FIELDS)}
+
+    def feed(self, ticker, **kwargs):
+        cols = self.arrays(ticker)
+        kwargs.setdefault('name', ticker)
+        return NumpyData(dataname=cols.pop('datetime'), **dict(cols, **kwargs))
+
+    def __getstate__(self):
+        return dict(name=self.name, shape=self.shape, offsets=self.offsets)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._owner = False
+        # pool workers share the resource tracker of the creator, which
+        # unlinks the block in close()
+        self._shm = shared_memory.SharedMemory(name=self.name)
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def grid(params):
+    '''All combinations of a dict of name -> values as a list of dicts'''
+    names = list(params)
+    return [dict(zip(names, values)) for values in itertools.product(*params.values())]
+
+
+_worker = {}
+
+
+def _session(prices, ticker, cash, stake, commission, feedkwargs):
+    # jobs come ticker by ticker: keep the last ticker's preloaded session
+    key = (prices.name, ticker, cash, stake, commission, sorted(feedkwargs.items()))
+    if _worker.get('key') != key:
+        session = Session(stdstats=False, maxcpus=1)
+        session.adddata(prices.feed(ticker, **feedkwargs))
+        session.broker.setcash(cash)
+        session.addsizer(bt.sizers.FixedSize, stake=stake)
+        session.broker.setcommission(commission=commission)
+        _worker.update(key=key, session=session)
+    return _worker['session']
+
+
+def run_one(prices, ticker, strategy, params, cash=1000.0, stake=1, commission=0.0,
+            **feedkwargs):
+    '''Backtest one ticker with one parameter set, return its Result'''
+    session = _session(prices, ticker, cash, stake, commission, feedkwargs)
+    session.runone(strategy, **params)
+    return Result(ticker, params, session.broker.getvalue())
+
+
+def _init(prices):
+    # attach once per worker process, not once per job
+    _worker['prices'] = prices
+
+
+def _job(args):
+    ticker, strategy, params, kwargs = args
+    return run_one(_worker['prices'], ticker, strategy, params, **kwargs)
+
+
+def optimize(prices, strategy, params, tickers=None, workers=None, **kwargs):
+    '''
+    Run `strategy` for every ticker and every combination of `params` (dict
+    of name -> values) on a process pool. Extra keyword arguments go to
+    run_one (cash, stake, commission, fromdate, todate ...).
+
+    Returns the list of Result(ticker, params, value) records.
+    '''
+    tickers = prices.tickers if tickers is None else tickers
+    jobs = [(ticker, strategy, p, kwargs) for ticker in tickers for p in grid(params)]
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        try:
+            return [run_one(prices, *job[:3], **kwargs) for job in jobs]
+        finally:
+            # the session holds views on the shared block
+            _worker.clear()
+
+    with futures.ProcessPoolExecutor(workers, initializer=_init, initargs=(prices,)) as pool:
+        return list(pool.map(_job, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+
+
+def best(records):
+    '''Best parameter set (highest final value) per ticker'''
+    top = {}
+    for r in records:
+        # ties go to the larger parameter values, like max((value, period))
+        key = (r.value, tuple(r.params.values()))
+        if r.ticker not in top or key > top[r.ticker][0]:
+            top[r.ticker] = (key, r)
+    return {ticker: r.params for ticker, (_, r) in top.items()}
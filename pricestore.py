@@ -0,0 +1,187 @@
+'''
+Columnar price store for the per-ticker CSV files under spy/
+
+Layout of a store directory:
+    dates.npy                   shared date index (datetime64[D])
+    open.npy ... volume.npy     one (symbols x dates) float64 array per field
+    symbols.json                symbol directory: names and first/last bar
+
+Fields are opened memory-mapped, so loading a store costs no parsing and no
+copying: pandas frames are views over the mapped files and backtrader feeds
+(numpyfeed.NumpyData) fill their lines from them in bulk. A frame of some
+symbols or dates only reads that block, as float64 or float32, and chunks()
+walks the universe a few symbols at a time.
+
+    python pricestore.py [--csvdir spy] [--store spy-store]
+
+imports the CSV layout in one shot.
+'''
+import argparse
+import glob
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def _csv_files(csvdir):
+    return sorted(f for f in glob.glob(os.path.join(csvdir, '*.csv'))
+                  if os.path.basename(f) != 'tickers.csv')
+
+
+def import_csv(csvdir='spy', path='spy-store'):
+    '''Build a store at `path` from the spy/{ticker}.csv files in `csvdir`'''
+    frames = {}
+    for fname in _csv_files(csvdir):
+        ticker = os.path.splitext(os.path.basename(fname))[0]
+        df = pd.read_csv(fname, index_col=0, parse_dates=True)
+        df = df[~df.index.duplicated()]
+        frames[ticker] = df.rename(columns=str.lower)
+
+    symbols = sorted(frames)
+    dates = pd.DatetimeIndex(sorted(set().union(*(df.index for df in frames.values()))))
+
+    tmp = path + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, 'dates.npy'), dates.values.astype('datetime64[D]'))
+
+    first, last = [], []
+    for field in FIELDS:
+        arr = np.lib.format.open_memmap(os.path.join(tmp, field + '.npy'), mode='w+',
+                                        dtype=np.float64, shape=(len(symbols), len(dates)))
+        arr[:] = np.nan
+        for i, ticker in enumerate(symbols):
+            df = frames[ticker]
+            pos = dates.get_indexer(df.index)
+            if field in df:
+                arr[i, pos] = df[field].values
+            if field == 'close':
+                first.append(int(pos.min()) if len(pos) else 0)
+                last.append(int(pos.max()) if len(pos) else -1)
+        arr.flush()
+        del arr
+
+    with open(os.path.join(tmp, 'symbols.json'), 'w') as f:
+        json.dump(dict(symbols=symbols, first=first, last=last, fields=FIELDS), f)
+
+    # swap the finished store in place of the old one
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp, path)
+    return PriceStore(path)
+
+
+def is_stale(csvdir='spy', path='spy-store'):
+    '''True if the store is missing or older than any of the CSV files'''
+    try:
+        built = os.path.getmtime(os.path.join(path, 'symbols.json'))
+    except OSError:
+        return True
+    return any(os.path.getmtime(f) > built for f in _csv_files(csvdir))
+
+
+def load(csvdir='spy', path='spy-store'):
+    '''Open the store, (re)importing the CSV files first if needed'''
+    if is_stale(csvdir, path):
+        return import_csv(csvdir, path)
+    return PriceStore(path)
+
+
+class PriceStore(object):
+    def __init__(self, path='spy-store'):
+        self.path = path
+        with open(os.path.join(path, 'symbols.json')) as f:
+            meta = json.load(f)
+
+        self.symbols = meta['symbols']
+        self.first = meta['first']
+        self.last = meta['last']
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.dates = pd.DatetimeIndex(np.load(os.path.join(path, 'dates.npy')))
+        self._fields = {}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def field(self, name):
+        '''Memory-mapped (symbols x dates) array of one field'''
+        arr = self._fields.get(name)
+        if arr is None:
+            arr = np.load(os.path.join(self.path, name + '.npy'), mmap_mode='r')
+            self._fields[name] = arr
+        return arr
+
+    def span(self, start=None, end=None):
+        '''Slice of the date positions in [start, end] (both included, like .loc)'''
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), 'left')
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), 'right')
+        return slice(int(lo), int(hi))
+
+    def frame(self, field='close', symbols=None, start=None, end=None, dtype=None):
+        '''
+        dates x symbols DataFrame of a field, over [start, end] if given.
+        Without `symbols` it is a view on the mapped file, otherwise only the
+        selected rows are read (copied). `dtype` (e.g. np.float32) converts
+        the block, which then is a copy as well.
+        '''
+        arr = self.field(field)
+        span = self.span(start, end)
+        if symbols is None:
+            symbols = self.symbols
+            arr = arr[:, span]
+        else:
+            arr = arr[[self.index[s] for s in symbols], span]
+        if dtype is not None:
+            arr = arr.astype(dtype, copy=False)
+        # pandas keeps 2-d blocks as (columns x rows): arr.T is stored as is
+        return pd.DataFrame(arr.T, index=self.dates[span], columns=list(symbols), copy=False)
+
+    def chunks(self, field='close', size=100, symbols=None, start=None, end=None, dtype=None):
+        '''
+        frame() of `size` symbols at a time: universe-wide computations
+        holding one chunk in memory at once
+        '''
+        symbols = self.symbols if symbols is None else list(symbols)
+        for i in range(0, len(symbols), size):
+            yield self.frame(field, symbols[i:i + size], start, end, dtype)
+
+    def _rows(self, symbol):
+        # row of the symbol and the dates it traded: a slice (a view) unless
+        # dates traded by other symbols only leave gaps in its range
+        i = self.index[symbol]
+        rows = slice(self.first[i], self.last[i] + 1)
+        gaps = np.isnan(self.field('close')[i, rows])
+        if gaps.any():
+            rows = np.arange(rows.start, rows.stop)[~gaps]
+        return i, rows
+
+    def ohlcv(self, symbol):
+        '''open/high/low/close/volume frame of one symbol over its own dates'''
+        i, rows = self._rows(symbol)
+        cols = {f: self.field(f)[i, rows] for f in FIELDS}
+        return pd.DataFrame(cols, index=self.dates[rows], copy=False)
+
+    def feed(self, symbol, **kwargs):
+        '''backtrader data feed for one symbol, preloaded in bulk from the arrays'''
+        from numpyfeed import NumpyData
+        i, rows = self._rows(symbol)
+        kwargs.setdefault('name', symbol)
+        for f in FIELDS:
+            kwargs[f] = self.field(f)[i, rows]
+        return NumpyData(dataname=self.dates.values[rows], **kwargs)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import spy/ CSV files into a price store')
+    parser.add_argument('--csvdir', default='spy')
+    parser.add_argument('--store', default='spy-store')
+    args = parser.parse_args()
+
+    store = import_csv(args.csvdir, args.store)
+    print('{} symbols x {} dates -> {}'.format(len(store), len(store.dates), args.store))
@@ -0,0 +1,206 @@
+'''
+Per-component timing of Cerebro runs
+
+    profiler = Profiler()
+    results = profiler.run(cerebro)  # cerebro.run(), instrumented
+    print(profiler.summary())
+    profiler.save('profile.json')
+
+For the duration of the run the methods below are replaced by timing
+wrappers (restored afterwards), which count calls and accumulate total and
+self time (total minus the time of instrumented calls made inside) per
+component, i.e. per class and method:
+
+    feed        _start, preload, next (loading; per feed class)
+    indicator   _once / _next (the whole line / one bar; per indicator class)
+    strategy    __init__ and every method the strategy classes define
+                (next, rebalance_portfolio, notify_order, ...); _oncepost
+                and _next, the engine's per bar work for the strategy
+    observer    _next / next, prenext, nextstart
+    analyzer    _start, _next, _prenext, _notify_*, _stop
+    broker      buy, sell, cancel, next (order processing)
+
+Time in none of them (advancing the datas and lines, cerebro's loop) is
+reported as `engine`. Feed advance and indicator advance, called per bar
+for every feed / line, are left out so the overhead stays low: about 1 us
+per instrumented call, ~1% of a runonce run. In next mode every indicator
+is called per bar (~6% for the small indicators of bench-profiling.py);
+Profiler(indicators=False) does not time them there, their time is then
+the strategies' _next.
+
+Peak memory is the process peak RSS (getrusage; NaN on Windows without
+psutil), before and after the run. With optimization (optstrategy) run with maxcpus=1: the statistics of
+worker processes are not collected.
+'''
+import functools
+import json
+import sys
+import time
+import types
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import backtrader as bt
+
+KINDS = {bt.LineIterator.IndType: 'indicator', bt.LineIterator.StratType: 'strategy',
+         bt.LineIterator.ObsType: 'observer'}
+
+FEED = ('_start', 'preload', 'next')
+OBSERVER = ('prenext', 'nextstart', 'next')
+ANALYZER = ('_start', '_prenext', '_nextstart', '_next', '_notify_order', '_notify_trade',
+            '_notify_cashvalue', '_notify_fund', '_stop')
+BROKER = ('buy', 'sell', 'cancel', 'next')
+
+
+def peak_rss():
+    # MB; ru_maxrss is in kB on Linux, bytes on macOS. Without resource
+    # (Windows) the peak working set from psutil if installed, else NaN
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (2.0 ** 20 if sys.platform == 'darwin' else 2.0 ** 10)
+    try:
+        import psutil
+    except ImportError:
+        return float('nan')
+    return getattr(psutil.Process().memory_info(), 'peak_wset', float('nan')) / 2.0 ** 20
+
+
+class Profiler(object):
+
+    def __init__(self, indicators=True):
+        self.indicators = indicators  # time the per bar _next of indicators / observers
+        self.info = {}
+        self._stack = []  # time of the instrumented calls inside each running call
+        self._records = []  # (kind, method, {class: [calls, total, self]})
+        self._patched = []
+
+    def _wrap(self, owner, name, kind):
+        func = vars(owner)[name]
+        stack = self._stack
+        records = {}  # class of the instance -> [calls, total, self]
+        self._records.append((kind, name, records))
+        perf_counter = time.perf_counter
+
+        @functools.wraps(func)
+        def timed(obj, *args, **kwargs):
+            stack.append(0.0)
+            t0 = perf_counter()
+            try:
+                return func(obj, *args, **kwargs)
+            finally:
+                elapsed = perf_counter() - t0
+                own = elapsed - stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                rec = records.get(obj.__class__)
+                if rec is None:
+                    records[obj.__class__] = [1, elapsed, own]
+                else:
+                    rec[0] += 1
+                    rec[1] += elapsed
+                    rec[2] += own
+
+        setattr(owner, name, timed)
+        self._patched.append((owner, name, func))
+
+    def _patch(self, cls, names, kind, base):
+        # the definition each name resolves to, if it belongs to base's tree.
+        # Not when an ancestor's / descendant's definition is instrumented:
+        # a super() call would count twice
+        for name in names:
+            owner = next((k for k in cls.__mro__ if name in vars(k)), None)
+            if owner is None or not issubclass(owner, base):
+                continue
+            if not any(n == name and (issubclass(o, owner) or issubclass(owner, o))
+                       for o, n, _ in self._patched):
+                self._wrap(owner, name, kind)
+
+    def _instrument(self, cerebro):
+        for data in cerebro.datas:
+            self._patch(type(data), FEED, 'feed', bt.AbstractDataBase)
+
+        self._patch(bt.LineIterator, ('_once',), None, bt.LineIterator)
+        if self.indicators:
+            self._patch(bt.LineIterator, ('_next',), None, bt.LineIterator)
+        else:
+            self._patch(bt.Strategy, ('_next',), 'strategy', bt.Strategy)
+        self._patch(bt.Strategy, ('_oncepost',), 'strategy', bt.Strategy)
+        for i, strats in enumerate(cerebro.strats):
+            # optstrategy adds an iterator of its combinations: read it into a list
+            cerebro.strats[i] = strats = list(strats)
+            for stratcls in set(strat[0] for strat in strats):
+                methods = set()
+                for klass in stratcls.__mro__[:stratcls.__mro__.index(bt.Strategy)]:
+                    methods.update(name for name, value in vars(klass).items()
+                                   if isinstance(value, types.FunctionType) and (name == '__init__' or not name.startswith('__')))
+                self._patch(stratcls, sorted(methods), 'strategy', bt.Strategy)
+
+        obscls = [obs[1] for obs in cerebro.observers]
+        if cerebro.p.stdstats:
+            obscls += [bt.observers.Broker, bt.observers.BuySell, bt.observers.Trades,
+                       bt.observers.DataTrades]
+        for cls in obscls:
+            self._patch(cls, OBSERVER, 'observer', bt.Observer)
+
+        for cls, _, _ in cerebro.analyzers:
+            self._patch(cls, ANALYZER, 'analyzer', bt.Analyzer)
+        self._patch(type(cerebro.broker), BROKER, 'broker', bt.BrokerBase)
+
+    def _restore(self):
+        for owner, name, func in reversed(self._patched):
+            setattr(owner, name, func)
+        self._patched = []
+
+    def run(self, cerebro, **kwargs):
+        '''cerebro.run(**kwargs) with its components timed'''
+        self._instrument(cerebro)
+        rss = peak_rss()
+        t0 = time.perf_counter()
+        try:
+            results = cerebro.run(**kwargs)
+        finally:
+            wall = time.perf_counter() - t0
+            self._restore()
+
+        strats = [s for r in results for s in (r if isinstance(r, list) else [r])
+                  if isinstance(s, bt.Strategy)]
+        bars = max([len(s) for s in strats] or [0])
+        databars = sum(len(d) for d in cerebro.datas)
+        self.info = dict(wall=wall, bars=bars, bars_per_sec=bars / wall,
+                         datas=len(cerebro.datas), data_bars=databars,
+                         data_bars_per_sec=databars / wall,
+                         peak_rss_mb_before=rss, peak_rss_mb=peak_rss())
+        return results
+
+    def report(self):
+        '''The run's figures and components (by self time), JSON-ready'''
+        components = [dict(kind=kind or KINDS[cls._ltype], name='%s.%s' % (cls.__name__, method),
+                           calls=calls, total=total, self=own)
+                      for kind, method, records in self._records
+                      for cls, (calls, total, own) in records.items()]
+        components.sort(key=lambda c: -c['self'])
+        kinds = {}
+        for c in components:
+            kinds[c['kind']] = kinds.get(c['kind'], 0.0) + c['self']
+        kinds['engine'] = self.info['wall'] - sum(kinds.values())
+        return dict(self.info, kinds=kinds, components=components)
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=1)
+
+    def summary(self, top=15):
+        report = self.report()
+        lines = ['run %.3fs  %d bars  %.1f bars/s  (%d datas, %.0f data bars/s)  peak RSS %.1f MB'
+                 % (report['wall'], report['bars'], report['bars_per_sec'], report['datas'],
+                    report['data_bars_per_sec'], report['peak_rss_mb']),
+                 '  '.join('%s %.3fs' % item for item in
+                           sorted(report['kinds'].items(), key=lambda item: -item[1])),
+                 '%-10s %-40s %9s %10s %10s' % ('kind', 'component', 'calls', 'total', 'self')]
+        for c in report['components'][:top]:
+            lines.append('%-10s %-40s %9d %9.3fs %9.3fs'
+                         % (c['kind'], c['name'][:40], c['calls'], c['total'], c['self']))
+        return '\n'.join(lines)
@@ -0,0 +1,107 @@
+'''
+Incremental refresh of one canonical CSV file per symbol
+
+Instead of downloading the whole history again, `update` reads the last
+stored date, fetches only from a few bars before it, checks that the bars
+both sides have agree and appends the new ones. If they disagree (a split
+or dividend re-adjusted the history) the file is rebuilt with one full
+fetch. Files are always replaced atomically, so an interrupted refresh
+leaves the old file in place.
+'''
+import io
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+
+def read_tail(path, rows=5, blocksize=1 << 14):
+    '''The last `rows` rows of a CSV file, reading only the end of it'''
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        pos, data = size, b''
+        while pos > len(header) and data.count(b'\n') <= rows:
+            step = min(blocksize, pos - len(header))
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+
+    lines = data.splitlines()
+    if pos > len(header):
+        lines = lines[1:]  # first line may be cut in half
+    lines = [l for l in lines if l.strip()][-rows:]
+    return pd.read_csv(io.BytesIO(header + b'\n'.join(lines) + b'\n'),
+                       index_col=0, parse_dates=True)
+
+
+def last_date(path):
+    '''Date of the last stored bar, None if there is no data yet'''
+    if not os.path.exists(path):
+        return None
+    tail = read_tail(path, rows=1)
+    return tail.index[-1] if len(tail) else None
+
+
+def _replace(path, fetch, download, start, end):
+    # full history, written next to the target and renamed over it
+    tmp = path + '.tmp'
+    if download is not None:
+        rows = download(tmp, start, end)
+    else:
+        df = fetch(start, end)
+        df.to_csv(tmp)
+        rows = len(df)
+    os.replace(tmp, path)
+    return rows
+
+
+def _append(path, df):
+    # append to a copy and swap it in: readers never see a half written file
+    tmp = path + '.tmp'
+    shutil.copyfile(path, tmp)
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        newline = f.read(1) != b'\n'
+    with open(tmp, 'a', newline='') as f:
+        if newline:
+            f.write('\n')
+        df.to_csv(f, header=False)
+    os.replace(tmp, path)
+
+
+def update(path, fetch, start, end, overlap=5, rtol=1e-6, download=None):
+    '''
+    Bring `path` up to `end` with `fetch(start, end) -> DataFrame` (indexed by
+    date, same columns as the file). A missing file is fetched from `start`.
+    Full histories go through `download(path, start, end) -> rows` instead of
+    `fetch` when given, e.g. to stream them straight to disk.
+
+    Returns the number of rows written: only the new bars on an append,
+    everything after a rebuild.
+    '''
+    tail = read_tail(path, rows=overlap) if os.path.exists(path) else None
+    if tail is None or not len(tail):
+        return _replace(path, fetch, download, start, end)
+
+    fresh = fetch(tail.index[0].to_pydatetime(), end)
+    fresh = fresh[fresh.index.notna()]
+    fresh.index = pd.DatetimeIndex(fresh.index)
+
+    common = tail.index.intersection(fresh.index)
+    cols = [c for c in tail.columns if c in fresh.columns]
+    if len(fresh) and (not len(common) or len(cols) != len(tail.columns) or not np.allclose(
+            tail.loc[common, cols].values.astype(float),
+            fresh.loc[common, cols].values.astype(float), rtol=rtol, equal_nan=True)):
+        # history was revised (or cannot be checked): rebuild from scratch
+        first = pd.read_csv(path, index_col=0, parse_dates=True, nrows=1).index[0]
+        return _replace(path, fetch, download, min(first.to_pydatetime(), start), end)
+
+    new = fresh[fresh.index > tail.index[-1]]
+    if len(new):
+        new = new[tail.columns]
+        new.index.name = tail.index.name
+        _append(path, new)
+    return len(new)
@@ -0,0 +1,66 @@
+'''
+Rolling window maximum / minimum
+
+rolling_max / rolling_min compute a whole series with the van Herk /
+Gil-Werman scheme: split into blocks of `period` values, a window always
+spans the tail of one block and the head of the next, so its extreme is
+max(suffix max of the first, prefix max of the second). Two accumulates,
+O(n) whatever the period.
+
+MonotonicDeque gives the same value bar by bar in O(1) amortized time.
+'''
+import collections
+
+import numpy as np
+
+
+def rolling_max(x, period):
+    '''Max over the last `period` values along axis 0, NaN until `period` values are in'''
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    out = np.full(x.shape, np.nan)
+    if n < period:
+        return out
+
+    nblocks = -(-n // period)
+    padded = np.full((nblocks * period,) + x.shape[1:], -np.inf)
+    padded[:n] = x
+    blocks = padded.reshape((nblocks, period) + x.shape[1:])
+    prefix = np.maximum.accumulate(blocks, axis=1).reshape(padded.shape)
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+    out[period - 1:] = np.maximum(suffix[:n - period + 1], prefix[period - 1:n])
+    return out
+
+
+def rolling_min(x, period):
+    '''Min over the last `period` values along axis 0, NaN until `period` values are in'''
+    return -rolling_max(-np.asarray(x, dtype=np.float64), period)
+
+
+class MonotonicDeque(object):
+    '''
+    Streaming max (or min with `minimum=True`) of the last `period` values.
+    The deque keeps the values that can still become the extreme, in
+    decreasing (increasing) order, so push() is O(1) amortized.
+    '''
+
+    def __init__(self, period, minimum=False):
+        self.period = period
+        self.minimum = minimum
+        self.count = 0
+        self.queue = collections.deque()  # (position, value)
+
+    def push(self, value):
+        '''Add a value, return the extreme of the last `period` values'''
+        queue = self.queue
+        if self.minimum:
+            while queue and queue[-1][1] >= value:
+                queue.pop()
+        else:
+            while queue and queue[-1][1] <= value:
+                queue.pop()
+        queue.append((self.count, value))
+        self.count += 1
+        if queue[0][0] <= self.count - 1 - self.period:
+            queue.popleft()
+        return queue[0][1]
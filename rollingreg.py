@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+
+def _regression_sums(y):
+    # prefix sums of y, y^2, j*y (j the absolute bar index) and of the NaN
+    # count, for the windowed sums of any period. Every column is shifted by
+    # a reference level: slope and r are unaffected but the running sums stay
+    # small and keep their precision on long histories
+    missing = np.isnan(y)
+    with np.errstate(all='ignore'):
+        ref = np.nanmean(y, axis=0)
+    ref = np.where(np.isnan(ref), 0.0, ref)
+    yc = np.where(missing, 0.0, y - ref)
+    j = np.arange(y.shape[0], dtype=np.float64)[:, None]
+    zero = np.zeros((1, y.shape[1]))
+    sums = [np.concatenate([zero, np.cumsum(a, axis=0)])
+            for a in (yc, yc * yc, j * yc, missing.astype(np.float64))]
+    return ref, sums
+
+
+def _regression_fit(ref, sums, period, nbars):
+    n = float(period)
+    slope = np.full((nbars, len(ref)), np.nan)
+    intercept = np.full((nbars, len(ref)), np.nan)
+    rvalue = np.full((nbars, len(ref)), np.nan)
+    if nbars < period:
+        return slope, intercept, rvalue
+
+    sy, syy, sjy, nmissing = [c[period:] - c[:-period] for c in sums]
+    # sum of x*y with x counted from the window start
+    start = np.arange(nbars - period + 1, dtype=np.float64)[:, None]
+    sxy = sjy - start * sy
+
+    sx = n * (n - 1) / 2.0
+    sxx = (n - 1) * n * (2 * n - 1) / 6.0
+    ssxm = n * sxx - sx * sx
+    ssxym = n * sxy - sx * sy
+    ssym = n * syy - sy * sy
+
+    b = ssxym / ssxm
+    with np.errstate(all='ignore'):
+        r = np.where(ssym > 0, ssxym / np.sqrt(ssxm * ssym), 0.0)
+    r = np.clip(r, -1.0, 1.0)
+    a = (sy - b * sx) / n + ref
+
+    valid = nmissing == 0
+    slope[period - 1:] = np.where(valid, b, np.nan)
+    intercept[period - 1:] = np.where(valid, a, np.nan)
+    rvalue[period - 1:] = np.where(valid, r, np.nan)
+    return slope, intercept, rvalue
+
+
+def rolling_regression(y, period):
+    """
+    Rolling least-squares fit of y against x = 0..period-1 along axis 0.
+
+    Works on a whole (bars x tickers) matrix at once using running sums of
+    y, x*y and y^2 (x sums are constant for a fixed window), so the cost is
+    O(N*T) instead of one linregress call per bar per ticker. Windows holding
+    a NaN give NaN, like pandas' rolling(period).
+
+    Returns (slope, intercept, rvalue) arrays shaped like y.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    squeeze = y.ndim == 1
+    if squeeze:
+        y = y[:, None]
+
+    ref, sums = _regression_sums(y)
+    slope, intercept, rvalue = _regression_fit(ref, sums, period, y.shape[0])
+    if squeeze:
+        return slope[:, 0], intercept[:, 0], rvalue[:, 0]
+    return slope, intercept, rvalue
+
+
+def rolling_regressions(y, periods):
+    """
+    rolling_regression for several periods, sharing the running sums.
+
+    Returns (slope, intercept, rvalue) arrays shaped (bars, periods) for a
+    1-D y, (bars, periods, tickers) for a matrix.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    squeeze = y.ndim == 1
+    if squeeze:
+        y = y[:, None]
+
+    ref, sums = _regression_sums(y)
+    fits = [_regression_fit(ref, sums, period, y.shape[0]) for period in periods]
+    out = tuple(np.stack([fit[i] for fit in fits], axis=1) for i in range(3))
+    if squeeze:
+        return tuple(a[:, :, 0] for a in out)
+    return out
+
+
+def momentum_score(slope, rvalue, annualize=252):
+    # annualize slope and multiply by R^2
+    return ((1 + slope) ** annualize) * (rvalue ** 2)
+
+
+def rolling_momentum(closes, period=90, annualize=252):
+    """
+    Exponential-regression momentum for every ticker and date at once.
+
+    Same numbers as `closes[ticker].rolling(period).apply(momentum)` with the
+    linregress based `momentum()` of momentum-strategy.py. Accepts a Series,
+    a DataFrame (one column per ticker) or a NumPy array.
+    """
+    values = np.asarray(closes, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.log(values)
+    slope, _, rvalue = rolling_regression(logs, period)
+    scores = momentum_score(slope, rvalue, annualize)
+
+    if isinstance(closes, pd.DataFrame):
+        return pd.DataFrame(scores, index=closes.index, columns=closes.columns)
+    if isinstance(closes, pd.Series):
+        return pd.Series(scores, index=closes.index, name=closes.name)
+    return scores
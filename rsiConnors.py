@@ -4,6 +4,8 @@ import pandas as pd
 # import sqlalchemy
 # import setup_psql_environment
 
+from profiling import Profiler
+
 
 class Streak(bt.ind.PeriodN):
     '''
@@ -12,7 +14,9 @@ class Streak(bt.ind.PeriodN):
     lines = ('streak',)
     params = dict(period=2)  # need prev/cur days (2) for comparisons
 
-    curstreak = 0
+    def __init__(self):
+        super(Streak, self).__init__()
+        self.curstreak = 0  # per instance, not shared through the class
 
     def next(self):
         d0, d1 = self.data[0], self.data[-1]
@@ -28,17 +32,22 @@ class Streak(bt.ind.PeriodN):
 class ConnorsRSI(bt.Indicator):
     '''
     Calculates the ConnorsRSI as:
-        - (RSI(per_rsi) + RSI(Streak, per_streak) + PctRank(per_rank)) / 3
+        - (RSI(per_rsi) + RSI(Streak, per_streak) + PctRank(ROC(1), per_rank)) / 3
+
+    connors.StreamingConnorsRSI / connors.connors_rsi compute the same values
+    outside of backtrader.
     '''
     lines = ('crsi',)
     params = dict(prsi=3, pstreak=2, prank=100)
 
     def __init__(self):
         # Calculate the components
-        rsi = bt.ind.RSI(self.data, period=self.p.prsi)
+        rsi = bt.ind.RSI(self.data, period=self.p.prsi, safediv=True)
         streak = Streak(self.data)
-        rsi_streak = bt.ind.RSI(streak.data, period=self.p.pstreak)
-        prank = bt.ind.PercentRank(self.data, period=self.p.prank)
+        rsi_streak = bt.ind.RSI(streak, period=self.p.pstreak, safediv=True)
+        # rank of the 1 day return, in % like the two RSIs
+        roc = bt.ind.ROC(self.data, period=1)
+        prank = bt.ind.PercentRank(roc, period=self.p.prank) * 100.0
 
         # Apply the formula
         self.l.crsi = (rsi + rsi_streak + prank) / 3.0
@@ -56,7 +65,28 @@ class MyStrategy(bt.Strategy):
 
 
 if __name__ == '__main__':
-    print ("starting at: {}".format(datetime.time()))
+    import argparse
+    parser = argparse.ArgumentParser(description='ConnorsRSI backtest / universe screener')
+    parser.add_argument('--screen', action='store_true',
+                        help='scan every symbol of the spy/ store on the latest bar')
+    parser.add_argument('--csvdir', default='spy')
+    parser.add_argument('--store', default='spy-store')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--lower', type=float, default=10.0)
+    parser.add_argument('--upper', type=float, default=90.0)
+    parser.add_argument('--profile', default=None,
+                        help='JSON file for the per-component timings of the backtest')
+    args = parser.parse_args()
+
+    if args.screen:
+        import connors
+        hits, timing = connors.screen(args.csvdir, args.store, args.lower, args.upper,
+                                      workers=args.workers)
+        print(hits.to_string(index=False, float_format='%.2f'))
+        print(', '.join('%s %.3fs' % item for item in timing.items()))
+        raise SystemExit
+
+    print ("starting at: {}".format(datetime.now().time()))
     cerebro = bt.Cerebro()
     cerebro.broker.setcash(1337.0)
     cerebro.broker.setcommission(commission=0.001)
@@ -67,9 +97,15 @@ if __name__ == '__main__':
     cerebro.adddata(data)
     cerebro.addstrategy(MyStrategy)
     print('Starting Portfolio Value: %.2f' % cerebro.broker.getvalue())
-    cerebro.run()
+    if args.profile:
+        profiler = Profiler()
+        profiler.run(cerebro)
+        print(profiler.summary())
+        profiler.save(args.profile)
+    else:
+        cerebro.run()
     print('Ending Portfolio Value: %.2f' % cerebro.broker.getvalue())
     cerebro.plot()
     print ("done...")
 
-    print ("ended at: {}".format(datetime.time()))
\ No newline at end of file
+    print ("ended at: {}".format(datetime.now().time()))
\ No newline at end of file
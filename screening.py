@@ -4,6 +4,11 @@ import glob
 import os.path
 
 import backtrader as bt
+import numpy as np
+
+import feedcache
+import indcache
+from numpyfeed import NumpyData
 
 
 class NetPayOutData(bt.feeds.GenericCSVData):
@@ -16,13 +21,58 @@ class NetPayOutData(bt.feeds.GenericCSVData):
     )
 
 
+class CachedNetPayOutData(NumpyData):
+    '''NetPayOutData over the arrays parsed (once) by feedcache'''
+    lines = ('npy',)
+    params = (('npy', None),)
+
+
+def cached_feeds(fnames, workers=None, **kwargs):
+    '''
+    One feed per file, like NetPayOutData(dataname=fname, **kwargs), but
+    from the feedcache sidecars: the text of a file is only parsed when it
+    (or the column layout) changed, in parallel over `workers` processes
+    '''
+    p = dict(NetPayOutData.params._getitems())
+    p.update(kwargs)
+    if p['time'] >= 0 or not isinstance(p['dtformat'], (str, int)):
+        # separate time column / callable date parser: the plain feed
+        return [NetPayOutData(dataname=fname, **kwargs) for fname in fnames]
+
+    columns = {name: p[name] for name in NetPayOutData.lines.getlinealiases()}
+    parsing = set(columns) | {'dtformat', 'tmformat', 'time', 'headers', 'separator', 'nullvalue'}
+    feedkwargs = {k: v for k, v in kwargs.items() if k not in parsing}
+    feedkwargs['timeframe'] = p['timeframe']
+    # daily and longer bars are stamped at the end of the session, as the
+    # CSV feed does
+    sessionend = p['sessionend'] or datetime.time(23, 59, 59, 999990)
+    eos = np.timedelta64(datetime.datetime.combine(datetime.date.min, sessionend) -
+                         datetime.datetime.combine(datetime.date.min, datetime.time()))
+
+    feeds = []
+    for fname, cols in feedcache.load(fnames, columns, p['dtformat'], p['headers'],
+                                      p['separator'], workers, p['nullvalue']):
+        dates = cols.pop('datetime')
+        if p['timeframe'] >= bt.TimeFrame.Days:
+            dates = np.maximum(dates, dates.astype('datetime64[D]') + eos)
+        # lines without a column hold nullvalue in the CSV feed (NaN if unset)
+        if not np.isnan(p['nullvalue']):
+            for line in columns:
+                if line not in cols and line != 'datetime':
+                    cols[line] = np.full(len(dates), float(p['nullvalue']))
+        name = feedkwargs.get('name') or os.path.splitext(os.path.basename(fname))[0]
+        feeds.append(CachedNetPayOutData(dataname=dates, **dict(feedkwargs, name=name, **cols)))
+    return feeds
+
+
 class St(bt.Strategy):
     params = dict(
         selcperc=0.10,  # percentage of stocks to select from the universe
         rperiod=1,  # period for the returns calculation, default 1 period
         vperiod=36,  # lookback period for volatility - default 36 periods
         mperiod=12,  # lookback period for momentum - default 12 periods
-        reserve=0.05  # 5% reserve capital
+        reserve=0.05,  # 5% reserve capital
+        cache=None,  # indcache.IndicatorCache for the returns and momentums
     )
 
     def log(self, arg):
@@ -38,49 +88,101 @@ class St(bt.Strategy):
         # be executed next day (opening price). Price can gap upwards
         self.perctarget = (1.0 - self.p.reserve) / self.selnum
 
-        # returns, volatilities and momentums
-        rs = [bt.ind.PctChange(d, period=self.p.rperiod) for d in self.datas]
+        # returns, volatilities and momentums. With a cache the returns and
+        # momentums of unchanged data are read back; the volatilities are
+        # computed over the returns, which only exist once the run starts
+        cache = self.p.cache
+        rs = [indcache.indicator(cache, bt.ind.PctChange, d, period=self.p.rperiod)
+              for d in self.datas]
         vs = [bt.ind.StdDev(ret, period=self.p.vperiod) for ret in rs]
-        ms = [bt.ind.ROC(d, period=self.p.mperiod) for d in self.datas]
+        ms = [indcache.indicator(cache, bt.ind.ROC, d, period=self.p.mperiod)
+              for d in self.datas]
 
         # simple rank formula: (momentum * net payout) / volatility
         # the highest ranked: low vol, large momentum, large payout
-        self.ranks = {d: d.npy * m / v for d, v, m in zip(self.datas, vs, ms)}
+        self.rankl = [d.npy * m / v for d, v, m in zip(self.datas, vs, ms)]
+        self.dindex = {d: i for i, d in enumerate(self.datas)}
 
     def next(self):
-        # sort data and current rank
-        ranks = sorted(
-            self.ranks.items(),  # get the (d, rank), pair
-            key=lambda x: x[1][0],  # use rank (elem 1) and current time "0"
-            reverse=True,  # highest ranked 1st ... please
-        )
-
-        # put top ranked in dict with data as key to test for presence
-        rtop = dict(ranks[:self.selnum])
-
-        # For logging purposes of stocks leaving the portfolio
-        rbot = dict(ranks[self.selnum:])
-
-        # prepare quick lookup list of stocks currently holding a position
-        posdata = [d for d, pos in self.getpositions().items() if pos]
+        # rank of every data on the current bar, as one array
+        ranks = np.fromiter((r[0] for r in self.rankl), dtype=np.float64,
+                            count=len(self.rankl))
+        selected = top(ranks, self.selnum)
+
+        # positions of the held datas, diffed against the selection
+        held = [self.dindex[d] for d, pos in self.getpositions().items() if pos]
+        leave, rebal, enter = rebalance(held, selected, len(self.datas))
+
+        # shares to trade for the datas to hold, as one diff of the target
+        # against the held sizes: what order_target_percent sizes one data at
+        # a time
+        keep = np.concatenate([rebal, enter])
+        target = self.perctarget * self.broker.getvalue()
+        prices = np.array([self.datas[i].close[0] for i in keep])
+        sizes = np.array([self.getposition(self.datas[i]).size for i in keep])
+        delta = order_sizes(target, sizes, prices)
 
         # remove those no longer top ranked
         # do this first to issue sell orders and free cash
-        for d in (d for d in posdata if d not in rtop):
-            self.log('Leave {} - Rank {:.2f}'.format(d._name, rbot[d][0]))
-            self.order_target_percent(d, target=0.0)
+        for i in leave:
+            self.log('Leave {} - Rank {:.2f}'.format(self.datas[i]._name, ranks[i]))
+            self.close(self.datas[i])
 
-        # rebalance those already top ranked and still there
-        for d in (d for d in posdata if d in rtop):
-            self.log('Rebal {} - Rank {:.2f}'.format(d._name, rtop[d][0]))
-            self.order_target_percent(d, target=self.perctarget)
-            del rtop[d]  # remove it, to simplify next iteration
-
-        # issue a target order for the newly top ranked stocks
+        # rebalance those already top ranked and still there, then issue
+        # orders for the newly top ranked stocks
         # do this last, as this will generate buy orders consuming cash
-        for d in rtop:
-            self.log('Enter {} - Rank {:.2f}'.format(d._name, rtop[d][0]))
-            self.order_target_percent(d, target=self.perctarget)
+        for j, i in enumerate(keep):
+            self.log('{} {} - Rank {:.2f}'.format('Rebal' if j < len(rebal) else 'Enter',
+                                                  self.datas[i]._name, ranks[i]))
+            if delta[j] > 0:
+                self.buy(self.datas[i], size=float(delta[j]))
+            elif delta[j] < 0:
+                self.sell(self.datas[i], size=float(-delta[j]))
+
+
+def top(ranks, k):
+    '''
+    Indices of the k highest ranks, highest first. argpartition selects them
+    in O(n), only the k selected are sorted. NaN ranks come last.
+    '''
+    ranks = np.where(np.isnan(ranks), -np.inf, ranks)
+    k = min(k, len(ranks))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    idx = np.argpartition(-ranks, k - 1)[:k]
+    return idx[np.argsort(-ranks[idx], kind='stable')]
+
+
+def order_sizes(target, sizes, prices):
+    '''
+    Shares order_target_value(target) trades for positions of `sizes` at
+    `prices` (stock-like commissions), as arrays: the broker floors the cash
+    to move, |target - size * price|, by the price (getsize: cash // price),
+    for a buy as for a sell. 0 where the price is 0 or NaN
+    '''
+    sizes = np.asarray(sizes, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    value = sizes * prices
+    with np.errstate(invalid='ignore', divide='ignore'):
+        buy = (target - value) // prices
+        sell = (value - target) // prices
+    delta = np.where(target > value, buy, np.where(target < value, -sell, 0.0))
+    delta = np.where(np.asarray(target) == 0, -sizes, delta)  # closing
+    return np.where(np.isfinite(delta), delta, 0.0)
+
+
+def rebalance(held, selected, n):
+    '''
+    Diff of the held data indices against the selected ones (out of n):
+    (leave, rebal, enter) index arrays, leave/rebal in held order and enter
+    in selection order
+    '''
+    held = np.asarray(held, dtype=np.intp)
+    isheld = np.zeros(n, dtype=bool)
+    isheld[held] = True
+    isselected = np.zeros(n, dtype=bool)
+    isselected[selected] = True
+    return held[~isselected[held]], held[isselected[held]], selected[~isheld[selected]]
 
 
 def run(args=None):
@@ -101,13 +203,22 @@ def run(args=None):
         fmt = dtfmt + tmfmt * ('T' in args.todate)
         dkwargs['todate'] = datetime.datetime.strptime(args.todate, fmt)
 
-    # add all the data files available in the directory datadir
-    for fname in glob.glob(os.path.join(args.datadir, '*')):
-        data = NetPayOutData(dataname=fname, **dkwargs)
+    # add all the data files available in the directory datadir, parsed
+    # from the text only if they changed since the last run
+    fnames = glob.glob(os.path.join(args.datadir, '*'))
+    if args.nocache:
+        feeds = [NetPayOutData(dataname=fname, **dkwargs) for fname in fnames]
+    else:
+        feeds = cached_feeds(fnames, workers=args.workers, **dkwargs)
+
+    for data in feeds:
         cerebro.adddata(data)
 
     # add strategy
-    cerebro.addstrategy(St, **eval('dict(' + args.strat + ')'))
+    skwargs = eval('dict(' + args.strat + ')')
+    if args.indcache:
+        skwargs['cache'] = indcache.IndicatorCache(args.indcache)
+    cerebro.addstrategy(St, **skwargs)
 
     # set the cash
     cerebro.broker.setcash(args.cash)
@@ -128,6 +239,15 @@ def parse_args(pargs=None):
     parser.add_argument('--datadir', required=True,
                         help='Directory with data files')
 
+    parser.add_argument('--nocache', action='store_true',
+                        help='Parse the data files with the CSV feed every run')
+
+    parser.add_argument('--workers', default=None, type=int,
+                        help='Processes parsing the data files not cached yet')
+
+    parser.add_argument('--indcache', default='',
+                        help='Directory of the indicator cache (none if empty)')
+
     parser.add_argument('--dargs', default='',
                         metavar='kwargs', help='kwargs in k1=v1,k2=v2 format')
 
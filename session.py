@@ -0,0 +1,76 @@
+'''
+Cerebro session: load and preload the data feeds once, run many backtests
+
+Every bt.Cerebro.run() resets, restarts and preloads (parses) all its data
+feeds before running the strategies. A Session does that on its first run
+only and afterwards just rewinds the line buffers, so repeated runs of
+different strategies / parameters only pay for the strategy logic. The
+broker is restarted (cash, positions, orders) by every run, analyzers and
+observers are created anew for every strategy instance.
+
+    session = Session(stdstats=False)
+    session.adddata(data)
+    session.addanalyzer(bt.analyzers.SharpeRatio)
+    for period in range(10, 50):
+        strat = session.runone(SmaCross, period=period)
+
+It is a Cerebro, so adddata/addanalyzer/broker/optstrategy work as usual.
+Feeds that cannot be preloaded (live, replayed) or preload=False
+fall back to the regular reload on every run.
+'''
+import backtrader as bt
+
+
+class Session(bt.Cerebro):
+
+    def __init__(self, **kwargs):
+        super(Session, self).__init__(**kwargs)
+        self._preloaded = False
+
+    def runone(self, strategy, *args, **kwargs):
+        '''Run only `strategy` with the given params, return the instance'''
+        self.strats = []
+        self.addstrategy(strategy, *args, **kwargs)
+        return self.run()[0]
+
+    def runmany(self, strategy, params):
+        '''Run `strategy` once per dict of params, return the instances'''
+        return [self.runone(strategy, **p) for p in params]
+
+    def runstrategies(self, iterstrat, predata=False):
+        if predata or not self._dopreload:
+            # already preloaded by run() (optimization on a process pool) or
+            # nothing to keep
+            return super(Session, self).runstrategies(iterstrat, predata=predata)
+
+        if not self._preloaded:
+            for data in self.datas:
+                data.reset()
+                if self._exactbars < 1:  # datas can be full length
+                    data.extend(size=self.params.lookahead)
+                data._start()
+                data.preload()
+            self._preloaded = True
+        else:
+            # rewind the buffers the previous run moved to the end
+            for data in self.datas:
+                data.home()
+
+        return super(Session, self).runstrategies(iterstrat, predata=True)
+
+    def adddata(self, data, name=None):
+        self._preloaded = False
+        return super(Session, self).adddata(data, name=name)
+
+    def close(self):
+        '''Stop the preloaded feeds (closes their files)'''
+        if self._preloaded:
+            for data in self.datas:
+                data.stop()
+            self._preloaded = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,6 +1,5 @@
 # Backtesting Portfolios of Leveraged ETFs in Python with Backtrader
 
-import tqdm
 import pandas as pd
 import pandas_datareader.data as web
 import datetime
@@ -10,19 +9,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 plt.rcParams["figure.figsize"] = (10, 6) # (w, h)
 
-def sim_leverage(proxy, leverage=1, expense_ratio = 0.0, initial_value=1.0):
-    """
-    Simulates a leverage ETF given its proxy, leverage, and expense ratio.
-    
-    Daily percent change is calculated by taking the daily percent change of
-    the proxy, subtracting the daily expense ratio, then multiplying by the leverage.
-    """
-    pct_change = proxy.pct_change(1)
-    pct_change = (pct_change - expense_ratio / 252) * leverage
-    sim = (1 + pct_change).cumprod() * initial_value
-    sim[0] = initial_value
-    return sim
-
+from leverage import sim_leverage, sweep
+from session import Session
 
 # For this article we will be using two leveraged ETFs: UPRO, a 3x leveraged S&P 500 ETF featured in my last post, and TMF, a 3x leveraged U.S. Treasury 20+ Year Bond Index. 
 
@@ -56,22 +44,27 @@ class BuyAndHold(bt.Strategy):
             self.order_target_percent(self.data, target=1.0)
 
 
-# helper function
+# helper function: one session per set of datas, so the feeds are parsed
+# once and every later backtest on them only runs the strategy
+
+sessions = {}
 
 def backtest(datas, strategy, plot=False, **kwargs):
-    cerebro = bt.Cerebro()
-    for data in datas:
-        cerebro.adddata(data)
-    cerebro.addanalyzer(bt.analyzers.SharpeRatio, riskfreerate=0.0)
-    cerebro.addanalyzer(bt.analyzers.Returns)
-    cerebro.addanalyzer(bt.analyzers.DrawDown)
-    cerebro.addstrategy(strategy, **kwargs)
-    results = cerebro.run()
+    key = tuple(map(id, datas))
+    if key not in sessions:
+        cerebro = sessions[key] = Session()
+        for data in datas:
+            cerebro.adddata(data)
+        cerebro.addanalyzer(bt.analyzers.SharpeRatio, riskfreerate=0.0)
+        cerebro.addanalyzer(bt.analyzers.Returns)
+        cerebro.addanalyzer(bt.analyzers.DrawDown)
+    cerebro = sessions[key]
+    result = cerebro.runone(strategy, **kwargs)
     if plot:
         cerebro.plot()
-    return (results[0].analyzers.drawdown.get_analysis()['max']['drawdown'],
-            results[0].analyzers.returns.get_analysis()['rnorm100'],
-            results[0].analyzers.sharperatio.get_analysis()['sharperatio'])
+    return (result.analyzers.drawdown.get_analysis()['max']['drawdown'],
+            result.analyzers.returns.get_analysis()['rnorm100'],
+            result.analyzers.sharperatio.get_analysis()['sharperatio'])
 
 # We’ll test our buy-and-hold strategy using VFINX, the S&P 500 ETF as our benchmark:
 
@@ -104,15 +97,17 @@ class AssetAllocation(bt.Strategy):
 dd, cagr, sharpe = backtest([upro_sim, tmf_sim], AssetAllocation, plot=True, equity=0.6)
 print(f"Max Drawdown: {dd:.2f}%\nCAGR: {cagr:.2f}%\nSharpe: {sharpe:.3f}")
 
-# optimization
-
-sharpes = {}
-for perc_equity in tqdm.trange(0,101,5):
-    sharpes[perc_equity] = backtest([upro_sim, tmf_sim], AssetAllocation, equity=(perc_equity / 100.0))[2]
-# for perc_equity in range(0, 101, 5):
-#     sharpes[perc_equity] = backtest([upro_sim, tmf_sim], AssetAllocation, equity=(perc_equity / 100.0))[2]
+# optimization: every split at 1% steps and several rebalance intervals in
+# one vectorized sweep (fractional shares, rebalanced at the close), instead
+# of one Cerebro run per allocation
 
+prices = pd.concat([upro_sim.p.dataname["close"], tmf_sim.p.dataname["close"]], axis=1).dropna()
+grid = sweep(prices, equity=np.arange(0, 101) / 100.0, intervals=(1, 5, 20, 60))
+print(grid["sharpe"].unstack("interval").iloc[::10])
+interval, perc = grid["sharpe"].idxmax()
+print(f"Max Sharpe of {grid['sharpe'].max():.3f} at {perc:.0%} UPRO, rebalanced every {interval} days")
 
+sharpes = grid.loc[20, "sharpe"].rename(lambda equity: round(equity * 100))
 series = pd.Series(sharpes)
 ax = series.plot(title="UPRO/TMF allocation vs Sharpe")
 ax.set_ylabel("Sharpe Ratio")
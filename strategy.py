@@ -1,6 +1,5 @@
 import backtrader as bt 
 import pandas as pd
-import pandas_datareader.data as web
 import backtrader as bt
 import numpy as np
 from datetime import datetime 
@@ -10,59 +9,153 @@ start = datetime(end.year - 5, end.month , end.day)
 bad = []
 
 class CrossSectionalMR(bt.Strategy):
+    params = (
+        # only send an order when the target weight of a stock is more than
+        # this away from the weight it holds (None: an order for every stock
+        # on every bar, as order_target_percent per data did)
+        ('threshold', None),
+        # membership.Membership: only the index members of the day are
+        # traded (no survivorship bias), None for every data
+        ('members', None),
+    )
+
+    def start(self):
+        # preallocated once, reused on every bar
+        n = len(self.datas)
+        self.closes = [d.close for d in self.datas]
+        self.cur = np.zeros(n)
+        self.prev = np.ones(n)
+        self.listed = np.zeros(n, dtype=bool)  # with a previous bar
+        self.available = np.zeros(n, dtype=bool)
+        self.rets = np.zeros(n)
+        self.weights = np.zeros(n)
+        self.scratch = np.zeros(n)
+        self.held = np.zeros(n)  # weights of the positions
+        if self.p.members is not None:
+            self.memcols = self.p.members.columns([d._name for d in self.datas])
+
     def prenext(self):
         self.next()
     
     def next(self):
-        # only look at data that existed yesterday
-        available = list(filter(lambda d: len(d), self.datas)) 
-        
-        rets = np.zeros(len(available))
-        for i, d in enumerate(available):
-            # calculate individual daily returns
-            rets[i] = (d.close[0]- d.close[-1]) / d.close[-1]
+        cur, prev, available = self.cur, self.prev, self.available
+        for i, close in enumerate(self.closes):
+            # only look at data that existed yesterday
+            if len(close) > 1:
+                available[i] = True
+                cur[i] = close[0]
+                prev[i] = close[-1]
+        self.listed[:] = available
+        if self.p.members is not None:
+            available &= self.p.members.row(self.datetime.date())[self.memcols]
+
+        count = np.count_nonzero(available)
+        if not count:
+            return
+
+        # calculate individual daily returns (0 for stocks not available)
+        rets = self.rets
+        np.subtract(cur, prev, out=rets)
+        np.divide(rets, prev, out=rets)
+        np.multiply(rets, available, out=rets)
 
         # calculate weights using formula
-        market_ret = np.mean(rets)
-        weights = -(rets - market_ret)
-        weights = weights / np.sum(np.abs(weights))
-        
-        for i, d in enumerate(available):
-            self.order_target_percent(d, target=weights[i])
-
-cerebro = bt.Cerebro(stdstats=False)
-cerebro.broker.set_coc(True)
-
-tickers = pd.read_csv("spy/tickers.csv")["0"].tolist()
-import os 
-
-tickers = os.listdir("./spy")
-
-tickers.remove("tickers.csv")
-print (tickers)
-
-for ticker in tickers:
-    data = bt.feeds.GenericCSVData(
-        fromdate=start,
-        todate=end,
-        dataname=f"spy/{ticker}",
-        dtformat=('%Y-%m-%d'),
-        openinterest=-1,
-        nullvalue=0.0,
-        plot=False
-    )
-    cerebro.adddata(data)
+        market_ret = rets.sum() / count
+        weights = self.weights
+        np.subtract(market_ret, rets, out=weights)
+        np.multiply(weights, available, out=weights)
+        total = np.abs(weights, out=self.scratch).sum()
+        if not total:
+            return
+        weights /= total
+
+        # the portfolio value is taken once: order_target_percent would
+        # recompute it over every position for every single order. With a
+        # threshold only the stocks whose held weight (position value over
+        # portfolio value, drifting with the price) is far enough from the
+        # target turn into orders
+        value = self.broker.getvalue()
+        if self.p.threshold is None:
+            # the non-members too: a target of 0 closes what they hold
+            trade = np.flatnonzero(self.listed)
+        else:
+            held = self.held
+            for i, d in enumerate(self.datas):
+                held[i] = self.broker.getposition(d).size
+            np.multiply(held, cur, out=held)
+            held /= value
+            np.subtract(weights, held, out=self.scratch)
+            np.abs(self.scratch, out=self.scratch)
+            trade = np.flatnonzero(self.scratch > self.p.threshold)
+        for i in trade:
+            self.order_target_value(self.datas[i], target=weights[i] * value)
+
+if __name__ == '__main__':
+    import argparse
+
+    import pricestore
+    import vecbacktest
+    from profiling import Profiler
+
+    parser = argparse.ArgumentParser(description='Cross-sectional mean reversion')
+    parser.add_argument('--fast', action='store_true',
+                        help='vectorized estimate (vecbacktest: fractional shares, every '
+                             'order filled) instead of the backtrader run')
+    parser.add_argument('--commission', type=float, default=0.0)
+    parser.add_argument('--holdings', default=None,
+                        help='directory of recorded index holdings: trade the members of the day only')
+    parser.add_argument('--profile', default=None,
+                        help='JSON file for the per-component timings of the backtrader run')
+    args = parser.parse_args()
+
+    store = pricestore.load("spy")
+    tickers = store.symbols
+    print (tickers)
+
+    members = None
+    if args.holdings:
+        import membership
+        members = membership.Membership.from_holdings(args.holdings)
+
+    if args.fast:
+        closes = store.frame('close').loc[start:end]
+        universe = None if members is None else members.mask(closes.index, closes.columns)
+        res = vecbacktest.backtest(closes, commission=args.commission, universe=universe)
+        print("Vectorized estimate (fractional shares, not the broker run):")
+        print(f"Sharpe: {res['sharpe']:.3f}")
+        print(f"Norm. Annual Return: {res['rnorm100']:.2f}%")
+        print(f"Max Drawdown: {res['maxdrawdown']:.2f}%")
+        raise SystemExit
+
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.broker.set_coc(True)
+    cerebro.broker.setcommission(commission=args.commission)
+
+    for ticker in tickers:
+        data = store.feed(
+            ticker,
+            fromdate=start,
+            todate=end,
+            plot=False
+        )
+        cerebro.adddata(data)
 
-cerebro.broker.setcash(1_000_000)
-cerebro.addobserver(bt.observers.Value)
-cerebro.addanalyzer(bt.analyzers.SharpeRatio, riskfreerate=0.0)
-cerebro.addanalyzer(bt.analyzers.Returns)
-cerebro.addanalyzer(bt.analyzers.DrawDown)
-cerebro.addstrategy(CrossSectionalMR)
-results = cerebro.run()
+    cerebro.broker.setcash(1_000_000)
+    cerebro.addobserver(bt.observers.Value)
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, riskfreerate=0.0)
+    cerebro.addanalyzer(bt.analyzers.Returns)
+    cerebro.addanalyzer(bt.analyzers.DrawDown)
+    cerebro.addstrategy(CrossSectionalMR, members=members)
+    if args.profile:
+        profiler = Profiler()
+        results = profiler.run(cerebro)
+        print(profiler.summary())
+        profiler.save(args.profile)
+    else:
+        results = cerebro.run()
 
 
-print(f"Sharpe: {results[0].analyzers.sharperatio.get_analysis()['sharperatio']:.3f}")
-print(f"Norm. Annual Return: {results[0].analyzers.returns.get_analysis()['rnorm100']:.2f}%")
-print(f"Max Drawdown: {results[0].analyzers.drawdown.get_analysis()['max']['drawdown']:.2f}%")
-cerebro.plot()[0][0]
+    print(f"Sharpe: {results[0].analyzers.sharperatio.get_analysis()['sharperatio']:.3f}")
+    print(f"Norm. Annual Return: {results[0].analyzers.returns.get_analysis()['rnorm100']:.2f}%")
+    print(f"Max Drawdown: {results[0].analyzers.drawdown.get_analysis()['max']['drawdown']:.2f}%")
+    cerebro.plot()[0][0]
@@ -2,6 +2,7 @@
 # from bs4 import BeautifulSoup
 # from datetime import datetime, timedelta
 # import json
+# import os
 # import pandas as pd 
 
 
@@ -19,17 +20,28 @@
 
 # dates = [option.attrs["value"] for option in dates_div.find_all("option")]
 # # print (dates)
-# # download constituents for each date
-# constituents = pd.Series()
+# # record the holdings of each date to holdings/{date}.json: the index is
+# # then built offline from the recorded files
+# os.makedirs("holdings", exist_ok=True)
 # for date in dates:
+#     path = os.path.join("holdings", f"{date}.json")
+#     if os.path.exists(path):
+#         continue
 #     resp = requests.get(
 #         f"https://www.ishares.com/us/products/239726/ishares-core-sp-500-etf/1467271812596.ajax?tab=all&fileType=json&asOfDate={date}"
-#     ).content[3:]
-#     tickers = json.loads(resp)
-#     tickers = [(arr[0], arr[1]) for arr in tickers['aaData']]
-#     date = datetime.strptime(date, "%Y%m%d")
-#     constituents[date] = tickers
+#     ).content
+#     with open(path, "wb") as f:
+#         f.write(resp)
 
-# constituents = constituents.iloc[::-1] # reverse into cronlogical order
-# constituents.head()
+# point-in-time membership from the recorded holdings: interval records per
+# symbol, members as of a date / masks aligned to the price matrix
+import os
 
+import membership
+
+if os.path.isdir("holdings"):
+    constituents = membership.Membership.from_holdings("holdings")
+    constituents.save("sp500-members.npz")
+    print("{} symbols, {} intervals, snapshots from {} to {}".format(
+        len(constituents), len(constituents.symbol),
+        constituents.start.min(), constituents.start.max()))
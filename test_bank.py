@@ -0,0 +1,58 @@
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from bank import IndicatorBank, smoothed_average
+from numpyfeed import NumpyData
+
+
+def ohlc(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    spread = np.abs(rng.normal(0, 0.005, n)) * close
+    return close, close + spread, close - spread
+
+
+def bt_atr_rsi(close, high, low, period):
+    # bt.ind.ATR / bt.ind.RSI over a feed of exactly these bars
+    class St(bt.Strategy):
+        def __init__(self):
+            self.atr = bt.ind.ATR(self.data, period=period)
+            self.rsi = bt.ind.RSI(self.data.close, period=period)
+
+    n = len(close)
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(NumpyData(dataname=pd.bdate_range('2000-01-03', periods=n).values,
+                              open=close, high=high, low=low, close=close, volume=np.zeros(n)))
+    cerebro.addstrategy(St)
+    st = cerebro.run()[0]
+    return np.asarray(st.atr.array), np.asarray(st.rsi.array)
+
+
+def test_late_listed_column_matches_backtrader():
+    n, late, period = 300, 50, 14
+    full, part = ohlc(n, 0), ohlc(n - late, 1)
+    close, high, low = [np.column_stack([a, np.concatenate([np.full(late, np.nan), b])])
+                        for a, b in zip(full, part)]
+    bank = IndicatorBank(close, high=high, low=low)
+    atr, rsi = bank.atr([period])[:, 0], bank.rsi([period])[:, 0]
+
+    for col, data, start in ((0, full, 0), (1, part, late)):
+        btatr, btrsi = bt_atr_rsi(*data, period=period)
+        assert np.isfinite(atr[start:, col]).sum() == np.isfinite(btatr).sum() > 0
+        np.testing.assert_allclose(atr[start:, col], btatr, rtol=1e-9)
+        np.testing.assert_allclose(rsi[start:, col], btrsi, rtol=1e-9)
+        assert np.isnan(atr[:start, col]).all() and np.isnan(rsi[:start, col]).all()
+
+
+def test_sma_unchanged_by_late_column():
+    close = np.column_stack([ohlc(300, 0)[0], np.concatenate([np.full(50, np.nan), ohlc(250, 1)[0]])])
+    sma = IndicatorBank(close).sma([14])[:, 0]
+    assert np.isfinite(sma[:, 1]).sum() == 237
+    np.testing.assert_allclose(sma[13:, 0], pd.Series(close[:, 0]).rolling(14).mean().values[13:])
+
+
+def test_smoothed_average_start_past_the_end():
+    x = np.arange(6.0).reshape(3, 2)
+    assert np.isnan(smoothed_average(x, 2, first=3)).all()
+    assert smoothed_average(x[:0], 2).shape == (0, 2)
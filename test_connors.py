@@ -0,0 +1,71 @@
+import importlib
+import sys
+
+import numpy as np
+import pandas as pd
+
+import connors
+import pricestore
+
+
+def closes(bars, symbols, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (bars, symbols)), axis=0)), 2)
+
+
+def test_matrix_matches_columns():
+    x = closes(400, 6)
+    x[:150, 1] = np.nan  # listed late
+    x[:399, 2] = np.nan  # a single bar
+    x[:, 3] = np.nan
+    x[250, 4] = np.nan  # a gap: NaN from there on, as in bt
+    crsi = connors.connors_rsi(x)
+    for j in range(x.shape[1]):
+        np.testing.assert_array_equal(crsi[:, j], connors.connors_rsi(x[:, j]))
+    assert np.isfinite(crsi[150 + 100:, 1]).all() and np.isnan(crsi[:150 + 100, 1]).all()
+    assert np.isnan(crsi[:, 2:4]).all() and np.isnan(crsi[250:, 4]).all()
+
+    # a column on its own, from its first close
+    np.testing.assert_array_equal(crsi[150:, 1], connors.connors_rsi(x[150:, 1]))
+
+
+def test_score_matches_each_symbol(tmp_path):
+    x = closes(300, 5, seed=1)
+    dates = pd.bdate_range('2010-01-04', periods=len(x))
+    starts, gaps = [0, 40, 180, 299, 0], {4: slice(100, 110)}
+    for j, start in enumerate(starts):
+        keep = np.arange(len(x)) >= start
+        if j in gaps:
+            keep[gaps[j]] = False
+        pd.DataFrame(dict(open=x[keep, j], high=x[keep, j], low=x[keep, j], close=x[keep, j],
+                          volume=1000.0), index=pd.Index(dates[keep], name='date')) \
+            .to_csv(tmp_path / ('S%d.csv' % j))
+    path = str(tmp_path / 'store')
+    pricestore.import_csv(str(tmp_path), path)
+    symbols = pricestore.PriceStore(path).symbols
+
+    scores = connors._score((path, symbols, 3, 2, 100))
+    assert [s[0] for s in scores] == ['S0', 'S1', 'S2', 'S4']  # S3 has one bar
+    for symbol, bar, last, previous in scores:
+        j = int(symbol[1:])
+        own = x[np.arange(len(x)) >= starts[j], j]
+        if j in gaps:
+            own = np.delete(own, np.arange(100, 110))  # its own bars only
+        crsi = connors.connors_rsi(own)
+        assert bar == len(x) - 1
+        np.testing.assert_array_equal([last, previous], crsi[-1:-3:-1])
+
+
+def test_streaming_without_sortedcontainers(monkeypatch):
+    x = closes(300, 1, seed=2)[:, 0]
+    expected = connors.connors_rsi(x)
+    monkeypatch.setitem(sys.modules, 'sortedcontainers', None)
+    try:
+        module = importlib.reload(connors)
+        assert module.SortedList.__module__ == 'connors'
+        stream = module.StreamingConnorsRSI()
+        got = np.array([stream.update(c) for c in x])
+    finally:
+        monkeypatch.undo()
+        importlib.reload(connors)
+    np.testing.assert_allclose(got, expected, rtol=1e-9, equal_nan=True)
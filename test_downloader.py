@@ -0,0 +1,104 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import downloader
+from downloader import Manifest, download_all
+
+
+class Crash(BaseException):
+    '''The run being killed'''
+
+
+class FakeReader(object):
+    '''
+    Fake DataReader: a small frame per ticker; `failures` failed calls per
+    ticker first (None: every call), a Crash after `crash_after` calls
+    '''
+
+    def __init__(self, failures=None, crash_after=None):
+        self.failures = dict(failures or {})
+        self.crash_after = crash_after
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, ticker):
+        with self.lock:
+            self.calls.append(ticker)
+            if self.crash_after is not None and len(self.calls) > self.crash_after:
+                raise Crash()
+            left = self.failures.get(ticker, 0)
+            if left is None or left > 0:
+                if left:
+                    self.failures[ticker] = left - 1
+                raise IOError('fake failure for %s' % ticker)
+        index = pd.bdate_range('2020-01-01', periods=5, name='date')
+        return pd.DataFrame(dict(close=np.arange(5.0)), index=index)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # the backoff delays, not slept
+    out = []
+    monkeypatch.setattr(downloader.time, 'sleep', out.append)
+    return out
+
+
+TICKERS = ['T%02d' % i for i in range(20)]
+
+
+def test_resume_after_crash(tmp_path, sleeps):
+    outdir = str(tmp_path)
+    with pytest.raises(Crash):
+        download_all(TICKERS, FakeReader(crash_after=8), outdir=outdir, workers=1, rate=1e6)
+    # a line cut short when the run was killed
+    with open(tmp_path / 'manifest.jsonl', 'a') as f:
+        f.write('{"ticker": "T19", "ro')
+
+    reader = FakeReader()
+    done, failed = download_all(TICKERS, reader, outdir=outdir, workers=1, rate=1e6)
+    assert sorted(reader.calls) == TICKERS[8:]
+    assert sorted(done) == TICKERS and not failed
+    assert all((tmp_path / ('%s.csv' % t)).exists() for t in TICKERS)
+
+
+def test_other_key_starts_over(tmp_path, sleeps):
+    download_all(TICKERS, FakeReader(), outdir=str(tmp_path), key='a', workers=1, rate=1e6)
+    reader = FakeReader()
+    download_all(TICKERS, reader, outdir=str(tmp_path), key='b', workers=1, rate=1e6)
+    assert sorted(reader.calls) == TICKERS
+
+
+def test_retries_with_backoff(tmp_path, sleeps):
+    reader = FakeReader(failures={'T03': 2})
+    done, failed = download_all(TICKERS, reader, outdir=str(tmp_path), workers=1, rate=1e6,
+                                retries=3, backoff=0.5)
+    assert reader.calls.count('T03') == 3 and 'T03' in done and not failed
+    # 0.5 then 1.0 seconds, each with up to 100% jitter
+    assert len(sleeps) == 2
+    assert 0.5 <= sleeps[0] <= 1.0 and 1.0 <= sleeps[1] <= 2.0
+
+
+def test_failed_symbols_are_recorded(tmp_path, sleeps):
+    reader = FakeReader(failures={'T05': None, 'T07': None})
+    done, failed = download_all(TICKERS, reader, outdir=str(tmp_path), workers=4, rate=1e6,
+                                retries=2, backoff=0.01)
+    assert sorted(failed) == ['T05', 'T07'] and len(done) == len(TICKERS) - 2
+    assert reader.calls.count('T05') == 3
+    assert failed['T05'] == 'OSError: fake failure for T05'
+
+    manifest = Manifest(str(tmp_path / 'manifest.jsonl'))
+    assert manifest.failed == failed and sorted(manifest.done) == sorted(done)
+
+    # a re-run retries the failed symbols only
+    reader = FakeReader()
+    done, failed = download_all(TICKERS, reader, outdir=str(tmp_path), workers=4, rate=1e6)
+    assert sorted(reader.calls) == ['T05', 'T07'] and not failed
+
+
+def test_completed_run_removes_manifest(tmp_path, sleeps):
+    download_all(TICKERS, FakeReader(), outdir=str(tmp_path), workers=1, rate=1e6,
+                 keep_manifest=False)
+    assert not (tmp_path / 'manifest.jsonl').exists()
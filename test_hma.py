@@ -0,0 +1,107 @@
+import importlib.util
+import sys
+from datetime import datetime, timedelta
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+import pytest
+
+import hma
+import optimize
+from numpyfeed import NumpyData
+
+# the screener script runs its sections under a __main__ guard only
+spec = importlib.util.spec_from_file_location('screener', 'backtrader-screening-dumb-stuff.py')
+screener = sys.modules['screener'] = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(screener)
+screener.optimization = True  # no logging
+
+TODAY = datetime(2021, 6, 30)
+
+
+@pytest.fixture(scope='module')
+def paths(tmp_path_factory):
+    # Yahoo style files, the second one too expensive for some buys
+    tmp = tmp_path_factory.mktemp('data')
+    rng = np.random.default_rng(3)
+    dates = pd.bdate_range('2019-01-02', TODAY)
+    out = {}
+    for ticker, level in (('AAA', 50.0), ('BBB', 990.0)):
+        close = np.round(level * np.exp(np.cumsum(rng.normal(0, 0.015, len(dates)))), 2)
+        opn = np.round(close * np.exp(rng.normal(0, 0.005, len(dates))), 2)
+        df = pd.DataFrame({'Date': dates.strftime('%Y-%m-%d'), 'Open': opn,
+                           'High': np.maximum(opn, close), 'Low': np.minimum(opn, close),
+                           'Close': close, 'Adj Close': close, 'Volume': 1000})
+        out[ticker] = str(tmp / ('%s.txt' % ticker))
+        df.to_csv(out[ticker], index=False)
+    return out
+
+
+class Recorded(screener.TestStrategy):
+    # the executed buys, as bar dates
+    def start(self):
+        self.buys = []
+
+    def notify_order(self, order):
+        if order.status == order.Completed and order.isbuy():
+            self.buys.append(self.datas[0].datetime.date(0))
+        super(Recorded, self).notify_order(order)
+
+
+def cerebro_run(arrays, period, fromdate, todate):
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(NumpyData(dataname=arrays['datetime'], fromdate=fromdate, todate=todate,
+                              **{f: arrays[f] for f in ('open', 'high', 'low', 'close', 'volume')}))
+    cerebro.broker.setcash(1000.0)
+    cerebro.addsizer(bt.sizers.FixedSize, stake=1)
+    cerebro.addstrategy(Recorded, maperiod=period)
+    st = cerebro.run()[0]
+    return st, cerebro.broker.getvalue()
+
+
+@pytest.mark.parametrize('period', [15, 22, 29])
+def test_hma_matches_backtrader(paths, period):
+    arrays = optimize.read_yahoo_csv(paths['AAA'])
+    st, _ = cerebro_run(arrays, period, None, None)
+    expected = np.asarray(st.hma.array)
+    got = hma.hma(arrays['close'], period)
+    assert np.isnan(got[:len(got) - np.isfinite(expected).sum()]).all()
+    np.testing.assert_allclose(got, expected, rtol=1e-12, atol=1e-10)
+
+
+@pytest.mark.parametrize('ticker', ['AAA', 'BBB'])
+def test_replay_matches_cerebro_buys(paths, ticker):
+    arrays = optimize.read_yahoo_csv(paths[ticker])
+    for period in (15, 20, 25):
+        st, value = cerebro_run(arrays, period, None, None)
+        troughs, peaks = hma.reversals(hma.hma(arrays['close'], period))
+        got, fills = hma.replay(arrays['open'], arrays['close'], troughs, peaks)
+        assert got == pytest.approx(value, abs=1e-9)
+        assert [bt.num2date(arrays['datetime'][i]).date() for i in fills] == st.buys
+        assert st.buys
+
+
+def test_screen_matches_the_cerebro_sections(paths):
+    periods = range(15, 30)
+    table = hma.screen({t: optimize.read_yahoo_csv(p) for t, p in paths.items()},
+                       periods=periods, optdays=365, signaldays=120, today=TODAY)
+
+    # Section (1) and (2) of the screener, as the script runs them
+    start = TODAY - timedelta(days=365)
+    with optimize.SharedPrices.from_yahoo_csv(paths) as prices:
+        records = optimize.optimize(prices, screener.TestStrategy, dict(maperiod=periods),
+                                    workers=1, fromdate=start, todate=TODAY,
+                                    cash=1000.0, stake=1, commission=0.0)
+    best = optimize.best(records)
+    for row in table.itertuples():
+        assert row.best_period == best[row.ticker]['maperiod']
+        cerebro = bt.Cerebro()
+        cerebro.adddata(bt.feeds.YahooFinanceCSVData(
+            dataname=paths[row.ticker], fromdate=TODAY - timedelta(days=120), todate=TODAY,
+            reverse=False))
+        cerebro.broker.setcash(1000.0)
+        cerebro.addsizer(bt.sizers.FixedSize, stake=1)
+        cerebro.addstrategy(Recorded, maperiod=row.best_period)
+        st = cerebro.run()[0]
+        assert row.last_buy == (st.buys[-1] if st.buys else None)
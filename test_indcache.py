@@ -0,0 +1,154 @@
+import importlib
+import os
+import sys
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+import pytest
+
+import indcache
+from numpyfeed import NumpyData
+
+
+def test_key_follows_the_code_of_used_modules(tmp_path, monkeypatch):
+    # a function whose module uses a helper of another module next to it
+    (tmp_path / 'ichelper.py').write_text('def scale(x):\n    return 2 * x\n')
+    (tmp_path / 'icfunc.py').write_text('from ichelper import scale\n\n'
+                                        'def double(values):\n    return scale(values)\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import icfunc
+    before = indcache._code(icfunc.double)
+
+    (tmp_path / 'ichelper.py').write_text('def scale(x):\n    return 3 * x\n')
+    for name in ('ichelper', 'icfunc'):
+        indcache._digests.pop(name, None)
+        sys.modules.pop(name, None)
+    importlib.invalidate_caches()
+    import icfunc
+    assert indcache._code(icfunc.double) != before
+
+
+class CountedSMA(bt.ind.SMA):
+    # SMA counting its computations: none on a cache hit
+    calls = 0
+
+    def once(self, start, end):
+        CountedSMA.calls += 1
+        super(CountedSMA, self).once(start, end)
+
+    def next(self):
+        CountedSMA.calls += 1
+        super(CountedSMA, self).next()
+
+
+def closes(n=300, seed=0):
+    return 100 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.01, n)))
+
+
+def run(close, cache=None, period=20, runonce=True):
+    '''Lines of CountedSMA(period) over close (cached if cache) and its computations'''
+    class St(bt.Strategy):
+        def __init__(self):
+            if cache is None:
+                self.sma = CountedSMA(self.data.close, period=period)
+            else:
+                self.sma = cache.indicator(CountedSMA, self.data.close, period=period)
+
+    n = len(close)
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(NumpyData(dataname=pd.bdate_range('2000-01-03', periods=n).values,
+                              open=close, high=close, low=close, close=close, volume=np.zeros(n)))
+    cerebro.addstrategy(St)
+    CountedSMA.calls = 0
+    st = cerebro.run(runonce=runonce)[0]
+    return np.asarray(st.sma.array), CountedSMA.calls
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return indcache.IndicatorCache(str(tmp_path / 'cache'))
+
+
+@pytest.mark.parametrize('runonce', [True, False])
+def test_hit_skips_computation(cache, runonce):
+    close = closes()
+    plain, _ = run(close, runonce=runonce)
+
+    first, calls = run(close, cache, runonce=runonce)
+    assert calls > 0 and (cache.hits, cache.misses) == (0, 1)
+
+    second, calls = run(close, cache, runonce=runonce)
+    assert calls == 0 and (cache.hits, cache.misses) == (1, 1)
+    np.testing.assert_array_equal(first, plain)
+    np.testing.assert_array_equal(second, plain)
+
+
+def test_changed_data_misses(cache):
+    close = closes()
+    run(close, cache)
+    close[-1] *= 1.01
+    values, calls = run(close, cache)
+    assert calls > 0 and cache.misses == 2
+    np.testing.assert_array_equal(values, run(close)[0])
+
+
+def test_changed_params_miss(cache):
+    close = closes()
+    run(close, cache, period=20)
+    values, calls = run(close, cache, period=30)
+    assert calls > 0 and cache.misses == 2
+    np.testing.assert_array_equal(values, run(close, period=30)[0])
+    assert run(close, cache, period=20)[1] == 0  # both entries kept
+
+
+def test_compute_frame(cache):
+    frame = pd.DataFrame({'A': closes(seed=1), 'B': closes(seed=2)},
+                         index=pd.bdate_range('2000-01-03', periods=300))
+    calls = []
+
+    def ratio(values, period):
+        calls.append(period)
+        return values / values.shift(period)
+
+    first = cache.compute(ratio, frame, period=5)
+    second = cache.compute(ratio, frame, period=5)
+    assert calls == [5] and isinstance(second, pd.DataFrame)
+    pd.testing.assert_frame_equal(second, first, check_freq=False)
+
+    cache.compute(ratio, frame, period=10)
+    cache.compute(ratio, frame * 2, period=5)
+    assert calls == [5, 10, 5]
+
+
+def test_lru_eviction(tmp_path):
+    probe = indcache.IndicatorCache(str(tmp_path / 'probe'))
+    probe.put('probe', np.zeros(100))
+    size = os.path.getsize(probe._file('probe', '.npy'))
+
+    cache = indcache.IndicatorCache(str(tmp_path / 'cache'), maxbytes=3 * size)
+    for t, key in enumerate('abc'):
+        cache.put(key, np.full(100, t))
+        os.utime(cache._file(key, '.npy'), (1000 + t, 1000 + t))
+    assert cache.get('a') is not None  # a is now the most recently used
+
+    cache.put('d', np.zeros(100))
+    left = sorted(f[:-4] for f in os.listdir(cache.path) if f.endswith('.npy'))
+    assert left == ['a', 'c', 'd']
+    assert not os.path.exists(cache._file('b', '.json'))
+
+
+def test_module_functions_without_cache():
+    close = closes()
+    assert indcache.compute(None, np.cumsum, close)[-1] == np.cumsum(close)[-1]
+
+    class St(bt.Strategy):
+        def __init__(self):
+            self.sma = indcache.indicator(None, bt.ind.SMA, self.data.close, period=20)
+
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(NumpyData(dataname=pd.bdate_range('2000-01-03', periods=len(close)).values,
+                              close=close))
+    cerebro.addstrategy(St)
+    st = cerebro.run()[0]
+    assert type(st.sma) is bt.ind.SMA
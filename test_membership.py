@@ -0,0 +1,22 @@
+import json
+
+import numpy as np
+
+from membership import Membership
+
+
+def test_from_holdings_ignores_other_files(tmp_path, capsys):
+    for date, tickers in (('20190131', ['A', 'B']), ('20190228', ['B', 'C'])):
+        with open(tmp_path / (date + '.json'), 'w', encoding='utf-8-sig') as f:
+            json.dump(dict(aaData=[[t, 'Name of ' + t] for t in tickers]), f)
+    (tmp_path / 'README').write_text('recorded IVV holdings\n')
+    (tmp_path / '.DS_Store').write_bytes(b'\0\1')
+    (tmp_path / '20190331.json.tmp').write_text('{"aaData": [')
+    (tmp_path / 'notes.csv').write_text('ticker\nZ\n')
+
+    members = Membership.from_holdings(str(tmp_path))
+    assert 'skipped 1 holdings files not named after a date: notes.csv' in capsys.readouterr().out
+    assert members.symbols == ['A', 'B', 'C']
+    assert members.members('2019-02-01') == ['A', 'B']
+    assert members.members('2019-03-15') == ['B', 'C']
+    assert members.dates[0] == np.datetime64('2019-01-31')
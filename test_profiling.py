@@ -0,0 +1,19 @@
+import importlib
+import math
+import sys
+
+import profiling
+
+
+def test_peak_rss_without_resource(monkeypatch):
+    # Windows: no resource module, and psutil not installed
+    monkeypatch.setitem(sys.modules, 'resource', None)
+    monkeypatch.setitem(sys.modules, 'psutil', None)
+    try:
+        module = importlib.reload(profiling)
+        assert module.resource is None
+        assert math.isnan(module.peak_rss())
+    finally:
+        monkeypatch.undo()
+        importlib.reload(profiling)
+    assert profiling.peak_rss() > 0
@@ -0,0 +1,72 @@
+import backtrader as bt
+import numpy as np
+import pytest
+
+import screening
+
+
+def preloaded(feeds):
+    cerebro = bt.Cerebro()
+    for data in feeds:
+        cerebro.adddata(data)
+        data._start()
+        data.preload()
+    return feeds
+
+
+def lines(data):
+    return {name: np.asarray(getattr(data.lines, name).array)
+            for name in data.lines.getlinealiases()}
+
+
+@pytest.mark.parametrize('nullvalue', [float('NaN'), 0.0, -1.0])
+def test_cached_feeds_nullvalue(tmp_path, nullvalue):
+    fname = tmp_path / 'T0.csv'
+    fname.write_text('date,open,high,low,close,volume,npy\n'
+                     '2000-01-31,1,2,0.5,1.5,100,0.01\n'
+                     '2000-02-29,1.5,2,1,,,0.02\n'
+                     '2000-03-31,2,3,1.5,2.5,300,\n')
+    plain, = preloaded([screening.NetPayOutData(dataname=str(fname), nullvalue=nullvalue)])
+    cached, = preloaded(screening.cached_feeds([str(fname)], workers=1, nullvalue=nullvalue))
+    expected, got = lines(plain), lines(cached)
+    for name in expected:
+        np.testing.assert_array_equal(got[name], expected[name], err_msg=name)
+
+
+def test_order_sizes_match_order_target_value():
+    # positions of `held` shares at `prices`, then per data a target value
+    # on both sides of a whole number of shares (where the rounding shows)
+    rng = np.random.default_rng(0)
+    n = 200
+    prices = np.round(rng.uniform(5, 500, n), 2)
+    held = rng.integers(0, 500, n).astype(float)
+    shares = rng.integers(-held, 300)
+    targets = (held + shares) * prices
+    targets = np.where(np.arange(n) % 3 == 1, np.nextafter(targets, -np.inf), targets)
+    targets = np.where(np.arange(n) % 3 == 2, np.nextafter(targets, np.inf), targets)
+    targets[:5] = 0.0  # closing
+
+    class Sizes(bt.Strategy):
+        def next(self):
+            if len(self) == 1:
+                for data, size in zip(self.datas, held):
+                    if size:
+                        self.buy(data, size=size)
+            elif len(self) == 2:
+                sizes = [self.getposition(d).size for d in self.datas]
+                self.batch = screening.order_sizes(targets, sizes, prices)
+                orders = [self.order_target_value(d, target=t) for d, t in zip(self.datas, targets)]
+                self.single = np.array([o.created.size if o else 0.0 for o in orders])
+
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.broker.setcash(1e9)
+    cerebro.broker.set_coc(True)  # bar 1 buys fill at its close
+    dates = np.arange('2020-01-01', '2020-01-04', dtype='datetime64[D]')
+    for price in prices:
+        line = np.full(len(dates), price)
+        cerebro.adddata(screening.NumpyData(dataname=dates, open=line, high=line, low=line,
+                                            close=line, volume=line))
+    cerebro.addstrategy(Sizes)
+    st = cerebro.run()[0]
+    assert (st.batch > 0).any() and (st.batch < 0).any()
+    np.testing.assert_array_equal(st.batch, st.single)
@@ -0,0 +1,88 @@
+import backtrader as bt
+import numpy as np
+import pandas as pd
+import pytest
+
+from numpyfeed import NumpyData
+from strategy import CrossSectionalMR
+
+# the original's 0 / 0 weights on its first bar
+pytestmark = pytest.mark.filterwarnings('ignore:invalid value:RuntimeWarning')
+
+
+class LoopMR(bt.Strategy):
+    # the original strategy.py implementation
+    def prenext(self):
+        self.next()
+
+    def next(self):
+        available = list(filter(lambda d: len(d), self.datas))
+
+        rets = np.zeros(len(available))
+        for i, d in enumerate(available):
+            rets[i] = (d.close[0] - d.close[-1]) / d.close[-1]
+
+        market_ret = np.mean(rets)
+        weights = -(rets - market_ret)
+        weights = weights / np.sum(np.abs(weights))
+
+        for i, d in enumerate(available):
+            self.order_target_percent(d, target=weights[i])
+
+
+def run(strategy, **kwargs):
+    rng = np.random.default_rng(0)
+    n = 250
+    dates = pd.bdate_range('2015-01-02', periods=n).values
+    closes = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n, 12)), axis=0)), 2)
+    # on its first bar the original reads close[-1] off the end of the
+    # preloaded line: with the last close equal to the first its returns are
+    # 0 there and it sends no orders, like CrossSectionalMR waiting a bar
+    closes[-1] = closes[0]
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.broker.set_coc(True)
+    cerebro.broker.setcash(1_000_000)
+    for c in closes.T:
+        cerebro.adddata(NumpyData(dataname=dates, open=c, high=c, low=c, close=c,
+                                  volume=np.zeros(n)))
+    cerebro.addstrategy(strategy, **kwargs)
+    st = cerebro.run()[0]
+    return st, cerebro.broker.getvalue()
+
+
+@pytest.mark.parametrize('threshold', [None, 0.0])
+def test_final_value_matches_the_loop(threshold):
+    st, value = run(CrossSectionalMR, threshold=threshold)
+    loop, loopvalue = run(LoopMR)
+    assert value == loopvalue
+    assert len(st._orders) == len(loop._orders)
+
+
+class Checked(CrossSectionalMR):
+    # the largest gap between the target and the held weight of a stock
+    # left without an order
+    def start(self):
+        super(Checked, self).start()
+        self.gap = 0.0
+
+    def next(self):
+        self.ordered = set()
+        super(Checked, self).next()
+        value = self.broker.getvalue()
+        for i, d in enumerate(self.datas):
+            if len(d) > 1 and i not in self.ordered:
+                held = self.getposition(d).size * d.close[0] / value
+                self.gap = max(self.gap, abs(self.weights[i] - held))
+
+    def order_target_value(self, data=None, target=0.0, **kwargs):
+        self.ordered.add(next(i for i, d in enumerate(self.datas) if d is data))
+        return super(Checked, self).order_target_value(data, target=target, **kwargs)
+
+
+def test_threshold_retargets_held_weights():
+    threshold = 0.01
+    st, value = run(Checked, threshold=threshold)
+    loop, loopvalue = run(LoopMR)
+    assert len(st._orders) < len(loop._orders)
+    assert 0 < st.gap <= threshold
+    assert value == pytest.approx(loopvalue, rel=0.01)
@@ -0,0 +1,57 @@
+import functools
+import http.server
+import json
+import threading
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import downloader
+import refresh
+import tiingo
+from downloader import download_all
+
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path):
+    # {ticker}.json price arrays, a 404 for any other ticker
+    prices = tmp_path / 'prices'
+    prices.mkdir()
+    for ticker in ('SPY', 'QQQ'):
+        with open(prices / (ticker + '.json'), 'w') as f:
+            json.dump([dict(date='2020-01-%02dT00:00:00.000Z' % day, open=1.0 * day,
+                            high=1.0 * day, low=1.0 * day, close=1.0 * day,
+                            adjClose=1.0 * day, volume=100) for day in range(2, 9)], f)
+    httpd = http.server.ThreadingHTTPServer(
+        ('127.0.0.1', 0), functools.partial(Handler, directory=str(prices)))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:%d/%%s.json?startDate=%%s&endDate=%%s&token=%%s' % httpd.server_port
+    httpd.shutdown()
+
+
+def test_refresh_goes_on_past_a_failing_ticker(tmp_path, server, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(downloader.time, 'sleep', sleeps.append)
+    start, end = datetime(2020, 1, 1), datetime(2020, 1, 10)
+
+    def update(ticker):
+        # as get-tiigo-data.py
+        return refresh.update(
+            str(tmp_path / ('%s.txt' % ticker)),
+            lambda s, e: tiingo.fetch(ticker, s, e, 'token', url=server),
+            start, end,
+            download=lambda path, s, e: tiingo.download(ticker, s, e, path, 'token', url=server))
+
+    done, failed = download_all(['SPY', 'GONE', 'QQQ'], update, outdir=str(tmp_path),
+                                save=None, workers=1, retries=2, keep_manifest=False)
+    assert sorted(done) == ['QQQ', 'SPY'] and done['SPY']['rows'] == 7
+    assert list(failed) == ['GONE'] and failed['GONE'].startswith('HTTPError: 404')
+    assert len(sleeps) == 2  # GONE retried twice
+    df = pd.read_csv(tmp_path / 'QQQ.txt', index_col=0)
+    assert list(df.columns) == tiingo.HEADER[1:] and len(df) == 7
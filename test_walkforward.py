@@ -0,0 +1,79 @@
+import datetime
+import json
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+import walkforward
+
+
+def arrays(days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2015-01-02', periods=days)
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+    return dict(datetime=np.array([bt.date2num(d.to_pydatetime()) for d in dates]),
+                open=close * np.exp(rng.normal(0, 0.002, days)), close=close)
+
+
+def keys(path):
+    with open(path) as f:
+        return set(json.load(f))
+
+
+def test_cache_keeps_only_the_windows_of_the_run(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    full = arrays(700)
+    kwargs = dict(periods=range(15, 18), insample=365, outsample=120, cache=path, workers=1)
+
+    first = walkforward.walkforward({'A': {k: v[:650] for k, v in full.items()}}, **kwargs)
+    old = keys(path)
+    assert len(old) == len(first)
+
+    # a new month of data: the last window's bars change, its old result goes
+    second = walkforward.walkforward({'A': full}, **kwargs)
+    new = keys(path)
+    assert len(new) == len(second)
+    assert len(new - old) >= 1 and len(old - new) >= 1
+
+    # unchanged data: all hits, the file is left alone
+    mtime = (tmp_path / 'cache.json').stat().st_mtime_ns
+    third = walkforward.walkforward({'A': full}, **kwargs)
+    pd.testing.assert_frame_equal(second, third)
+    assert (tmp_path / 'cache.json').stat().st_mtime_ns == mtime
+
+    # another universe sharing the file, without pruning: both kept
+    walkforward.walkforward({'B': arrays(700, seed=1)}, prune=False, **kwargs)
+    assert keys(path) > new
+
+
+def test_cache_prune():
+    cache = walkforward.Cache(None)
+    cache.results = {'a': 1, 'b': 2, 'c': 3}
+    assert cache.get('a') == 1
+    cache.put('d', 4)
+    cache.prune()
+    assert cache.results == {'a': 1, 'd': 4}
+
+
+def test_bar_on_the_boundary_is_out_of_sample():
+    # daily bars stamped at midnight: the one on insample_to starts the
+    # out-of-sample period, in evaluate as in walkforward's windows
+    bars = arrays(500, seed=2)
+    bars['datetime'] = bt.date2num(datetime.datetime(2015, 1, 2)) + np.arange(500.0)
+    moved = 0
+    for boundary in bars['datetime'][300:320]:
+        on = walkforward.evaluate(bars, boundary, range(15, 18))
+        assert on == walkforward.evaluate(bars, boundary - 1e-6, range(15, 18))
+        moved += on != walkforward.evaluate(bars, boundary + 1e-6, range(15, 18))
+    assert moved  # the bar on the boundary does change the results
+
+    table = walkforward.walkforward({'A': bars}, periods=range(15, 18), insample=365,
+                                    outsample=120, cache=None, workers=1)
+    lo, to, hi = [bt.date2num(datetime.datetime.combine(d, datetime.time()))
+                  for d in table.iloc[0][['insample_from', 'insample_to', 'outsample_to']]]
+    assert to in bars['datetime']  # a bar right on the boundary
+    rows = (bars['datetime'] >= lo) & (bars['datetime'] < hi)
+    expected = walkforward.evaluate({k: v[rows] for k, v in bars.items()}, to - 1e-6, range(15, 18))
+    assert table.iloc[0][['best_period', 'insample_value', 'outsample_value']].tolist() == \
+        [expected[k] for k in ('best_period', 'insample_value', 'outsample_value')]
@@ -0,0 +1,117 @@
+'''
+Tiingo daily prices, streamed from the HTTP response straight to CSV
+
+The price array is decoded one object at a time as the response arrives and
+rows are written in batches through a buffered csv writer, so memory stays
+flat whatever the date range.
+'''
+import codecs
+import csv
+import json
+
+import pandas as pd
+import requests
+
+URL = 'https://api.tiingo.com/tiingo/daily/%s/prices?startDate=%s&endDate=%s&token=%s'
+HEADERS = {'Content-Type': 'application/json'}
+
+# Tiingo field -> column of the data/{ticker}.txt files
+COLUMNS = (('open', 'Open'), ('high', 'High'), ('low', 'Low'), ('close', 'Close'),
+           ('adjClose', 'Adj Close'), ('volume', 'Volume'))
+HEADER = ['Date'] + [col for _, col in COLUMNS]
+
+
+def iter_json_array(chunks):
+    '''
+    Yield the objects of a JSON array of objects from an iterable of byte (or
+    text) chunks without holding the whole document in memory.
+    '''
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buf, pos, opened, closed = '', 0, False, False
+    for chunk in chunks:
+        buf = buf[pos:] + (utf8.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        pos = 0
+        if not opened:
+            pos = len(buf) - len(buf.lstrip())
+            if pos == len(buf):
+                continue
+            if buf[pos] != '[':
+                raise ValueError('expected a JSON array')
+            opened = True
+            pos += 1
+
+        # fast path: everything up to the last '}' of the buffer is normally a
+        # run of complete (flat) objects, decode them with a single call
+        last = buf.rfind('}')
+        if last >= pos:
+            try:
+                batch = json.loads('[' + buf[pos:last + 1].lstrip(' \t\r\n,') + ']')
+            except ValueError:
+                pass
+            else:
+                for obj in batch:
+                    yield obj
+                pos = last + 1
+
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos == len(buf):
+                break
+            if buf[pos] == ']':
+                closed = True
+                break
+            try:
+                obj, pos = decoder.raw_decode(buf, pos)
+            except ValueError:
+                break  # object continues in the next chunk
+            yield obj
+        if closed:
+            return
+
+    if opened or buf[pos:].strip():
+        raise ValueError('truncated JSON array')
+
+
+def _row(obj):
+    return [obj['date'][0:10]] + [obj[field] for field, _ in COLUMNS]
+
+
+def write_csv(objects, f, batch=4096, header=True):
+    '''Write price objects as CSV rows to file `f` in batches, return the row count'''
+    writer = csv.writer(f, lineterminator='\n')
+    if header:
+        writer.writerow(HEADER)
+    rows, count = [], 0
+    for obj in objects:
+        rows.append(_row(obj))
+        if len(rows) == batch:
+            writer.writerows(rows)
+            count += len(rows)
+            rows = []
+    writer.writerows(rows)
+    return count + len(rows)
+
+
+def request(ticker, start, end, token, url=URL, chunk_size=1 << 16):
+    '''Byte chunks of the price response for [start, end]'''
+    response = requests.get(
+        url % (ticker, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'), token),
+        headers=HEADERS, stream=True)
+    response.raise_for_status()
+    return response.iter_content(chunk_size=chunk_size)
+
+
+def download(ticker, start, end, path, token, url=URL):
+    '''Stream the prices for [start, end] into the CSV file `path`'''
+    with open(path, 'w', newline='', buffering=1 << 20) as f:
+        return write_csv(iter_json_array(request(ticker, start, end, token, url)), f)
+
+
+def fetch(ticker, start, end, token, url=URL):
+    '''Prices for [start, end] as a DataFrame (for the small delta refreshes)'''
+    rows = [_row(obj) for obj in iter_json_array(request(ticker, start, end, token, url))]
+    df = pd.DataFrame(rows, columns=HEADER)
+    df.index = pd.DatetimeIndex(df.pop('Date'), name='Date')
+    return df
@@ -0,0 +1,119 @@
+'''
+Vectorized backtest of cross-sectional (weight based) strategies
+
+A fast validation path for CrossSectionalMR in strategy.py: daily weights,
+turnover, commission-adjusted PnL and the three metrics strategy.py prints
+(Sharpe, normalized annual return, max drawdown) are computed as array
+operations on the aligned close matrix, so variants can be swept in seconds
+and Cerebro kept for the final confirmation.
+
+Weights are set at the close (like cheat-on-close orders) and earn the next
+day's returns. Fractional positions are assumed and every target is reached,
+so numbers differ from the broker run: it sizes in whole shares and rejects
+(Margin) the buys submitted before the sells that would pay for them.
+
+Known gap, on the spy/ store: Sharpe 1.73 here against 1.22 for the Cerebro
+run, normalized return 16.0% against 15.3%, max drawdown 20.03% against
+20.04%. Use it to compare variants with each other; the figures to report
+come from the Cerebro run (strategy.py without --fast).
+'''
+import numpy as np
+import pandas as pd
+
+
+def mean_reversion_weights(rets):
+    '''
+    Dollar neutral mean reversion: -(r - mean(r)) / sum|r - mean(r)| over the
+    stocks with a return on that day (NaN elsewhere)
+    '''
+    available = ~np.isnan(rets)
+    count = available.sum(axis=1, keepdims=True)
+    r = np.where(available, rets, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        market = r.sum(axis=1, keepdims=True) / count
+        weights = np.where(available, market - r, 0.0)
+        weights /= np.abs(weights).sum(axis=1, keepdims=True)
+    return np.nan_to_num(weights, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+# The metrics take an equity Series, or a DataFrame of equity curves (one
+# per column) and then return a Series with one value per column
+
+
+def sharpe_ratio(equity, riskfreerate=0.0):
+    '''
+    bt.analyzers.SharpeRatio(riskfreerate=0.0), as the scripts add it: yearly
+    returns of the portfolio value, mean excess return over their
+    (population) std dev. bt's own default riskfreerate is 0.01: pass
+    riskfreerate=0.01 to match an analyzer added without it
+    '''
+    values = equity.values
+    years = np.asarray(equity.index.year)
+    yearly = values[np.append(years[1:] != years[:-1], True)]
+    excess = yearly / np.concatenate([values[:1], yearly[:-1]]) - 1.0 - riskfreerate
+    mean, std = excess.mean(axis=0), excess.std(axis=0)
+    if equity.ndim == 1:
+        return mean / std if std else None
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.Series(np.where(std != 0, mean / std, np.nan), index=equity.columns)
+
+
+def normalized_return(equity, tann=252):
+    '''bt.analyzers.Returns rnorm100: log return per bar, annualized, in %'''
+    ravg = np.log(equity.iloc[-1] / equity.iloc[0]) / len(equity)
+    return 100.0 * np.expm1(ravg * tann)
+
+
+def max_drawdown(equity):
+    '''bt.analyzers.DrawDown max drawdown in %'''
+    values = equity.values
+    peak = np.maximum.accumulate(values, axis=0)
+    drawdown = 100.0 * ((peak - values) / peak).max(axis=0)
+    return drawdown if equity.ndim == 1 else pd.Series(drawdown, index=equity.columns)
+
+
+def backtest(closes, weigher=mean_reversion_weights, commission=0.0, cash=1_000_000.0,
+             universe=None):
+    '''
+    Backtest a weight based strategy on a dates x tickers close matrix (NaN
+    where a ticker has no bar). `weigher(rets) -> weights` gets the daily
+    returns matrix; `commission` is charged on the traded value (turnover).
+    `universe`, a dates x tickers boolean mask (membership.Membership.mask),
+    restricts the tickers weighted on each date: the others get no weight,
+    but a position taken the day before still earns its return.
+
+    Returns a dict with the weights/turnover/returns/equity series and the
+    sharpe, rnorm100 and maxdrawdown metrics.
+    '''
+    index = closes.index
+    prices = closes.values.astype(np.float64)
+    rets = np.full(prices.shape, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rets[1:] = prices[1:] / prices[:-1] - 1.0
+
+    if universe is None:
+        weights = weigher(rets)
+    else:
+        weights = weigher(np.where(universe, rets, np.nan))
+    held = np.zeros(weights.shape)
+    held[1:] = weights[:-1]
+    pnl = (held * np.nan_to_num(rets, nan=0.0)).sum(axis=1)
+
+    # positions drift with the prices between rebalances
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drifted = held * (1.0 + np.nan_to_num(rets, nan=0.0)) / (1.0 + pnl)[:, None]
+    turnover = np.abs(weights - drifted).sum(axis=1)
+    daily = pnl - commission * turnover
+
+    equity = pd.Series(cash * np.cumprod(1.0 + daily), index=index)
+    if not len(equity):
+        raise ValueError('no bars to backtest')
+    return dict(
+        weights=pd.DataFrame(weights, index=index, columns=closes.columns),
+        turnover=pd.Series(turnover, index=index),
+        returns=pd.Series(daily, index=index),
+        equity=equity,
+        sharpe=sharpe_ratio(equity),
+        rnorm100=normalized_return(equity),
+        maxdrawdown=max_drawdown(equity),
+    )
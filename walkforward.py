@@ -0,0 +1,186 @@
+'''
+Walk-forward optimization of the HMA screener with cached windows
+
+The in-sample window (`insample` days, the screener's optimization period)
+and the out-of-sample window that follows it (`outsample` days) roll
+through history by `step` days from a fixed origin. For every ticker and
+window the best HMA period is picked in sample and then traded out of
+sample (hma.replay), windows run in parallel on a process pool.
+
+Each result is cached under a hash of (ticker, window, parameter grid,
+the window's own bars), so a rerun after a new day of data only evaluates
+the windows whose bars changed: the newest one.
+
+    arrays = {t: optimize.read_yahoo_csv('data/%s.txt' % t) for t in ETFs}
+    table = walkforward(arrays, periods=range(15, 30))
+'''
+import datetime
+import hashlib
+import json
+import os
+from concurrent import futures
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+import hma
+
+COLUMNS = ['ticker', 'insample_from', 'insample_to', 'outsample_to',
+           'best_period', 'insample_value', 'outsample_value', 'outsample_buys']
+
+
+class Cache(object):
+    '''
+    Window results by key, in a JSON file rewritten (atomically) on save().
+    The keys read or written since loading are the run's own: save(prune=True)
+    drops the others (windows of older data, grids, universes)
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.results = {}
+        self.used = set()
+        self.changed = False
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.results = json.load(f)
+
+    def get(self, key):
+        self.used.add(key)
+        return self.results.get(key)
+
+    def put(self, key, result):
+        self.used.add(key)
+        self.results[key] = result
+        self.changed = True
+
+    def prune(self):
+        '''Drops the results not used since loading'''
+        stale = [key for key in self.results if key not in self.used]
+        for key in stale:
+            del self.results[key]
+        self.changed = self.changed or bool(stale)
+
+    def save(self, prune=False):
+        if prune:
+            self.prune()
+        if not self.path or not self.changed:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.results, f, sort_keys=True)
+        os.replace(tmp, self.path)
+        self.changed = False
+
+
+def windows(first, last, insample=365, outsample=120, step=None, origin=None):
+    '''
+    (insample_from, insample_to, outsample_to) dates, every `step` days
+    (default: `outsample`, back to back out-of-sample periods) from `origin`
+    (default: `first`). The last window is the one whose in-sample period
+    ends on or before `last`, its out-of-sample period may run past it.
+    '''
+    step = datetime.timedelta(days=step or outsample)
+    start = origin or first
+    out = []
+    while start + datetime.timedelta(days=insample) <= last:
+        end = start + datetime.timedelta(days=insample)
+        out.append((start, end, end + datetime.timedelta(days=outsample)))
+        start += step
+    return out
+
+
+def window_key(ticker, window, periods, cash, stake, bars):
+    h = hashlib.sha1()
+    h.update(repr((ticker, [d.isoformat() for d in window], list(periods), cash, stake)).encode())
+    for field in ('datetime', 'open', 'close'):
+        h.update(np.ascontiguousarray(bars[field], dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def evaluate(bars, insample_to, periods, cash=1000.0, stake=1):
+    '''
+    Best HMA period over the bars before `insample_to` (a bt date number) and
+    its result on the bars from it on: a bar stamped at `insample_to` is out
+    of sample, as walkforward cuts its windows. The HMA runs over all the
+    bars, so it is warmed up when the out-of-sample period starts.
+    '''
+    opens, closes = bars['open'], bars['close']
+    split = np.searchsorted(bars['datetime'], insample_to, 'left')
+    best = None
+    for period in periods:
+        troughs, peaks = hma.reversals(hma.hma(closes[:split], period))
+        value, _ = hma.replay(opens[:split], closes[:split], troughs, peaks, cash, stake)
+        # ties go to the larger period, like the screener
+        if best is None or (value, period) > best:
+            best = (value, period)
+
+    value, period = best
+    troughs, peaks = hma.reversals(hma.hma(closes, period))
+    oosvalue, fills = cash, []
+    if split < len(closes):
+        oosvalue, fills = hma.replay(opens[split:], closes[split:], troughs[split:],
+                                     peaks[split:], cash, stake)
+    return dict(best_period=int(period), insample_value=float(value),
+                outsample_value=float(oosvalue), outsample_buys=len(fills))
+
+
+def _evaluate(job):
+    key, bars, insample_to, periods, cash, stake = job
+    return key, evaluate(bars, insample_to, periods, cash, stake)
+
+
+def walkforward(arrays, periods=range(15, 30), insample=365, outsample=120, step=None,
+                origin=None, cache='walkforward-cache.json', workers=None,
+                cash=1000.0, stake=1, prune=True):
+    '''
+    Walk-forward HMA optimization over `arrays` (ticker -> dict of
+    datetime/open/close arrays, e.g. optimize.read_yahoo_csv). Windows are
+    computed from `origin` (default: the first bar of the universe);
+    `cache` is the JSON file of the window results (None: no cache). With
+    `prune` the results this run did not use are dropped from it, so it does
+    not grow with every new day of data; pass prune=False when several
+    universes or grids share one file.
+
+    Returns a DataFrame with one row per ticker and window (COLUMNS).
+    '''
+    periods = list(periods)
+    dates = [bt.num2date(cols['datetime'][i]).date()
+             for cols in arrays.values() if len(cols['datetime']) for i in (0, -1)]
+    if not dates:
+        return pd.DataFrame([], columns=COLUMNS)
+    spans = windows(min(dates), max(dates), insample, outsample, step, origin)
+
+    store = Cache(cache)
+    rows, jobs = [], []
+    for ticker, cols in arrays.items():
+        dts = cols['datetime']
+        for window in spans:
+            lo, mid, hi = [bt.date2num(datetime.datetime.combine(d, datetime.time()))
+                           for d in window]
+            # a window covers [from, to) in sample, [to, outsample_to) out
+            a, b = np.searchsorted(dts, lo), np.searchsorted(dts, hi)
+            if np.searchsorted(dts, mid) == a:
+                continue  # no in-sample bars
+            bars = {field: cols[field][a:b] for field in ('datetime', 'open', 'close')}
+            key = window_key(ticker, window, periods, cash, stake, bars)
+            rows.append((ticker, window, key))
+            if store.get(key) is None:
+                jobs.append((key, bars, mid, periods, cash, stake))
+
+    if jobs:
+        workers = workers or os.cpu_count()
+        if workers == 1:
+            done = list(map(_evaluate, jobs))
+        else:
+            with futures.ProcessPoolExecutor(workers) as pool:
+                done = list(pool.map(_evaluate, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+        for key, result in done:
+            store.put(key, result)
+    store.save(prune)
+
+    records = [dict(store.get(key), ticker=ticker, insample_from=window[0],
+                    insample_to=window[1], outsample_to=window[2])
+               for ticker, window, key in rows]
+    return pd.DataFrame(records, columns=COLUMNS)